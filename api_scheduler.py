@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# Shared scheduler for Mistral API requests
+# Enforces a requests-per-second and concurrent-requests budget across all
+# workers and retries throttled or transiently failing calls with jittered
+# exponential backoff, honoring Retry-After.
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """Get the HTTP status code carried by an API error, if any"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None and isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+    return status_code
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """
+    Get the delay requested by a Retry-After header.
+    
+    Args:
+        error: Exception raised by the API client
+        
+    Returns:
+        Delay in seconds, or None if the response had no usable header
+    """
+    response = getattr(error, "raw_response", None) or getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether an API error is transient"""
+    if isinstance(error, (httpx.TransportError, httpx.TimeoutException)):
+        return True
+    return get_status_code(error) in RETRYABLE_STATUS_CODES
+
+class RequestScheduler:
+    """
+    Rate limiter and retry policy shared by every API call of a run.
+    
+    Calls are spaced so that no more than requests_per_second start per
+    second, at most max_concurrent run at once, and a throttled response
+    delays all subsequent calls until its Retry-After has elapsed.
+    
+    call() serves threads and call_async() serves coroutines; they share the
+    rate limit, but each enforces max_concurrent separately, so a run should
+    use one or the other.
+    """
+    
+    def __init__(self, requests_per_second: Optional[float] = None, max_concurrent: int = 8,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_concurrent = max_concurrent
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._counters = {"requests": 0, "retries": 0, "throttled": 0, "failures": 0}
+    
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+    
+    def _reserve_slot(self) -> float:
+        """Reserve the next start time allowed by the rate limit"""
+        with self._lock:
+            slot = max(time.monotonic(), self._next_slot)
+            self._next_slot = slot + self.interval
+        return slot
+    
+    def _pause_until(self, resume_at: float):
+        """Hold back every caller until resume_at (monotonic time)"""
+        with self._lock:
+            self._next_slot = max(self._next_slot, resume_at)
+    
+    def backoff_delay(self, attempt: int, error: Exception) -> float:
+        """
+        Compute the delay before retrying a failed call.
+        
+        Args:
+            attempt: Number of the retry (1 for the first retry)
+            error: Exception raised by the failed call
+            
+        Returns:
+            Delay in seconds: jittered exponential backoff, but never less
+            than the server's Retry-After
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(delay / 2, delay)
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+    
+    def _retry_delay(self, attempt: int, error: Exception, description: str) -> Optional[float]:
+        """Count a failed attempt and get the delay before retrying it, or None to give up"""
+        if not is_retryable(error) or attempt > self.max_retries:
+            self._count("failures")
+            return None
+        
+        retry_delay = self.backoff_delay(attempt, error)
+        if get_status_code(error) == 429:
+            self._count("throttled")
+            self._pause_until(time.monotonic() + retry_delay)
+        self._count("retries")
+        logger.warning(
+            f"{description} failed ({str(error)}); retry {attempt}/{self.max_retries} in {retry_delay:.1f}s"
+        )
+        return retry_delay
+    
+    def call(self, func: Callable[..., Any], *args, description: Optional[str] = None, **kwargs) -> Any:
+        """
+        Run an API call within the rate limit, retrying transient failures.
+        
+        Args:
+            func: API method to call
+            *args: Positional arguments for func
+            description: Name of the call used in log messages
+            **kwargs: Keyword arguments for func
+            
+        Returns:
+            The result of func
+            
+        Raises:
+            The last exception if the call is not retryable or retries run out
+        """
+        description = description or getattr(func, "__name__", "request")
+        attempt = 0
+        while True:
+            delay = self._reserve_slot() - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            
+            self._count("requests")
+            try:
+                with self._semaphore:
+                    return func(*args, **kwargs)
+            except Exception as e:
+                attempt += 1
+                retry_delay = self._retry_delay(attempt, e, description)
+                if retry_delay is None:
+                    raise
+                time.sleep(retry_delay)
+    
+    async def call_async(self, func: Callable[..., Awaitable[Any]], *args,
+                         description: Optional[str] = None, **kwargs) -> Any:
+        """
+        Await an async API call within the rate limit, retrying transient failures.
+        
+        Args:
+            func: Async API method to call
+            *args: Positional arguments for func
+            description: Name of the call used in log messages
+            **kwargs: Keyword arguments for func
+            
+        Returns:
+            The result of func
+            
+        Raises:
+            The last exception if the call is not retryable or retries run out
+        """
+        description = description or getattr(func, "__name__", "request")
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrent)
+        attempt = 0
+        while True:
+            delay = self._reserve_slot() - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            self._count("requests")
+            try:
+                async with self._async_semaphore:
+                    return await func(*args, **kwargs)
+            except Exception as e:
+                attempt += 1
+                retry_delay = self._retry_delay(attempt, e, description)
+                if retry_delay is None:
+                    raise
+                await asyncio.sleep(retry_delay)
+    
+    def stats(self) -> Dict[str, int]:
+        """Get the request, retry, throttle and failure counters"""
+        with self._lock:
+            return dict(self._counters)
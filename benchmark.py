@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# Offline end-to-end benchmark for the ingestion pipelines
+# Runs each pipeline as a subprocess against the mock services in
+# mock_services.py and reports throughput, latency and peak memory.
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from tabulate import tabulate
+
+from mock_services import (
+    add_fault_arguments,
+    faults_from_args,
+    start_mistral_server,
+    start_unstructured_server
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REPO_DIR = Path(__file__).resolve().parent
+
+# How each pipeline is launched: script, the input folder it reads from its
+# working directory, the default documents to benchmark and its output folder.
+# Caching and duplicate detection are off so every document is sent to the
+# mock service and throughput stays comparable between runs
+PIPELINES = {
+    "mistral": {
+        "script": REPO_DIR / "mistrel_ocr_ingestion_pipeline.py",
+        "input_dir": "scanned_pdf_data",
+        "default_documents": REPO_DIR / "scanned_pdf_data",
+        "output_dir": "mistral_scanned_pdf_output",
+        "args": ["--no-cache", "--reprocess", "--dedup", "off"],
+    },
+    "mistral-async": {
+        "script": REPO_DIR / "mistral_async_pipeline.py",
+        "input_dir": "scanned_pdf_data",
+        "default_documents": REPO_DIR / "scanned_pdf_data",
+        "output_dir": "mistral_scanned_pdf_output",
+        "args": ["--no-cache", "--reprocess"],
+    },
+    "unstructured": {
+        "script": REPO_DIR / "unstructured_io_ingestion_pipeline.py",
+        "input_dir": "Data",
+        "default_documents": REPO_DIR / "Data",
+        "output_dir": "unstructured_json",
+        "args": ["--reprocess", "--dedup", "off"],
+    },
+}
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of a list of values.
+    
+    Args:
+        values: Sample values
+        percent: Percentile between 0 and 100
+    
+    Returns:
+        The percentile, or None if there are no values
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def prepare_workspace(pipeline: str, documents_dir: Path) -> Path:
+    """Create a scratch working directory exposing the documents as the pipeline's input folder"""
+    workspace = Path(tempfile.mkdtemp(prefix=f"benchmark-{pipeline}-"))
+    input_dir = workspace / PIPELINES[pipeline]["input_dir"]
+    try:
+        input_dir.symlink_to(documents_dir.resolve(), target_is_directory=True)
+    except OSError:
+        shutil.copytree(documents_dir, input_dir)
+    return workspace
+
+def run_pipeline_process(pipeline: str, workspace: Path, env: Dict[str, str], extra_args: List[str]) -> Dict[str, Any]:
+    """
+    Run a pipeline to completion in a subprocess.
+    
+    Args:
+        pipeline: Key into PIPELINES
+        workspace: Working directory of the run
+        env: Environment of the subprocess
+        extra_args: Additional command line arguments for the pipeline
+    
+    Returns:
+        Exit code, wall time in seconds and peak RSS in bytes
+    """
+    config = PIPELINES[pipeline]
+    command = [sys.executable, str(config["script"])] + config["args"] + extra_args
+    logger.info(f"Running {' '.join(command)} in {workspace}")
+    
+    with open(workspace / "pipeline_output.log", "wb") as log_file:
+        start_time = time.perf_counter()
+        process = subprocess.Popen(command, cwd=workspace, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall_time = time.perf_counter() - start_time
+    
+    return {
+        "exit_code": os.waitstatus_to_exitcode(status),
+        "wall_time": wall_time,
+        # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+        "peak_rss": usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024,
+    }
+
+def collect_mistral_latencies(workspace: Path, pipeline: str = "mistral") -> List[float]:
+    """Read per-document processing times from the summary.json files of a run"""
+    latencies = []
+    for summary_path in (workspace / PIPELINES[pipeline]["output_dir"] / "json").glob("*/summary.json"):
+        with open(summary_path, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+        if "processing_seconds" in summary:
+            latencies.append(summary["processing_seconds"])
+            continue
+        processing_time = summary.get("processing_time", "")
+        try:
+            latencies.append(float(str(processing_time).split()[0]))
+        except (ValueError, IndexError):
+            logger.warning(f"Unreadable processing time in {summary_path}: {processing_time!r}")
+    return latencies
+
+def collect_unstructured_latencies(server) -> List[float]:
+    """Per-document latency seen by the mock partition API, from first request to last response"""
+    return [
+        max(finished for _, finished in timings) - min(started for started, _ in timings)
+        for timings in server.document_timings.values()
+    ]
+
+def benchmark_pipeline(pipeline: str, documents_dir: Path, args, run: int) -> Dict[str, Any]:
+    """
+    Benchmark one run of a pipeline against a fresh mock service.
+    
+    Args:
+        pipeline: Key into PIPELINES
+        documents_dir: Folder of documents to ingest
+        args: Parsed command line arguments
+        run: Run number, for reporting
+    
+    Returns:
+        Measurements of the run
+    """
+    workspace = prepare_workspace(pipeline, documents_dir)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_DIR), env.get("PYTHONPATH")]))
+    
+    if pipeline.startswith("mistral"):
+        server = start_mistral_server(faults_from_args(args))
+        env["MISTRAL_SERVER_URL"] = server.url
+        env.setdefault("MISTRAL_API_KEY", "benchmark")
+        if pipeline == "mistral":
+            extra_args = ["--workers", str(args.workers)]
+        else:
+            extra_args = ["--max-in-flight", str(args.max_in_flight)]
+    else:
+        server = start_unstructured_server(faults_from_args(args))
+        env["UNSTRUCTURED_API_URL"] = server.url
+        env.setdefault("UNSTRUCTURED_API_KEY", "benchmark")
+        extra_args = []
+    
+    try:
+        result = run_pipeline_process(pipeline, workspace, env, extra_args)
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    if pipeline.startswith("mistral"):
+        latencies = collect_mistral_latencies(workspace, pipeline)
+    else:
+        latencies = collect_unstructured_latencies(server)
+    documents = len(latencies)
+    
+    result.update({
+        "pipeline": pipeline,
+        "run": run,
+        "documents": documents,
+        "docs_per_sec": documents / result["wall_time"] if result["wall_time"] else 0.0,
+        "p50_latency": percentile(latencies, 50),
+        "p95_latency": percentile(latencies, 95),
+        "requests": server.stats["requests"],
+        "throttled": server.stats["throttled"],
+        "injected_failures": server.stats["failed"],
+        "workspace": str(workspace),
+    })
+    
+    if result["exit_code"] != 0:
+        logger.warning(f"{pipeline} exited with code {result['exit_code']}, see {workspace / 'pipeline_output.log'}")
+    if not args.keep_workspace and result["exit_code"] == 0:
+        shutil.rmtree(workspace, ignore_errors=True)
+        result["workspace"] = None
+    
+    return result
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Render benchmark results as a table"""
+    def seconds(value):
+        return f"{value:.2f}" if value is not None else "-"
+    
+    rows = [[
+        r["pipeline"], r["run"], r["exit_code"], r["documents"],
+        f"{r['wall_time']:.2f}", f"{r['docs_per_sec']:.2f}",
+        seconds(r["p50_latency"]), seconds(r["p95_latency"]),
+        f"{r['peak_rss'] / (1024 * 1024):.1f}",
+        r["requests"], r["throttled"], r["injected_failures"]
+    ] for r in results]
+    headers = ["Pipeline", "Run", "Exit", "Docs", "Wall (s)", "Docs/s", "p50 (s)", "p95 (s)",
+               "Peak RSS (MB)", "Requests", "429s", "500s"]
+    return tabulate(rows, headers=headers, tablefmt="grid")
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion pipelines against local mock services")
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES) + ["all"], default="all",
+                        help="Pipeline to benchmark (default: all)")
+    parser.add_argument("--documents", type=Path, default=None,
+                        help="Folder of documents to ingest (default: each pipeline's usual input folder)")
+    parser.add_argument("--runs", type=int, default=1, help="Number of runs per pipeline (default: 1)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Documents processed concurrently by the Mistral pipeline (default: 4)")
+    parser.add_argument("--max-in-flight", type=int, default=100,
+                        help="Documents in flight in the asynchronous Mistral pipeline (default: 100)")
+    parser.add_argument("--json-out", type=Path, default=None, help="Also write the results to this JSON file")
+    parser.add_argument("--keep-workspace", action="store_true",
+                        help="Keep the scratch working directory of every run")
+    add_fault_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    """Run the benchmark and print the results"""
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    pipelines = sorted(PIPELINES) if args.pipeline == "all" else [args.pipeline]
+    results = []
+    for pipeline in pipelines:
+        documents_dir = args.documents or PIPELINES[pipeline]["default_documents"]
+        for run in range(1, args.runs + 1):
+            print(f"Benchmarking {pipeline} pipeline on {documents_dir} (run {run}/{args.runs})...")
+            results.append(benchmark_pipeline(pipeline, documents_dir, args, run))
+    
+    print(format_results(results))
+    
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Results written to {args.json_out}")
+
+if __name__ == "__main__":
+    main()
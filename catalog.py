@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# Catalog of the documents processed by both pipelines
+# Maps each document to its output files, their sizes and page counts and the
+# pipelines that processed it. The pipelines record every output they write,
+# so the viewer can list and open documents without walking the output
+# directories.
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from tabulate import tabulate
+
+from ocr_output import load_ocr_response
+from utils import document_stem, format_file_size, iter_elements
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Location of the catalog database, shared by the pipelines and the viewer
+DEFAULT_CATALOG_PATH = Path("document_catalog.sqlite3")
+
+# Output layout per pipeline: Unstructured.io writes <root>/<input name>.json,
+# Mistral writes <root>/<input stem>/ocr_response.json
+OUTPUT_GLOBS = {"unstructured": "*.json", "mistral": "*/ocr_response.json"}
+
+# Bumped when the meaning of a column changes; older catalogs are rebuilt by the next scan
+CATALOG_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    pipeline TEXT NOT NULL,
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    stem TEXT NOT NULL,
+    size_bytes INTEGER,
+    modified_time_ns INTEGER,
+    pages INTEGER,
+    updated_at REAL,
+    PRIMARY KEY (root, path)
+);
+CREATE INDEX IF NOT EXISTS outputs_by_stem ON outputs (root, stem);
+CREATE INDEX IF NOT EXISTS outputs_by_name ON outputs (root, name);
+CREATE TABLE IF NOT EXISTS roots (
+    root TEXT PRIMARY KEY,
+    pipeline TEXT NOT NULL,
+    scanned_at REAL
+);
+"""
+
+def output_name(pipeline: str, output_path: Path) -> str:
+    """
+    Get the input file name of an output file ("report.pdf").
+    
+    Mistral writes every input with the same stem to one directory, so its
+    input name is read from the summary.json next to the response; without
+    one, the directory name ("report") is returned.
+    """
+    output_path = Path(output_path)
+    if pipeline != "mistral":
+        return output_path.stem
+    try:
+        with open(output_path.parent / "summary.json", "r", encoding="utf-8") as f:
+            filename = json.load(f).get("filename")
+    except (OSError, ValueError, AttributeError):
+        filename = None
+    return filename or output_path.parent.name
+
+def count_pages(pipeline: str, output_path: Path) -> Optional[int]:
+    """
+    Count the pages of an output file.
+    
+    Returns:
+        The number of OCR'd pages (Mistral) or the highest element page
+        number (Unstructured.io), or None when the elements carry no page
+        numbers (e.g. DOCX inputs)
+    """
+    if pipeline == "mistral":
+        return len(load_ocr_response(output_path, rehydrate=False).get("pages", []))
+    pages = [(element.get("metadata") or {}).get("page_number") for element in iter_elements(output_path)]
+    pages = [page for page in pages if page is not None]
+    return max(pages) if pages else None
+
+class DocumentCatalog:
+    """
+    SQLite catalog of the pipelines' output files.
+    
+    Each row is one output file under an output root (e.g. unstructured_json
+    or mistral_output/json), with the document stem both pipelines share
+    (utils.document_stem), its size, mtime and page count. Pipelines call
+    record() after writing an output; scan() reconciles a root with the
+    filesystem for outputs written before the catalog existed or changed by
+    hand. Like the ingestion manifest, the database runs in WAL mode and a
+    single instance can be shared between threads.
+    """
+    
+    def __init__(self, db_path: Path = DEFAULT_CATALOG_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(exist_ok=True, parents=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] < CATALOG_VERSION:
+                # Entries of older catalogs are named by stem; drop them so they are rescanned
+                self._conn.executescript("DROP TABLE IF EXISTS outputs; DROP TABLE IF EXISTS roots;")
+                self._conn.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def record(self, pipeline: str, root: Path, output_path: Path, pages: Optional[int] = None):
+        """
+        Record an output file written by a pipeline.
+        
+        Args:
+            pipeline: "mistral" or "unstructured"
+            root: Output directory the file belongs to
+            output_path: Element file or ocr_response.json
+            pages: Page count, if known; otherwise it is read from the file
+        """
+        output_path = Path(output_path)
+        stats = output_path.stat()
+        if pages is None:
+            pages = count_pages(pipeline, output_path)
+        name = output_name(pipeline, output_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO outputs "
+                "(pipeline, root, path, name, stem, size_bytes, modified_time_ns, pages, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (pipeline, str(root), str(output_path), name, document_stem(name),
+                 stats.st_size, stats.st_mtime_ns, pages, time.time())
+            )
+            self._conn.commit()
+    
+    def remove(self, root: Path, output_path: Path):
+        """Forget an output file"""
+        with self._lock:
+            self._conn.execute("DELETE FROM outputs WHERE root = ? AND path = ?", (str(root), str(output_path)))
+            self._conn.commit()
+    
+    def scan(self, pipeline: str, root: Path) -> Dict[str, int]:
+        """
+        Reconcile the catalog with an output directory.
+        
+        New and changed files (by size and mtime) are recorded and files that
+        no longer exist are dropped.
+        
+        Args:
+            pipeline: Pipeline that writes to the directory
+            root: Output directory
+        
+        Returns:
+            Dictionary with the number of files recorded, unchanged and removed
+        """
+        root = Path(root)
+        with self._lock:
+            known = {
+                row["path"]: (row["size_bytes"], row["modified_time_ns"])
+                for row in self._conn.execute(
+                    "SELECT path, size_bytes, modified_time_ns FROM outputs WHERE root = ?", (str(root),))
+            }
+        
+        counts = {"recorded": 0, "unchanged": 0, "removed": 0}
+        seen = set()
+        output_paths = sorted(root.glob(OUTPUT_GLOBS[pipeline])) if root.exists() else []
+        for output_path in output_paths:
+            seen.add(str(output_path))
+            try:
+                stats = output_path.stat()
+                if known.get(str(output_path)) == (stats.st_size, stats.st_mtime_ns):
+                    counts["unchanged"] += 1
+                    continue
+                self.record(pipeline, root, output_path)
+                counts["recorded"] += 1
+            except Exception as e:
+                logger.error(f"Error cataloging {output_path}: {str(e)}")
+        
+        with self._lock:
+            for path in set(known) - seen:
+                self._conn.execute("DELETE FROM outputs WHERE root = ? AND path = ?", (str(root), path))
+                counts["removed"] += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO roots (root, pipeline, scanned_at) VALUES (?, ?, ?)",
+                (str(root), pipeline, time.time())
+            )
+            self._conn.commit()
+        return counts
+    
+    def ensure_scanned(self, pipeline: str, root: Path):
+        """Scan an output directory the first time the catalog is used with it"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM roots WHERE root = ?", (str(root),)).fetchone()
+        if row is None:
+            counts = self.scan(pipeline, root)
+            logger.info(f"Cataloged {counts['recorded']} outputs in {root}")
+    
+    def documents(self, root: Path) -> List[Dict[str, Any]]:
+        """Get the cataloged outputs of an output directory, ordered by input file name"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM outputs WHERE root = ? ORDER BY name, modified_time_ns", (str(root),)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def lookup(self, root: Path, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a document's output in an output directory.
+        
+        The name is the input file name ("report.pdf"), so "report.doc" and
+        "report.docx" are told apart. Besides the exact name, an output whose
+        input name is unknown (a Mistral directory without summary.json) is
+        matched by its stem. A name without an extension ("report") matches
+        any output with that stem, the most recently written first. Entries
+        whose file has disappeared are dropped.
+        
+        Args:
+            root: Output directory
+            name: Input file name, or a document stem
+        
+        Returns:
+            The catalog entry, or None if the document has no output there
+        """
+        stem = document_stem(name)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM outputs WHERE root = ? AND name = ?", (str(root), name)
+            ).fetchall()
+            if stem == name:
+                rows += self._conn.execute(
+                    "SELECT * FROM outputs WHERE root = ? AND stem = ? ORDER BY modified_time_ns DESC",
+                    (str(root), stem)
+                ).fetchall()
+            else:
+                rows += self._conn.execute(
+                    "SELECT * FROM outputs WHERE root = ? AND name = ?", (str(root), stem)
+                ).fetchall()
+        for row in rows:
+            if os.path.exists(row["path"]):
+                return dict(row)
+            self.remove(root, row["path"])
+        return None
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+def main():
+    """Scan output directories into the catalog or list its documents"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Catalog of the documents processed by both pipelines")
+    parser.add_argument("--catalog", type=Path, default=DEFAULT_CATALOG_PATH,
+                        help=f"Catalog database (default: {DEFAULT_CATALOG_PATH})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    scan_parser = subparsers.add_parser("scan", help="Reconcile the catalog with an output directory")
+    scan_parser.add_argument("pipeline", choices=sorted(OUTPUT_GLOBS))
+    scan_parser.add_argument("root", type=Path, help="Output directory, e.g. unstructured_json or mistral_output/json")
+    list_parser = subparsers.add_parser("list", help="List the cataloged outputs of an output directory")
+    list_parser.add_argument("root", type=Path)
+    args = parser.parse_args()
+    
+    with DocumentCatalog(args.catalog) as catalog:
+        if args.command == "scan":
+            counts = catalog.scan(args.pipeline, args.root)
+            print(f"{args.root}: {counts['recorded']} recorded, {counts['unchanged']} unchanged, "
+                  f"{counts['removed']} removed")
+        else:
+            rows = [[entry["stem"], entry["name"], entry["pages"], format_file_size(entry["size_bytes"])]
+                    for entry in catalog.documents(args.root)]
+            print(tabulate(rows, headers=["Document", "Output", "Pages", "Size"], tablefmt="pretty"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# Batch comparison of the Mistral OCR and Unstructured.io outputs
+# For every document processed by both pipelines, aligns the extracted text
+# page by page, scores the similarity with RapidFuzz, measures word and
+# character coverage, counts tables and images and collects the processing
+# time of each pipeline. Documents are compared in parallel worker processes
+# and summarized in a corpus-level report.
+
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import statistics
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from rapidfuzz import fuzz
+from tabulate import tabulate
+
+from ocr_output import IMAGE_PLACEHOLDER_PATTERN, load_ocr_response
+from utils import document_stem, iter_elements
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Default output locations of both pipelines
+UNSTRUCTURED_DIR = Path("unstructured_json")
+MISTRAL_JSON_DIR = Path("mistral_output/json")
+
+# Where the Unstructured.io pipeline writes its per-document metrics
+UNSTRUCTURED_METRICS_GLOB = "metrics/metrics*.json"
+
+# Corpus-level report
+DEFAULT_REPORT_PATH = Path("comparison_report.json")
+
+# Documents handed to a worker process at a time
+CHUNK_SIZE = 8
+
+# Markdown markup removed before comparing Mistral text with Unstructured.io text
+MARKDOWN_TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)+\|?\s*$", re.MULTILINE)
+MARKDOWN_MARKUP = re.compile(r"<br\s*/?>|[#*_`|>]+|\$+")
+WORD_PATTERN = re.compile(r"\w+")
+
+def normalize_text(text: str) -> str:
+    """Lowercase text and strip markdown markup and extra whitespace"""
+    text = IMAGE_PLACEHOLDER_PATTERN.sub(" ", text)
+    text = MARKDOWN_TABLE_SEPARATOR.sub(" ", text)
+    text = MARKDOWN_MARKUP.sub(" ", text)
+    return " ".join(text.lower().split())
+
+def read_mistral_output(json_path: Path) -> Dict[str, Any]:
+    """
+    Read the page texts, table count and image count of a Mistral OCR response.
+    
+    Args:
+        json_path: Path to ocr_response.json
+    
+    Returns:
+        Dictionary with the normalized text per page number, and the table
+        and image counts
+    """
+    data = load_ocr_response(json_path, rehydrate=False)
+    pages = {}
+    tables = 0
+    images = 0
+    for position, page in enumerate(data.get("pages", [])):
+        markdown = page.get("markdown") or ""
+        pages[page.get("index", position) + 1] = normalize_text(markdown)
+        tables += len(MARKDOWN_TABLE_SEPARATOR.findall(markdown))
+        images += len(page.get("images") or [])
+    return {"pages": pages, "tables": tables, "images": images}
+
+def read_unstructured_output(json_path: Path) -> Dict[str, Any]:
+    """
+    Read the page texts, table count and image count of an Unstructured.io element file.
+    
+    Args:
+        json_path: Path to the element file
+    
+    Returns:
+        Dictionary with the normalized text per page number (None for
+        elements without one, e.g. from DOCX files), and the table and image counts
+    """
+    texts: Dict[Optional[int], List[str]] = {}
+    types = Counter()
+    for element in iter_elements(json_path):
+        types[element.get("type")] += 1
+        if element.get("text"):
+            page = (element.get("metadata") or {}).get("page_number")
+            texts.setdefault(page, []).append(element["text"])
+    pages = {page: normalize_text("\n".join(page_texts)) for page, page_texts in texts.items()}
+    return {"pages": pages, "tables": types["Table"], "images": types["Image"]}
+
+def align_pages(mistral_pages: Dict[Any, str], unstructured_pages: Dict[Any, str]) -> List[Tuple[Any, str, str]]:
+    """
+    Pair the pages of both outputs by page number.
+    
+    When Unstructured.io reports no page numbers (DOCX inputs), or either
+    side has no pages, the whole documents are compared as a single page.
+    
+    Returns:
+        List of (page, Mistral text, Unstructured.io text); a page missing
+        on one side has an empty text there
+    """
+    if None in unstructured_pages or not mistral_pages or not unstructured_pages:
+        mistral_text = " ".join(mistral_pages[page] for page in sorted(mistral_pages))
+        unstructured_text = " ".join(text for page, text in sorted(
+            unstructured_pages.items(), key=lambda item: (item[0] is not None, item[0] or 0)))
+        return [(None, mistral_text, unstructured_text)]
+    
+    pages = sorted(set(mistral_pages) | set(unstructured_pages))
+    return [(page, mistral_pages.get(page, ""), unstructured_pages.get(page, "")) for page in pages]
+
+def word_coverage(reference: Counter, other: Counter) -> Optional[float]:
+    """Fraction of the reference's words (with multiplicity) also found in the other text"""
+    total = sum(reference.values())
+    if not total:
+        return None
+    return sum((reference & other).values()) / total
+
+def compare_document(pair: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compare one document's outputs. Runs in a worker process.
+    
+    Args:
+        pair: Dictionary with the document name, the paths of both outputs
+            and each pipeline's processing time (if known)
+    
+    Returns:
+        Dictionary with the document's scores and counts, or an error
+    """
+    result = {
+        "document": pair["document"],
+        "mistral_seconds": pair.get("mistral_seconds"),
+        "unstructured_seconds": pair.get("unstructured_seconds"),
+    }
+    try:
+        mistral = read_mistral_output(pair["mistral_path"])
+        unstructured = read_unstructured_output(pair["unstructured_path"])
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+    
+    pages = []
+    weighted_similarity = 0.0
+    total_length = 0
+    for page, mistral_text, unstructured_text in align_pages(mistral["pages"], unstructured["pages"]):
+        similarity = fuzz.ratio(mistral_text, unstructured_text) / 100
+        length = max(len(mistral_text), len(unstructured_text))
+        weighted_similarity += similarity * length
+        total_length += length
+        pages.append({"page": page, "similarity": round(similarity, 4),
+                      "mistral_chars": len(mistral_text), "unstructured_chars": len(unstructured_text)})
+    
+    mistral_text = " ".join(mistral["pages"].values())
+    unstructured_text = " ".join(unstructured["pages"].values())
+    mistral_words = Counter(WORD_PATTERN.findall(mistral_text))
+    unstructured_words = Counter(WORD_PATTERN.findall(unstructured_text))
+    mistral_coverage = word_coverage(mistral_words, unstructured_words)
+    unstructured_coverage = word_coverage(unstructured_words, mistral_words)
+    
+    result.update({
+        "similarity": round(weighted_similarity / total_length, 4) if total_length else 1.0,
+        "mistral_pages": len(mistral["pages"]),
+        "unstructured_pages": len([page for page in unstructured["pages"] if page is not None]),
+        "unaligned_pages": sum(1 for page in pages if not page["mistral_chars"] or not page["unstructured_chars"]),
+        "mistral_chars": len(mistral_text),
+        "unstructured_chars": len(unstructured_text),
+        "char_ratio": round(len(unstructured_text) / len(mistral_text), 4) if mistral_text else None,
+        "mistral_words": sum(mistral_words.values()),
+        "unstructured_words": sum(unstructured_words.values()),
+        # Share of the Mistral words that Unstructured.io also extracted, and vice versa
+        "mistral_word_coverage": round(mistral_coverage, 4) if mistral_coverage is not None else None,
+        "unstructured_word_coverage": round(unstructured_coverage, 4) if unstructured_coverage is not None else None,
+        "mistral_tables": mistral["tables"],
+        "unstructured_tables": unstructured["tables"],
+        "mistral_images": mistral["images"],
+        "unstructured_images": unstructured["images"],
+        "pages": pages,
+    })
+    return result
+
+def _parse_seconds(value: Any) -> Optional[float]:
+    """Parse a processing time such as 2.96 or "2.96 seconds" """
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.match(r"\s*([\d.]+)", str(value or ""))
+    return float(match.group(1)) if match else None
+
+def load_unstructured_timings(unstructured_dir: Path) -> Dict[str, float]:
+    """Get the per-document processing time recorded in the Unstructured.io metrics files, by input file name"""
+    timings = {}
+    for metrics_path in sorted(Path(unstructured_dir).glob(UNSTRUCTURED_METRICS_GLOB)):
+        try:
+            with open(metrics_path, "r", encoding="utf-8") as f:
+                metrics = json.load(f)
+            for document in metrics.get("documents", []):
+                if document.get("outcome") == "success":
+                    timings[document["document"]] = document["duration_seconds"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read metrics from {metrics_path}: {str(e)}")
+    return timings
+
+def _read_mistral_summary(summary_path: Path) -> Dict[str, Any]:
+    """Read a Mistral summary.json, or an empty summary if it is missing or unreadable"""
+    if not summary_path.exists():
+        return {}
+    try:
+        with open(summary_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read {summary_path}: {str(e)}")
+        return {}
+
+def find_document_pairs(unstructured_dir: Path = UNSTRUCTURED_DIR,
+                        mistral_dir: Path = MISTRAL_JSON_DIR) -> Tuple[List[Dict[str, Any]], Dict[str, List[str]]]:
+    """
+    Match the documents processed by both pipelines.
+    
+    Documents are matched by input file name, so "report.doc" and
+    "report.docx" stay apart: Unstructured.io names its element file after
+    the input ("report.doc.json") and Mistral records it in summary.json.
+    Mistral writes both to the same "report/" directory, so only the input
+    it processed last is paired and the other one is reported as unmatched.
+    A Mistral output without a recorded input name is matched by stem, unless
+    several inputs share that stem.
+    
+    Args:
+        unstructured_dir: Directory of Unstructured.io element files
+        mistral_dir: Directory of Mistral OCR output directories
+    
+    Returns:
+        The document pairs, and the documents found in only one of the outputs
+    """
+    unstructured_files = {
+        json_path.name[:-len(".json")]: json_path for json_path in sorted(Path(unstructured_dir).glob("*.json"))
+    }
+    stems = {}
+    for input_name in unstructured_files:
+        stems.setdefault(document_stem(input_name), []).append(input_name)
+    
+    mistral_files = {}
+    mistral_timings = {}
+    for json_path in sorted(Path(mistral_dir).glob("*/ocr_response.json")):
+        summary = _read_mistral_summary(json_path.parent / "summary.json")
+        input_name = summary.get("filename")
+        if not input_name:
+            candidates = stems.get(json_path.parent.name, [])
+            input_name = candidates[0] if len(candidates) == 1 else json_path.parent.name
+        mistral_files[input_name] = json_path
+        mistral_timings[input_name] = _parse_seconds(summary.get("processing_time"))
+    unstructured_timings = load_unstructured_timings(unstructured_dir)
+    
+    pairs = []
+    for document in sorted(set(unstructured_files) & set(mistral_files)):
+        pairs.append({
+            "document": document,
+            "unstructured_path": str(unstructured_files[document]),
+            "mistral_path": str(mistral_files[document]),
+            "mistral_seconds": mistral_timings[document],
+            "unstructured_seconds": unstructured_timings.get(document),
+        })
+    unmatched = {
+        "unstructured_only": sorted(set(unstructured_files) - set(mistral_files)),
+        "mistral_only": sorted(set(mistral_files) - set(unstructured_files)),
+    }
+    return pairs, unmatched
+
+def compare_documents(pairs: List[Dict[str, Any]], workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Compare document pairs in parallel worker processes.
+    
+    Args:
+        pairs: Document pairs from find_document_pairs()
+        workers: Number of worker processes (default: one per CPU)
+    
+    Returns:
+        The comparison of each pair, in input order
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pairs) <= 1:
+        return [compare_document(pair) for pair in pairs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(pairs))) as executor:
+        return list(executor.map(compare_document, pairs, chunksize=CHUNK_SIZE))
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return round(statistics.mean(values), 4) if values else None
+
+def _median(values: List[Optional[float]]) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return round(statistics.median(values), 4) if values else None
+
+def summarize_comparisons(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate the per-document comparisons into corpus-level figures"""
+    compared = [result for result in results if "error" not in result]
+    totals = {
+        key: sum(result[key] for result in compared)
+        for key in ["mistral_pages", "unstructured_pages", "unaligned_pages", "mistral_words", "unstructured_words",
+                    "mistral_tables", "unstructured_tables", "mistral_images", "unstructured_images"]
+    }
+    return {
+        "documents": len(results),
+        "failed": len(results) - len(compared),
+        "mean_similarity": _mean([result["similarity"] for result in compared]),
+        "median_similarity": _median([result["similarity"] for result in compared]),
+        "mean_mistral_word_coverage": _mean([result["mistral_word_coverage"] for result in compared]),
+        "mean_unstructured_word_coverage": _mean([result["unstructured_word_coverage"] for result in compared]),
+        "median_char_ratio": _median([result["char_ratio"] for result in compared]),
+        "mean_mistral_seconds": _mean([result["mistral_seconds"] for result in results]),
+        "mean_unstructured_seconds": _mean([result["unstructured_seconds"] for result in results]),
+        **totals,
+    }
+
+def write_report(report: Dict[str, Any], report_path: Path):
+    """Write the report atomically"""
+    report_path = Path(report_path)
+    report_path.parent.mkdir(exist_ok=True, parents=True)
+    tmp_path = report_path.with_name(f".{report_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, report_path)
+
+def print_report(report: Dict[str, Any], worst: int = 10):
+    """Print the corpus summary and the documents on which the pipelines disagree most"""
+    summary = report["summary"]
+    print("\n" + "=" * 50)
+    print("PIPELINE COMPARISON")
+    print("=" * 50)
+    print(tabulate([[key.replace("_", " ").capitalize(), value] for key, value in summary.items()],
+                   tablefmt="pretty", colalign=("left", "right")))
+    
+    unmatched = report["unmatched"]
+    print(f"\nOnly in Unstructured.io output: {len(unmatched['unstructured_only'])}, "
+          f"only in Mistral output: {len(unmatched['mistral_only'])}")
+    
+    compared = sorted((result for result in report["documents"] if "error" not in result),
+                      key=lambda result: result["similarity"])
+    if compared and worst:
+        print("\nLeast similar documents:")
+        rows = [[result["document"][:50], result["similarity"], result["mistral_word_coverage"],
+                 result["unstructured_word_coverage"], result["unaligned_pages"],
+                 f"{result['mistral_tables']}/{result['unstructured_tables']}",
+                 result["mistral_seconds"], result["unstructured_seconds"]]
+                for result in compared[:worst]]
+        print(tabulate(rows, headers=["Document", "Similarity", "Mistral words found", "Unstructured words found",
+                                      "Unaligned pages", "Tables (M/U)", "Mistral s", "Unstructured s"],
+                       tablefmt="pretty"))
+    for result in report["documents"]:
+        if "error" in result:
+            print(f"Error comparing {result['document']}: {result['error']}")
+
+def main():
+    """Compare every document processed by both pipelines"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Compare the Mistral OCR and Unstructured.io outputs")
+    parser.add_argument("--unstructured-dir", type=Path, default=UNSTRUCTURED_DIR,
+                        help=f"Directory of Unstructured.io element files (default: {UNSTRUCTURED_DIR})")
+    parser.add_argument("--mistral-dir", type=Path, default=MISTRAL_JSON_DIR,
+                        help=f"Directory of Mistral OCR JSON output (default: {MISTRAL_JSON_DIR})")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: one per CPU)")
+    parser.add_argument("--report", type=Path, default=DEFAULT_REPORT_PATH,
+                        help=f"Path of the JSON report (default: {DEFAULT_REPORT_PATH})")
+    parser.add_argument("--worst", type=int, default=10, help="Number of least similar documents printed")
+    args = parser.parse_args()
+    
+    start_time = time.time()
+    pairs, unmatched = find_document_pairs(args.unstructured_dir, args.mistral_dir)
+    if not pairs:
+        print(f"No documents found in both {args.unstructured_dir} and {args.mistral_dir}")
+        return
+    logger.info(f"Comparing {len(pairs)} documents")
+    
+    results = compare_documents(pairs, workers=args.workers)
+    report = {
+        "unstructured_dir": str(args.unstructured_dir),
+        "mistral_dir": str(args.mistral_dir),
+        "summary": summarize_comparisons(results),
+        "unmatched": unmatched,
+        "documents": results,
+    }
+    write_report(report, args.report)
+    print_report(report, worst=args.worst)
+    print(f"\nCompared {len(results)} documents in {time.time() - start_time:.2f} seconds")
+    print(f"Report saved to: {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,445 @@
+#!/usr/bin/env python3
+# DOCX/DOC to PDF conversion
+# Converts Word documents with headless LibreOffice (Linux, macOS, Windows) or
+# docx2pdf (requires Microsoft Word). LibreOffice conversions run in a pool of
+# worker processes, each converting batches of files per soffice start with
+# its own reused LibreOffice profile, and files whose PDF is up to date are skipped.
+
 import os
-import sys
+import atexit
+import shutil
+import signal
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
-from docx2pdf import convert
+from typing import Dict, Iterator, List, Optional, Tuple
 from tqdm import tqdm
 
-def convert_docx_to_pdf(input_path, output_path=None):
+from utils import compute_file_hash
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Conversion backends; "auto" uses LibreOffice when it is installed, docx2pdf otherwise
+BACKENDS = ["auto", "libreoffice", "docx2pdf"]
+DEFAULT_BACKEND = "auto"
+
+# Executables tried when looking for LibreOffice (SOFFICE_PATH overrides them)
+SOFFICE_NAMES = ["soffice", "libreoffice"]
+
+# Word document extensions converted to PDF
+CONVERTIBLE_EXTENSIONS = (".docx", ".doc")
+
+# Worker processes, files converted per soffice start, and seconds allowed per soffice run
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_TIMEOUT = 120.0
+
+# Suffix of the file recording the hash, size and mtime of the source a PDF was converted from
+SOURCE_HASH_SUFFIX = ".source-sha256"
+
+# LibreOffice profiles of this process that no running soffice is using; a
+# profile is created on first use and reused by later conversions
+_idle_profiles: List[str] = []
+_profiles_lock = threading.Lock()
+
+def find_soffice() -> Optional[str]:
+    """Locate the LibreOffice executable, or return None if it is not installed"""
+    configured = os.getenv("SOFFICE_PATH")
+    if configured:
+        return configured
+    for name in SOFFICE_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+def resolve_backend(backend: str = DEFAULT_BACKEND) -> str:
+    """Pick the backend used for "auto" and check that LibreOffice is available when requested"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown conversion backend: {backend}")
+    if backend == "auto":
+        return "libreoffice" if find_soffice() else "docx2pdf"
+    if backend == "libreoffice" and not find_soffice():
+        raise RuntimeError("LibreOffice (soffice) not found; install it or set SOFFICE_PATH")
+    return backend
+
+def pdf_path_for(source: Path, output_dir: Optional[Path] = None) -> Path:
+    """
+    Get the PDF path of a converted document.
+    
+    Without an output directory the PDF is written next to the source
+    ("report.docx" -> "report.pdf"); in an output directory it keeps the
+    full source name ("report.docx.pdf") so "report.doc" and "report.docx"
+    do not collide.
+    """
+    source = Path(source)
+    if output_dir is None:
+        return source.with_suffix(".pdf")
+    return Path(output_dir) / f"{source.name}.pdf"
+
+def _hash_path(pdf_path: Path) -> Path:
+    return pdf_path.with_name(f".{pdf_path.name}{SOURCE_HASH_SUFFIX}")
+
+def _record_source(pdf_path: Path, source_hash: str, stats: os.stat_result):
+    """Record the hash, size and mtime of the source a PDF was converted from"""
+    _hash_path(pdf_path).write_text(f"{source_hash} {stats.st_size} {stats.st_mtime_ns}", encoding="utf-8")
+
+def is_up_to_date(source: Path, pdf_path: Path) -> bool:
+    """
+    Check whether a PDF was converted from the current version of its source.
+    
+    The source hash recorded at conversion decides: a replaced source is
+    detected even if its mtime is older than the PDF's. The source is only
+    re-hashed when its size or mtime differ from the recorded ones; if the
+    content is unchanged (e.g. the source was copied or touched), the new
+    size and mtime are recorded so the next check is a stat. A PDF without a
+    recorded hash is up to date if it is newer than its source.
+    """
+    try:
+        stats = source.stat()
+        pdf_stats = pdf_path.stat()
+    except OSError:
+        return False
+    try:
+        recorded = _hash_path(pdf_path).read_text(encoding="utf-8").split()
+    except FileNotFoundError:
+        return pdf_stats.st_mtime >= stats.st_mtime
+    except OSError:
+        return False
+    if not recorded:
+        return False
+    if recorded[1:] == [str(stats.st_size), str(stats.st_mtime_ns)]:
+        return True
+    if recorded[0] != compute_file_hash(str(source)):
+        return False
+    _record_source(pdf_path, recorded[0], stats)
+    return True
+
+def _source_state(source: Path) -> Tuple[str, os.stat_result]:
+    """Stat and hash a source before it is converted, so a change during the conversion is noticed later"""
+    stats = source.stat()
+    return compute_file_hash(str(source)), stats
+
+def _install(converted: Path, pdf_path: Path, source_state: Tuple[str, os.stat_result]):
+    """Move a converted PDF into place and record the hash, size and mtime of its source"""
+    pdf_path.parent.mkdir(exist_ok=True, parents=True)
+    os.replace(converted, pdf_path)
+    _record_source(pdf_path, *source_state)
+
+def _init_worker(profile_root: str):
+    """Give a worker process its own LibreOffice profile in profile_root, which the parent removes"""
+    global _profiles_lock
+    # A forked worker inherits the parent's idle profiles and lock state; it must not use either
+    _profiles_lock = threading.Lock()
+    _idle_profiles[:] = [tempfile.mkdtemp(prefix="lo-profile-", dir=profile_root)]
+
+@contextmanager
+def _lend_profile() -> Iterator[str]:
+    """
+    Lend a LibreOffice profile that no running soffice is using.
+    
+    Concurrent soffice runs sharing a profile hand their work to each other,
+    so each run gets its own; profiles are kept for later runs, which skip
+    LibreOffice's first-start setup, and removed when the process exits.
+    """
+    with _profiles_lock:
+        profile = _idle_profiles.pop() if _idle_profiles else None
+    if profile is None:
+        profile = tempfile.mkdtemp(prefix="lo-profile-")
+        atexit.register(shutil.rmtree, profile, True)
+    try:
+        yield profile
+    finally:
+        with _profiles_lock:
+            _idle_profiles.append(profile)
+
+def _run_soffice(soffice: str, sources: List[Path], out_dir: Path, timeout: float) -> Optional[str]:
+    """
+    Convert files with one soffice run.
+    
+    Returns:
+        None on success, otherwise an error message
+    """
+    with _lend_profile() as profile:
+        command = [
+            soffice, f"-env:UserInstallation={Path(profile).as_uri()}",
+            "--headless", "--norestore", "--nolockcheck", "--nodefault",
+            "--convert-to", "pdf", "--outdir", str(out_dir),
+            *[str(source) for source in sources]
+        ]
+        # soffice may start child processes; run it in its own process group so a
+        # timeout kills all of them
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                   start_new_session=True)
+        try:
+            _, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except (OSError, AttributeError):
+                process.kill()
+            process.communicate()
+            return f"timed out after {timeout:.0f} seconds"
+    if process.returncode != 0:
+        return f"soffice exited with code {process.returncode}: {stderr.decode(errors='replace').strip()[:200]}"
+    return None
+
+def _convert_batch_libreoffice(soffice: str, jobs: List[Tuple[Path, Path]],
+                               timeout: float) -> Dict[Path, Optional[str]]:
+    """
+    Convert a batch of (source, PDF path) jobs with one soffice run; runs in a worker process.
+    
+    The batch run gets the same timeout as a single file, so a hung file
+    holds the worker for at most one timeout before the files the run did
+    not convert are retried one at a time, each with its own timeout.
+    
+    Returns:
+        Mapping of each source to None on success or an error message
+    """
+    results = {}
+    source_states = {source: _source_state(source) for source, _ in jobs}
+    out_dir = Path(tempfile.mkdtemp(prefix=".convert-", dir=jobs[0][1].parent))
+    try:
+        error = _run_soffice(soffice, [source for source, _ in jobs], out_dir, timeout)
+        for source, pdf_path in jobs:
+            converted = out_dir / f"{source.stem}.pdf"
+            if not converted.exists() and len(jobs) > 1:
+                error = _run_soffice(soffice, [source], out_dir, timeout)
+            if converted.exists():
+                _install(converted, pdf_path, source_states[source])
+                results[source] = None
+            else:
+                results[source] = error or "no PDF produced"
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return results
+
+def _convert_docx2pdf(source: Path, pdf_path: Path) -> Optional[str]:
+    """Convert one file with docx2pdf (imported only when used, as it needs Microsoft Word)"""
+    try:
+        from docx2pdf import convert
+    except ImportError:
+        return "docx2pdf is not installed (pip install docx2pdf) and LibreOffice was not found"
+    tmp_path = pdf_path.with_name(f".{pdf_path.name}.{os.getpid()}.tmp.pdf")
+    try:
+        pdf_path.parent.mkdir(exist_ok=True, parents=True)
+        source_state = _source_state(source)
+        convert(str(source), str(tmp_path))
+        _install(tmp_path, pdf_path, source_state)
+        return None
+    except Exception as e:
+        return str(e)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def _make_batches(jobs: List[Tuple[Path, Path]], batch_size: int) -> List[List[Tuple[Path, Path]]]:
+    """
+    Group jobs into batches for one soffice run each.
+    
+    soffice names its output after the source stem, so a batch never holds
+    two sources with the same stem (e.g. "report.doc" and "report.docx") or
+    PDFs in different directories.
+    """
+    batches = []
+    batch = []
+    stems = set()
+    for source, pdf_path in jobs:
+        if batch and (len(batch) >= batch_size or source.stem in stems or pdf_path.parent != batch[0][1].parent):
+            batches.append(batch)
+            batch = []
+            stems = set()
+        batch.append((source, pdf_path))
+        stems.add(source.stem)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def convert_documents(sources: List[Path], output_dir: Optional[Path] = None, backend: str = DEFAULT_BACKEND,
+                      workers: int = DEFAULT_WORKERS, batch_size: int = DEFAULT_BATCH_SIZE,
+                      timeout: float = DEFAULT_TIMEOUT, force: bool = False,
+                      progress: bool = False) -> Dict[Path, Optional[Path]]:
+    """
+    Convert Word documents to PDF.
+    
+    Documents whose PDF is up to date are skipped unless force is set. With
+    LibreOffice, batches of up to batch_size files are converted per soffice
+    run in a pool of worker processes; docx2pdf converts one file at a time.
+    
+    Args:
+        sources: DOCX/DOC files to convert
+        output_dir: Directory receiving the PDFs (see pdf_path_for()); next to each source by default
+        backend: One of BACKENDS
+        workers: LibreOffice worker processes
+        batch_size: Files converted per soffice run
+        timeout: Seconds allowed per soffice run, whether of a batch or of one file
+        force: Convert documents even if their PDF is up to date
+        progress: Show a progress bar
+    
+    Returns:
+        Mapping of each source to its PDF, or None if the conversion failed
+    """
+    backend = resolve_backend(backend)
+    results: Dict[Path, Optional[Path]] = {}
+    jobs = []
+    for source in sources:
+        source = Path(source)
+        pdf_path = pdf_path_for(source, output_dir)
+        if not force and is_up_to_date(source, pdf_path):
+            results[source] = pdf_path
+        else:
+            jobs.append((source, pdf_path))
+    if results:
+        logger.info(f"Skipping {len(results)} documents whose PDF is up to date")
+    if not jobs:
+        return results
+    
+    logger.info(f"Converting {len(jobs)} documents to PDF with {backend}")
+    progress_bar = tqdm(total=len(jobs), desc="Converting", disable=not progress)
+    
+    def record(source, pdf_path, error):
+        if error is None:
+            results[source] = pdf_path
+        else:
+            logger.error(f"Error converting {source}: {error}")
+            results[source] = None
+        progress_bar.update(1)
+    
+    try:
+        if backend == "docx2pdf":
+            for source, pdf_path in jobs:
+                record(source, pdf_path, _convert_docx2pdf(source, pdf_path))
+            return results
+        
+        soffice = find_soffice()
+        for _, pdf_path in jobs:
+            pdf_path.parent.mkdir(exist_ok=True, parents=True)
+        batches = _make_batches(jobs, batch_size)
+        if workers <= 1 or len(batches) == 1:
+            for batch in batches:
+                errors = _convert_batch_libreoffice(soffice, batch, timeout)
+                for source, pdf_path in batch:
+                    record(source, pdf_path, errors[source])
+            return results
+        
+        profile_root = tempfile.mkdtemp(prefix="lo-profiles-")
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(batches)), initializer=_init_worker,
+                                     initargs=(profile_root,)) as executor:
+                futures = {
+                    executor.submit(_convert_batch_libreoffice, soffice, batch, timeout): batch for batch in batches
+                }
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    try:
+                        errors = future.result()
+                    except Exception as e:
+                        errors = {source: str(e) for source, _ in batch}
+                    for source, pdf_path in batch:
+                        record(source, pdf_path, errors[source])
+        finally:
+            shutil.rmtree(profile_root, ignore_errors=True)
+        return results
+    finally:
+        progress_bar.close()
+
+def convert_docx_to_pdf(input_path, output_path=None, backend=DEFAULT_BACKEND, timeout=DEFAULT_TIMEOUT):
     """
     Convert a single DOCX file to PDF
     
     Args:
         input_path: Path to the DOCX file
         output_path: Path where the PDF will be saved (optional)
+        backend: Conversion backend (see BACKENDS)
+        timeout: Seconds allowed for the conversion
     
     Returns:
         Path to the created PDF file
     """
     try:
-        if output_path is None:
-            output_path = str(input_path).replace('.docx', '.pdf')
-        
-        convert(input_path, output_path)
-        return output_path
+        input_path = Path(input_path)
+        output_path = Path(output_path) if output_path is not None else pdf_path_for(input_path)
+        backend = resolve_backend(backend)
+        if backend == "docx2pdf":
+            error = _convert_docx2pdf(input_path, output_path)
+        else:
+            output_path.parent.mkdir(exist_ok=True, parents=True)
+            error = _convert_batch_libreoffice(find_soffice(), [(input_path, output_path)], timeout)[input_path]
+        if error is not None:
+            raise RuntimeError(error)
+        return str(output_path)
     except Exception as e:
         print(f"Error converting {input_path}: {str(e)}")
         return None
 
-def process_directory(directory_path):
+def process_directory(directory_path, output_dir=None, backend=DEFAULT_BACKEND, workers=DEFAULT_WORKERS,
+                      batch_size=DEFAULT_BATCH_SIZE, timeout=DEFAULT_TIMEOUT, force=False):
     """
-    Process all DOCX files in a directory and its subdirectories
+    Process all DOCX and DOC files in a directory and its subdirectories
     
     Args:
         directory_path: Path to the directory containing DOCX files
+        output_dir: Directory receiving the PDFs (next to each source by default)
+        backend: Conversion backend (see BACKENDS)
+        workers: LibreOffice worker processes
+        batch_size: Files converted per soffice run
+        timeout: Seconds allowed per soffice run
+        force: Convert files even if their PDF is up to date
     """
     directory = Path(directory_path)
     if not directory.exists():
         print(f"Directory not found: {directory_path}")
         return
     
-    # Find all DOCX files
-    docx_files = list(directory.glob('**/*.docx'))
+    # Find all DOCX and DOC files
+    docx_files = sorted(
+        path for path in directory.glob('**/*')
+        if path.is_file() and path.suffix.lower() in CONVERTIBLE_EXTENSIONS
+    )
     
     if not docx_files:
         print(f"No DOCX files found in {directory_path}")
         return
     
-    print(f"Found {len(docx_files)} DOCX files to convert")
-    
-    # Convert each file with a progress bar
-    successful = 0
-    failed = 0
+    try:
+        print(f"Found {len(docx_files)} DOCX/DOC files to convert ({resolve_backend(backend)})")
+        results = convert_documents(docx_files, output_dir=output_dir, backend=backend, workers=workers,
+                                    batch_size=batch_size, timeout=timeout, force=force, progress=True)
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {str(e)}")
+        return
     
-    for docx_file in tqdm(docx_files, desc="Converting"):
-        pdf_path = str(docx_file).replace('.docx', '.pdf')
-        try:
-            convert_docx_to_pdf(str(docx_file), pdf_path)
-            successful += 1
-        except Exception as e:
-            print(f"\nFailed to convert {docx_file}: {str(e)}")
-            failed += 1
+    successful = sum(1 for pdf_path in results.values() if pdf_path is not None)
+    failed = len(results) - successful
+    for source, pdf_path in results.items():
+        if pdf_path is None:
+            print(f"Failed to convert {source}")
     
     print(f"\nConversion complete: {successful} successful, {failed} failed")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        data_dir = sys.argv[1]
-    else:
-        # Default to 'Data' folder in the current directory
-        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Data')
-    
-    print(f"Processing DOCX files in: {data_dir}")
-    process_directory(data_dir)
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Convert DOCX/DOC files to PDF")
+    parser.add_argument("directory", nargs="?",
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Data'),
+                        help="Directory searched recursively for DOCX/DOC files (default: Data)")
+    parser.add_argument("--output-dir", type=Path, default=None,
+                        help="Directory receiving the PDFs (default: next to each source)")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="Converter: headless LibreOffice, docx2pdf (needs Microsoft Word), "
+                             "or auto (LibreOffice when installed)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="LibreOffice worker processes")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Files converted per soffice run")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds allowed per soffice run")
+    parser.add_argument("--force", action="store_true", help="Convert files even if their PDF is up to date")
+    args = parser.parse_args()
+    
+    print(f"Processing DOCX files in: {args.directory}")
+    process_directory(args.directory, output_dir=args.output_dir, backend=args.backend, workers=args.workers,
+                      batch_size=args.batch_size, timeout=args.timeout, force=args.force)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# JSON Lines corpus of extracted document texts
+# One JSON record per line plus an offset index, so a corpus can be written
+# document by document, appended to, streamed, or read one document at a time
+# without parsing the rest.
+
+import os
+import ast
+import json
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# The index lives next to the corpus: documents_texts.jsonl -> documents_texts.jsonl.idx
+INDEX_SUFFIX = ".idx"
+
+def index_path_for(corpus_path: Path) -> Path:
+    """Get the path of a corpus's offset index"""
+    corpus_path = Path(corpus_path)
+    return corpus_path.with_name(corpus_path.name + INDEX_SUFFIX)
+
+def _write_index(corpus_path: Path, offsets: Dict[str, Tuple[int, int]]):
+    """Write the offset index atomically, stamped with the corpus size and mtime"""
+    stats = os.stat(corpus_path)
+    index = {
+        "corpus_size": stats.st_size,
+        "corpus_mtime": stats.st_mtime,
+        "documents": {name: list(span) for name, span in offsets.items()}
+    }
+    index_path = index_path_for(corpus_path)
+    fd, tmp_path = tempfile.mkstemp(dir=index_path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def build_index(corpus_path: Path) -> Dict[str, Tuple[int, int]]:
+    """
+    Scan a corpus and record the byte offset and length of every record.
+    
+    Args:
+        corpus_path: Path to the JSONL corpus
+    
+    Returns:
+        Dictionary mapping document names to (offset, length); a name that
+        appears more than once maps to its last record
+    """
+    offsets = {}
+    offset = 0
+    with open(corpus_path, "rb") as f:
+        for line in f:
+            if line.strip():
+                offsets[json.loads(line)["name"]] = (offset, len(line))
+            offset += len(line)
+    return offsets
+
+class CorpusWriter:
+    """
+    Write document texts to a JSONL corpus one record at a time.
+    
+    Each record is {"name": ..., "text": ..., plus any extra fields}. A new
+    corpus is written under a temporary name and renamed into place on
+    close(), so readers never see a partial corpus; with append=True records
+    are added to the existing corpus. The offset index is rewritten on close().
+    """
+    
+    def __init__(self, corpus_path: Path, append: bool = False):
+        self.corpus_path = Path(corpus_path)
+        self.corpus_path.parent.mkdir(exist_ok=True, parents=True)
+        self.append = append and self.corpus_path.exists()
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+        if self.append:
+            self.offsets = CorpusReader(self.corpus_path).offsets
+            self._write_path = self.corpus_path
+            self._file = open(self._write_path, "ab")
+        else:
+            fd, tmp_path = tempfile.mkstemp(dir=self.corpus_path.parent, suffix=".tmp")
+            self._write_path = Path(tmp_path)
+            self._file = os.fdopen(fd, "wb")
+        self._offset = self._file.seek(0, os.SEEK_END)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+    
+    def __len__(self) -> int:
+        return len(self.offsets)
+    
+    def add(self, name: str, text: str, **fields):
+        """
+        Append a document to the corpus.
+        
+        Args:
+            name: Name used to look the document up (e.g. the input file name)
+            text: Extracted text
+            **fields: Extra JSON-serializable fields stored in the record
+        """
+        record = {"name": name, "text": text, **fields}
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        self._file.write(line)
+        self.offsets[name] = (self._offset, len(line))
+        self._offset += len(line)
+    
+    def close(self) -> Path:
+        """Finish the corpus and write its index"""
+        self._file.close()
+        if self._write_path != self.corpus_path:
+            os.replace(self._write_path, self.corpus_path)
+        _write_index(self.corpus_path, self.offsets)
+        return self.corpus_path
+    
+    def abort(self):
+        """Stop writing; a new corpus is discarded, appended records are kept"""
+        self._file.close()
+        if self._write_path != self.corpus_path:
+            if self._write_path.exists():
+                self._write_path.unlink()
+        else:
+            _write_index(self.corpus_path, self.offsets)
+
+class CorpusReader:
+    """
+    Read a JSONL corpus written by CorpusWriter.
+    
+    The offset index is used when it matches the corpus's size and mtime and
+    rebuilt by a single scan otherwise (e.g. after the corpus was appended to
+    by another tool).
+    """
+    
+    def __init__(self, corpus_path: Path):
+        self.corpus_path = Path(corpus_path)
+        self.offsets = self._load_index()
+    
+    def _load_index(self) -> Dict[str, Tuple[int, int]]:
+        stats = os.stat(self.corpus_path)
+        try:
+            with open(index_path_for(self.corpus_path), "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index["corpus_size"] == stats.st_size and index["corpus_mtime"] == stats.st_mtime:
+                return {name: tuple(span) for name, span in index["documents"].items()}
+            logger.info(f"Index of {self.corpus_path} is out of date, rebuilding it")
+        except (OSError, ValueError, KeyError):
+            logger.info(f"No usable index for {self.corpus_path}, building it")
+        offsets = build_index(self.corpus_path)
+        try:
+            _write_index(self.corpus_path, offsets)
+        except OSError as e:
+            logger.warning(f"Could not save the index of {self.corpus_path}: {str(e)}")
+        return offsets
+    
+    def __len__(self) -> int:
+        return len(self.offsets)
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self.offsets
+    
+    def names(self) -> List[str]:
+        """Get the document names in corpus order"""
+        return sorted(self.offsets, key=lambda name: self.offsets[name][0])
+    
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Read one document's record without parsing the rest of the corpus.
+        
+        Args:
+            name: Document name
+        
+        Returns:
+            The record, or None if the corpus has no such document
+        """
+        span = self.offsets.get(name)
+        if span is None:
+            return None
+        offset, length = span
+        with open(self.corpus_path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Stream every record in corpus order"""
+        with open(self.corpus_path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def convert_repr_file(repr_path: Path, corpus_path: Path) -> int:
+    """
+    Convert a legacy documents_texts.txt (a repr() of a list of
+    "Document N: name\\ntext" strings) into a JSONL corpus.
+    
+    Args:
+        repr_path: Path to the repr() dump
+        corpus_path: Path of the corpus to create
+    
+    Returns:
+        Number of documents converted
+    """
+    with open(repr_path, "r", encoding="utf-8") as f:
+        documents_texts = ast.literal_eval(f.read())
+    
+    with CorpusWriter(corpus_path) as writer:
+        for i, document_text in enumerate(documents_texts, 1):
+            header, _, text = document_text.partition("\n")
+            prefix = f"Document {i}: "
+            name = header[len(prefix):] if header.startswith(prefix) else header
+            writer.add(name, text)
+        return len(writer)
+
+def main():
+    """Inspect a corpus or convert a legacy repr() dump"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Read JSONL document text corpora")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list", help="List the documents of a corpus")
+    list_parser.add_argument("corpus", type=Path)
+    get_parser = subparsers.add_parser("get", help="Print one document's text")
+    get_parser.add_argument("corpus", type=Path)
+    get_parser.add_argument("name", help="Document name, e.g. report.pdf")
+    convert_parser = subparsers.add_parser("convert", help="Convert a repr() dump such as documents_texts.txt")
+    convert_parser.add_argument("repr_file", type=Path)
+    convert_parser.add_argument("corpus", type=Path)
+    args = parser.parse_args()
+    
+    if args.command == "convert":
+        count = convert_repr_file(args.repr_file, args.corpus)
+        print(f"Converted {count} documents to {args.corpus}")
+        return
+    
+    reader = CorpusReader(args.corpus)
+    if args.command == "list":
+        for name in reader.names():
+            print(name)
+    else:
+        record = reader.get(args.name)
+        if record is None:
+            print(f"Error: no document named '{args.name}' in {args.corpus}")
+            raise SystemExit(1)
+        print(record["text"])
+
+if __name__ == "__main__":
+    main()
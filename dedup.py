@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# Duplicate and near-duplicate detection for input documents
+# Finds input files that repeat a document a pipeline has already processed,
+# either byte for byte (same SHA-256) or with nearly the same text (MinHash
+# signatures of word shingles), so the pipeline can reuse that document's
+# output instead of sending the file to the OCR or partitioning API again.
+
+import os
+import re
+import html
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pypdf import PdfReader
+from tabulate import tabulate
+
+from utils import compute_file_hash
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Index file, kept in each pipeline's output root next to its manifest
+DEDUP_FILENAME = "dedup.sqlite3"
+
+# "exact" reuses outputs of byte-identical files, "near" also of files with nearly the same text
+DEDUP_MODES = ["off", "exact", "near"]
+DEFAULT_DEDUP_MODE = "exact"
+
+# Estimated Jaccard similarity of the word shingles above which two documents
+# are near-duplicates. In Data/, the DOCX copies and the DOC/DOCX and
+# DOCX/PDF versions of a document score 0.8-1.0; distinct documents stay below 0.2.
+DEFAULT_THRESHOLD = 0.75
+
+# Words per shingle
+SHINGLE_WORDS = 5
+
+# MinHash signature length, split into LSH bands of NUM_PERMUTATIONS / LSH_BANDS values
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+
+# Documents with fewer words get no signature and are only matched exactly
+MIN_WORDS = 50
+
+# Shingle hashes processed per step when computing a signature (bounds memory)
+MINHASH_BLOCK = 8192
+
+# Universal hashing (a * x + b) mod p with fixed parameters, so signatures
+# stored by one run compare with those of the next
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+_random = np.random.RandomState(20250315)
+PERMUTATION_A = _random.randint(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+PERMUTATION_B = _random.randint(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+# Worker processes fingerprinting a batch of files
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+# Fingerprints kept in memory per index, least recently used dropped first
+FINGERPRINT_CACHE_SIZE = 4096
+
+# Printable runs in legacy .doc files: 8-bit (Windows-1252) and UTF-16LE text
+DOC_TEXT_PATTERN = re.compile(rb"[\x20-\x7e\x91-\x97\r\n\t]{4,}")
+DOC_UTF16_PATTERN = re.compile(rb"(?:[\x20-\x7e\r\n\t]\x00){4,}")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    words INTEGER,
+    signature BLOB,
+    output TEXT NOT NULL,
+    output_size INTEGER,
+    output_mtime_ns INTEGER,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS documents_by_hash ON documents (content_hash);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, path)
+);
+CREATE INDEX IF NOT EXISTS bands_by_path ON bands (path);
+"""
+
+def extract_text(file_path: Path) -> str:
+    """
+    Extract the text of an input document locally, without any API call.
+    
+    PDFs are read with pypdf (scanned PDFs without a text layer yield no
+    text), DOCX files from word/document.xml, and legacy DOC files by
+    collecting their printable 8-bit or UTF-16 runs, whichever is longer.
+    
+    Args:
+        file_path: PDF, DOCX or DOC file
+    
+    Returns:
+        The extracted text, or an empty string if none could be read
+    """
+    file_path = Path(file_path)
+    suffix = file_path.suffix.lower()
+    try:
+        if suffix == ".pdf":
+            return "\n".join(page.extract_text() or "" for page in PdfReader(str(file_path)).pages)
+        if suffix == ".docx":
+            with zipfile.ZipFile(file_path) as archive:
+                xml = archive.read("word/document.xml").decode("utf-8", errors="replace")
+            xml = re.sub(r"</w:p>|<w:br/>|<w:tab/>", "\n", xml)
+            return html.unescape(re.sub(r"<[^>]+>", "", xml))
+        if suffix == ".doc":
+            data = file_path.read_bytes()
+            text = " ".join(run.decode("cp1252", errors="replace") for run in DOC_TEXT_PATTERN.findall(data))
+            utf16_text = " ".join(run.decode("utf-16-le") for run in DOC_UTF16_PATTERN.findall(data))
+            return text if len(text) >= len(utf16_text) else utf16_text
+    except Exception as e:
+        logger.warning(f"Could not extract text from {file_path.name}: {str(e)}")
+    return ""
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Hash the distinct SHINGLE_WORDS-word shingles of a text to 32-bit values"""
+    words = re.findall(r"\w+", text.lower())
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+def minhash(hashes: np.ndarray) -> np.ndarray:
+    """
+    Compute the MinHash signature of a set of shingle hashes.
+    
+    With 32-bit inputs and parameters, a * x + b stays below 2**64, so the
+    permutations are evaluated exactly in uint64.
+    """
+    signature = np.full(NUM_PERMUTATIONS, MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(hashes), MINHASH_BLOCK):
+        block = hashes[start:start + MINHASH_BLOCK]
+        values = (np.outer(PERMUTATION_A, block) + PERMUTATION_B[:, None]) % MERSENNE_PRIME & MAX_HASH
+        signature = np.minimum(signature, values.min(axis=1))
+    return signature.astype(np.uint32)
+
+def similarity(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    """Estimate the Jaccard similarity of two documents from their signatures"""
+    return float(np.mean(signature_a == signature_b))
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    """Hash each LSH band of a signature; documents sharing a bucket are compared"""
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    return [
+        int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest(),
+                       "big", signed=True)
+        for band in range(LSH_BANDS)
+    ]
+
+def fingerprint(file_path: Path, with_text: bool = True) -> Dict[str, Any]:
+    """
+    Fingerprint an input document.
+    
+    Args:
+        file_path: Input file
+        with_text: Extract the text and compute its signature; without it
+            only the content hash is computed
+    
+    Returns:
+        Dictionary with the path, content_hash (SHA-256 of the bytes), words
+        (extracted word count, None without text) and signature (MinHash of
+        the text, or None without text or for documents with fewer than
+        MIN_WORDS words)
+    """
+    fp = {
+        "path": Path(file_path),
+        "content_hash": compute_file_hash(str(file_path)),
+        "words": None,
+        "signature": None,
+    }
+    if with_text:
+        text = extract_text(file_path)
+        fp["words"] = len(re.findall(r"\w+", text))
+        if fp["words"] >= MIN_WORDS:
+            fp["signature"] = minhash(shingle_hashes(text))
+    return fp
+
+class DuplicateIndex:
+    """
+    SQLite index of processed input documents and their outputs.
+    
+    Each row is an input file a pipeline processed successfully, with its
+    content hash, MinHash signature and the output it produced, stamped
+    with the output's size and mtime. Outputs can be shared by several inputs
+    (Mistral writes "report.doc" and "report.docx" to the same directory),
+    so an output that changed since it was recorded belongs to another input
+    and is not reused. "exact" mode
+    only hashes the files; the text is extracted and signed in "near" mode
+    alone, so documents indexed by an "exact" run are only matched exactly
+    by a later "near" run. find() looks a new file up by content hash and,
+    in "near" mode, by signature through LSH band buckets, so only likely
+    matches are compared. group() does the
+    same within a batch of files that have not been processed yet. Like the
+    ingestion manifest, the database runs in WAL mode and a single instance
+    can be shared between threads.
+    """
+    
+    def __init__(self, db_path: Path, mode: str = DEFAULT_DEDUP_MODE, threshold: float = DEFAULT_THRESHOLD):
+        self.db_path = Path(db_path)
+        self.mode = mode
+        self.threshold = threshold
+        self.db_path.parent.mkdir(exist_ok=True, parents=True)
+        self._fingerprints: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            # Indexes created before outputs were stamped; their unstamped rows are never reused
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(documents)")}
+            for column in ("output_size", "output_mtime_ns"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE documents ADD COLUMN {column} INTEGER")
+            self._conn.commit()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    @staticmethod
+    def _key(file_path: Path) -> str:
+        return str(Path(file_path).resolve())
+    
+    def _cache_key(self, file_path: Path) -> tuple:
+        stats = Path(file_path).stat()
+        return self._key(file_path), stats.st_size, stats.st_mtime_ns
+    
+    def _remember(self, cache_key: tuple, fp: Dict[str, Any]):
+        """Cache a fingerprint, dropping the least recently used ones beyond FINGERPRINT_CACHE_SIZE"""
+        with self._lock:
+            self._fingerprints[cache_key] = fp
+            self._fingerprints.move_to_end(cache_key)
+            while len(self._fingerprints) > FINGERPRINT_CACHE_SIZE:
+                self._fingerprints.popitem(last=False)
+    
+    def fingerprint(self, file_path: Path) -> Dict[str, Any]:
+        """Fingerprint a file, reusing the result while its size and mtime are unchanged"""
+        cache_key = self._cache_key(file_path)
+        with self._lock:
+            cached = self._fingerprints.get(cache_key)
+            if cached is not None:
+                self._fingerprints.move_to_end(cache_key)
+        if cached is None:
+            cached = fingerprint(file_path, with_text=self.mode == "near")
+            self._remember(cache_key, cached)
+        return cached
+    
+    def prefetch(self, files: List[Path], workers: int = DEFAULT_WORKERS):
+        """Fingerprint a batch of files, in worker processes when their text is signed ("near" mode)"""
+        with self._lock:
+            files = [Path(file_path) for file_path in files
+                     if self._cache_key(file_path) not in self._fingerprints]
+        if workers <= 1 or len(files) <= 1 or self.mode != "near":
+            for file_path in files:
+                self.fingerprint(file_path)
+            return
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+            for file_path, result in zip(files, executor.map(fingerprint, files)):
+                self._remember(self._cache_key(file_path), result)
+    
+    @staticmethod
+    def _output_unchanged(row: sqlite3.Row) -> bool:
+        """Check that a recorded output still exists and is the one its input produced"""
+        try:
+            stats = os.stat(row["output"])
+        except OSError:
+            return False
+        return (row["output_size"], row["output_mtime_ns"]) == (stats.st_size, stats.st_mtime_ns)
+    
+    def find(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """
+        Find an indexed document a file duplicates.
+        
+        Exact matches win over near matches; among near matches the most
+        similar one is returned. Documents whose output has disappeared or
+        was overwritten since it was recorded (e.g. by another input with the
+        same stem) and the file itself are never returned.
+        
+        Args:
+            file_path: Input file
+        
+        Returns:
+            Dictionary with the canonical document's path and output, the
+            kind of match ("exact" or "near") and the estimated similarity,
+            or None if the file is not a duplicate
+        """
+        if self.mode == "off":
+            return None
+        fp = self.fingerprint(file_path)
+        key = self._key(file_path)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, output, output_size, output_mtime_ns FROM documents "
+                "WHERE content_hash = ? AND path != ? ORDER BY updated_at",
+                (fp["content_hash"], key)
+            ).fetchall()
+        for row in rows:
+            if self._output_unchanged(row):
+                return {"path": Path(row["path"]), "output": Path(row["output"]), "kind": "exact", "similarity": 1.0}
+        
+        if self.mode != "near" or fp["signature"] is None:
+            return None
+        buckets = band_buckets(fp["signature"])
+        conditions = " OR ".join("(b.band = ? AND b.bucket = ?)" for _ in buckets)
+        parameters = [value for band, bucket in enumerate(buckets) for value in (band, bucket)]
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT d.path, d.output, d.output_size, d.output_mtime_ns, d.signature "
+                f"FROM bands b JOIN documents d ON d.path = b.path WHERE ({conditions}) AND d.path != ?",
+                (*parameters, key)
+            ).fetchall()
+        best = None
+        for row in rows:
+            score = similarity(fp["signature"], np.frombuffer(row["signature"], dtype=np.uint32))
+            if score >= self.threshold and (best is None or score > best["similarity"]) \
+                    and self._output_unchanged(row):
+                best = {"path": Path(row["path"]), "output": Path(row["output"]), "kind": "near", "similarity": score}
+        return best
+    
+    def group(self, files: List[Path], workers: int = DEFAULT_WORKERS) -> Dict[Path, Dict[str, Any]]:
+        """
+        Find the duplicates in a batch of files.
+        
+        Each file is first looked up in the index. The remaining files are
+        compared with each other; within each group of duplicates the file
+        with the most words (then the first by name) is the canonical one,
+        processed normally, and the others can reuse its output afterwards.
+        
+        Args:
+            files: Input files about to be processed
+            workers: Processes fingerprinting the files
+        
+        Returns:
+            Mapping of each duplicate file to its match, as returned by
+            find(); "output" is None when the canonical document is part of
+            the batch and has no output yet
+        """
+        if self.mode == "off" or not files:
+            return {}
+        self.prefetch(files, workers=workers)
+        duplicates = {}
+        remaining = []
+        for file_path in files:
+            match = self.find(file_path)
+            if match is not None:
+                duplicates[file_path] = match
+            else:
+                remaining.append(file_path)
+        
+        canonical_by_hash = {}
+        canonical_by_bucket = {}
+        fingerprints = {file_path: self.fingerprint(file_path) for file_path in remaining}
+        for file_path in sorted(remaining, key=lambda path: (-(fingerprints[path]["words"] or 0), path.name)):
+            fp = fingerprints[file_path]
+            canonical = canonical_by_hash.get(fp["content_hash"])
+            if canonical is not None:
+                duplicates[file_path] = {"path": canonical, "output": None, "kind": "exact", "similarity": 1.0}
+                continue
+            
+            best = None
+            buckets = band_buckets(fp["signature"]) if fp["signature"] is not None else []
+            candidates = set()
+            if self.mode == "near":
+                candidates = {path for band, bucket in enumerate(buckets)
+                              for path in canonical_by_bucket.get((band, bucket), [])}
+            for candidate in sorted(candidates):
+                score = similarity(fp["signature"], fingerprints[candidate]["signature"])
+                if score >= self.threshold and (best is None or score > best["similarity"]):
+                    best = {"path": candidate, "output": None, "kind": "near", "similarity": score}
+            if best is not None:
+                duplicates[file_path] = best
+                continue
+            
+            canonical_by_hash[fp["content_hash"]] = file_path
+            for band, bucket in enumerate(buckets):
+                canonical_by_bucket.setdefault((band, bucket), []).append(file_path)
+        return duplicates
+    
+    def add(self, file_path: Path, output_path: Path):
+        """
+        Record a processed document and the output it produced.
+        
+        Call it once the output is complete: the output's current size and
+        mtime identify it as this document's.
+        
+        Args:
+            file_path: Input file
+            output_path: Output later duplicates reuse (element file or ocr_response.json)
+        """
+        fp = self.fingerprint(file_path)
+        key = self._key(file_path)
+        signature = fp["signature"]
+        output_stats = os.stat(output_path)
+        with self._lock:
+            self._conn.execute("DELETE FROM bands WHERE path = ?", (key,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(path, content_hash, words, signature, output, output_size, output_mtime_ns, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, fp["content_hash"], fp["words"], signature.tobytes() if signature is not None else None,
+                 str(Path(output_path).resolve()), output_stats.st_size, output_stats.st_mtime_ns, time.time())
+            )
+            if signature is not None:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO bands (band, bucket, path) VALUES (?, ?, ?)",
+                    [(band, bucket, key) for band, bucket in enumerate(band_buckets(signature))]
+                )
+            self._conn.commit()
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+def main():
+    """Report the duplicate and near-duplicate documents in a directory"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Find duplicate and near-duplicate input documents")
+    parser.add_argument("directory", type=Path, help="Directory with PDF/DOCX/DOC files, e.g. Data")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Similarity above which documents are near-duplicates (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--exact", action="store_true", help="Only report byte-identical files")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Processes fingerprinting the files")
+    args = parser.parse_args()
+    
+    files = sorted(path for path in args.directory.iterdir()
+                   if path.is_file() and path.suffix.lower() in (".pdf", ".docx", ".doc"))
+    # An in-memory index: only duplicates within the directory are reported
+    index = DuplicateIndex(":memory:", mode="exact" if args.exact else "near", threshold=args.threshold)
+    with index:
+        duplicates = index.group(files, workers=args.workers)
+    rows = [[file_path.name, match["path"].name, match["kind"], f"{match['similarity']:.2f}"]
+            for file_path, match in sorted(duplicates.items())]
+    print(tabulate(rows, headers=["Duplicate", "Canonical", "Match", "Similarity"], tablefmt="pretty"))
+    print(f"{len(duplicates)} of {len(files)} files duplicate another document")
+
+if __name__ == "__main__":
+    main()
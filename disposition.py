@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# Disposition of input files after processing
+# Places each processed or failed input file in processed_files/ or
+# error_files/ by copying, moving, hard-linking or reflinking it, or leaves it
+# in place and relies on the ingestion manifest alone.
+
+import os
+import errno
+import shutil
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Strategies for placing an input file in processed_files/ or error_files/:
+#   copy      write a second copy of the bytes (the original behavior)
+#   move      rename the input into place; it leaves the input directory
+#   hardlink  add a second name for the same bytes (same filesystem only)
+#   reflink   copy-on-write clone (Btrfs, XFS, ...), independent of the input
+#   manifest  write nothing; the manifest records the outcome
+DISPOSITIONS = ["copy", "move", "hardlink", "reflink", "manifest"]
+DEFAULT_DISPOSITION = "copy"
+
+# ioctl request cloning a whole file (from <linux/fs.h>)
+FICLONE = 0x40049409
+
+# Errors meaning a link or clone is not possible between these two paths
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EMLINK}
+
+_warned = set()
+_warned_lock = threading.Lock()
+
+def _warn_fallback(strategy: str, error: OSError):
+    """Log a strategy's fallback to copying once per run rather than once per file"""
+    with _warned_lock:
+        if strategy in _warned:
+            return
+        _warned.add(strategy)
+    logger.warning(f"Cannot {strategy} files here ({error.strerror or error}); copying instead")
+
+def _temporary_path(destination: Path) -> Path:
+    return destination.with_name(f".{destination.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+def _place(destination: Path, create):
+    """Create a file under a temporary name and rename it over the destination"""
+    tmp_path = _temporary_path(destination)
+    try:
+        create(tmp_path)
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+def copy_atomic(source: Path, destination: Path):
+    """
+    Copy a file so that readers (including other worker processes) never
+    see a partial copy: the data is written under a temporary name and
+    renamed into place.
+    """
+    _place(destination, lambda tmp_path: shutil.copy2(source, tmp_path))
+
+def _reflink(source: Path, tmp_path: Path):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported on this platform")
+    with open(source, "rb") as src, open(tmp_path, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(source, tmp_path)
+
+def dispose(source: Path, destination_dir: Path, strategy: str = DEFAULT_DISPOSITION) -> Optional[Path]:
+    """
+    Place an input file in processed_files/ or error_files/.
+    
+    Links and clones that the filesystem does not support (e.g. across
+    devices) fall back to a copy.
+    
+    Args:
+        source: Input file
+        destination_dir: Directory receiving the file
+        strategy: One of DISPOSITIONS
+    
+    Returns:
+        Path of the placed file, or None with the "manifest" strategy
+    """
+    if strategy not in DISPOSITIONS:
+        raise ValueError(f"Unknown disposition: {strategy}")
+    if strategy == "manifest":
+        return None
+    
+    source = Path(source)
+    destination = Path(destination_dir) / source.name
+    if strategy == "move":
+        try:
+            os.replace(source, destination)
+            return destination
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            _warn_fallback("move", e)
+            copy_atomic(source, destination)
+            source.unlink()
+            return destination
+    
+    if strategy in ("hardlink", "reflink"):
+        try:
+            if strategy == "hardlink":
+                _place(destination, lambda tmp_path: os.link(source, tmp_path))
+            else:
+                _place(destination, lambda tmp_path: _reflink(source, tmp_path))
+            return destination
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRNOS:
+                raise
+            _warn_fallback(strategy, e)
+    
+    copy_atomic(source, destination)
+    return destination
+
+def describe(strategy: str, destination: Optional[Path]) -> str:
+    """Describe a disposition for log messages, e.g. "File copied to processed_files/a.pdf" """
+    if destination is None:
+        return "File left in place (outcome recorded in the manifest)"
+    if strategy == "copy":
+        return f"File copied to {destination}"
+    return f"File placed in {destination} ({strategy})"
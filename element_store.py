@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# Columnar element store for Unstructured.io outputs
+# Converts the per-document element JSON arrays into a single Parquet file in
+# which repeated metadata (file name, type, languages, data source) is
+# dictionary-encoded, so corpus-wide queries run vectorized in pandas instead
+# of looping over JSON files. The conversion is reversible.
+
+import os
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+# pandas and pyarrow are optional; without them the store is unavailable
+try:
+    import pandas as pd
+    import pyarrow  # noqa: F401  (Parquet engine used by pandas)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    pd = None
+    PARQUET_AVAILABLE = False
+
+from utils import format_file_size, iter_json_array
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Default locations, next to the element files they are built from
+DEFAULT_JSON_DIR = Path("unstructured_json")
+DEFAULT_STORE_PATH = DEFAULT_JSON_DIR / "elements.parquet"
+
+# Parquet compression codec
+DEFAULT_COMPRESSION = "zstd"
+
+# Top-level element fields stored as columns
+ELEMENT_COLUMNS = ["type", "element_id", "text"]
+
+# Metadata fields stored as their own columns; lists and dicts are stored as
+# JSON text. Any other metadata field goes to the metadata_extra column.
+METADATA_COLUMNS = ["filetype", "languages", "page_number", "filename", "parent_id",
+                    "category_depth", "text_as_html", "links", "data_source"]
+JSON_METADATA_COLUMNS = {"languages", "links", "data_source"}
+
+# Columns whose values repeat across elements; stored as categoricals, which
+# Parquet writes dictionary-encoded
+CATEGORICAL_COLUMNS = ["document", "type", "filetype", "languages", "filename", "data_source"]
+INTEGER_COLUMNS = {"element_index": "int32", "page_number": "Int32", "category_depth": "Int16"}
+
+def require_parquet():
+    """Raise a helpful error when pandas or pyarrow is missing"""
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("The element store requires pandas and pyarrow (pip install pandas pyarrow)")
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+def element_rows(document: str, elements: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    """
+    Flatten a document's elements into rows of the element store.
+    
+    Args:
+        document: Name of the element file the elements come from
+        elements: Elements as produced by Unstructured.io
+    
+    Yields:
+        One dictionary per element, keyed by column name
+    """
+    for index, element in enumerate(elements):
+        row = {"document": document, "element_index": index}
+        for column in ELEMENT_COLUMNS:
+            row[column] = element.get(column)
+        extra = {key: value for key, value in element.items() if key not in ELEMENT_COLUMNS and key != "metadata"}
+        row["element_extra"] = _dumps(extra) if extra else None
+        
+        metadata = element.get("metadata") or {}
+        for column in METADATA_COLUMNS:
+            value = metadata.get(column)
+            if column in JSON_METADATA_COLUMNS and value is not None:
+                value = _dumps(value)
+            row[column] = value
+        extra = {key: value for key, value in metadata.items() if key not in METADATA_COLUMNS}
+        row["metadata_extra"] = _dumps(extra) if extra else None
+        yield row
+
+def build_frame(rows: List[Dict[str, Any]]) -> "pd.DataFrame":
+    """Build the element store DataFrame with compact column types"""
+    require_parquet()
+    columns = ["document", "element_index"] + ELEMENT_COLUMNS + METADATA_COLUMNS + ["element_extra", "metadata_extra"]
+    frame = pd.DataFrame(rows, columns=columns)
+    for column in CATEGORICAL_COLUMNS:
+        frame[column] = frame[column].astype("category")
+    for column, dtype in INTEGER_COLUMNS.items():
+        frame[column] = frame[column].astype(dtype)
+    return frame
+
+def export_elements(json_dir: Path = DEFAULT_JSON_DIR, store_path: Path = DEFAULT_STORE_PATH,
+                    compression: str = DEFAULT_COMPRESSION) -> Dict[str, Any]:
+    """
+    Convert every element JSON file in a directory into one Parquet file.
+    
+    Element files are streamed, so only the flattened rows are held in memory.
+    
+    Args:
+        json_dir: Directory containing the Unstructured.io JSON files
+        store_path: Parquet file to write
+        compression: Parquet compression codec
+    
+    Returns:
+        Dictionary with the number of documents and elements and the sizes
+        of the JSON files and the store
+    """
+    require_parquet()
+    json_dir = Path(json_dir)
+    store_path = Path(store_path)
+    start_time = time.time()
+    
+    rows = []
+    json_bytes = 0
+    json_files = sorted(path for path in json_dir.glob("*.json") if path.is_file())
+    for json_path in json_files:
+        try:
+            rows.extend(element_rows(json_path.name, iter_json_array(json_path)))
+            json_bytes += json_path.stat().st_size
+        except Exception as e:
+            logger.error(f"Error reading elements from {json_path}: {str(e)}")
+    
+    frame = build_frame(rows)
+    store_path.parent.mkdir(exist_ok=True, parents=True)
+    tmp_path = store_path.with_name(f".{store_path.name}.{os.getpid()}.tmp")
+    frame.to_parquet(tmp_path, engine="pyarrow", compression=compression, index=False)
+    os.replace(tmp_path, store_path)
+    
+    stats = {
+        "documents": len(json_files),
+        "elements": len(frame),
+        "json_bytes": json_bytes,
+        "store_bytes": store_path.stat().st_size,
+        "seconds": round(time.time() - start_time, 3)
+    }
+    logger.info(
+        f"Exported {stats['elements']} elements from {stats['documents']} files to {store_path} "
+        f"({format_file_size(json_bytes)} of JSON -> {format_file_size(stats['store_bytes'])})"
+    )
+    return stats
+
+def load_elements(store_path: Path = DEFAULT_STORE_PATH, columns: Optional[List[str]] = None,
+                  filters: Optional[List[tuple]] = None) -> "pd.DataFrame":
+    """
+    Load the element store.
+    
+    Only the requested columns are read, and filters are applied while
+    reading (row groups that cannot match are skipped), e.g.
+    load_elements(filters=[("type", "==", "Table"), ("page_number", "==", 3)]).
+    
+    Args:
+        store_path: Parquet file written by export_elements()
+        columns: Columns to load (all by default)
+        filters: pyarrow filters, as (column, operator, value) tuples
+    
+    Returns:
+        DataFrame with one row per element
+    """
+    require_parquet()
+    return pd.read_parquet(store_path, engine="pyarrow", columns=columns, filters=filters)
+
+def row_to_element(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild an Unstructured.io element from a row of the element store"""
+    def present(value):
+        return not pd.isna(value)
+    
+    element = {column: row[column] for column in ELEMENT_COLUMNS if present(row[column])}
+    if present(row["element_extra"]):
+        element.update(json.loads(row["element_extra"]))
+    
+    metadata = {}
+    for column in METADATA_COLUMNS:
+        value = row[column]
+        if not present(value):
+            continue
+        if column in JSON_METADATA_COLUMNS:
+            value = json.loads(value)
+        elif column in INTEGER_COLUMNS:
+            value = int(value)
+        metadata[column] = value
+    if present(row["metadata_extra"]):
+        metadata.update(json.loads(row["metadata_extra"]))
+    element["metadata"] = metadata
+    return element
+
+def import_elements(store_path: Path = DEFAULT_STORE_PATH, output_dir: Path = DEFAULT_JSON_DIR,
+                    documents: Optional[List[str]] = None) -> int:
+    """
+    Write element JSON files back from the element store.
+    
+    Args:
+        store_path: Parquet file written by export_elements()
+        output_dir: Directory receiving one JSON file per document
+        documents: Only restore these documents (element file names)
+    
+    Returns:
+        Number of files written
+    """
+    filters = [("document", "in", documents)] if documents else None
+    frame = load_elements(store_path, filters=filters)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True, parents=True)
+    
+    count = 0
+    for document, group in frame.groupby("document", observed=True, sort=False):
+        elements = [row_to_element(row) for row in group.sort_values("element_index").to_dict("records")]
+        with open(output_dir / document, "w", encoding="utf-8") as f:
+            json.dump(elements, f, indent=4, ensure_ascii=False)
+        count += 1
+    logger.info(f"Restored {count} element files to {output_dir}")
+    return count
+
+def main():
+    """Export, query or restore the element store"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Columnar (Parquet) store of Unstructured.io elements")
+    parser.add_argument("--store", type=Path, default=DEFAULT_STORE_PATH,
+                        help=f"Parquet file of the element store (default: {DEFAULT_STORE_PATH})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    export_parser = subparsers.add_parser("export", help="Convert element JSON files into the store")
+    export_parser.add_argument("--json-dir", type=Path, default=DEFAULT_JSON_DIR,
+                               help=f"Directory of element JSON files (default: {DEFAULT_JSON_DIR})")
+    export_parser.add_argument("--compression", default=DEFAULT_COMPRESSION,
+                               help=f"Parquet compression codec (default: {DEFAULT_COMPRESSION})")
+    
+    import_parser = subparsers.add_parser("import", help="Write element JSON files back from the store")
+    import_parser.add_argument("output_dir", type=Path, help="Directory receiving the JSON files")
+    import_parser.add_argument("--document", action="append", default=None,
+                               help="Only restore this element file (repeatable)")
+    
+    query_parser = subparsers.add_parser("query", help="List elements matching a type and/or page")
+    query_parser.add_argument("--type", help="Element type, e.g. Table or Title")
+    query_parser.add_argument("--page", type=int, help="Page number")
+    query_parser.add_argument("--document", help="Element file name, e.g. report.pdf.json")
+    query_parser.add_argument("--limit", type=int, default=20, help="Maximum number of elements printed")
+    args = parser.parse_args()
+    
+    try:
+        require_parquet()
+    except RuntimeError as e:
+        print(f"Error: {str(e)}")
+        raise SystemExit(1)
+    
+    if args.command == "export":
+        stats = export_elements(args.json_dir, args.store, compression=args.compression)
+        print(f"Exported {stats['elements']} elements from {stats['documents']} files to {args.store}")
+        print(f"Size: {format_file_size(stats['json_bytes'])} of JSON -> {format_file_size(stats['store_bytes'])}")
+    elif args.command == "import":
+        count = import_elements(args.store, args.output_dir, documents=args.document)
+        print(f"Restored {count} element files to {args.output_dir}")
+    else:
+        filters = []
+        if args.type:
+            filters.append(("type", "==", args.type))
+        if args.page is not None:
+            filters.append(("page_number", "==", args.page))
+        if args.document:
+            filters.append(("document", "==", args.document))
+        frame = load_elements(args.store, columns=["document", "page_number", "type", "text"],
+                              filters=filters or None)
+        print(f"{len(frame)} matching elements")
+        for row in frame.head(args.limit).itertuples(index=False):
+            page = "-" if pd.isna(row.page_number) else row.page_number
+            print(f"{row.document} p.{page} [{row.type}] {row.text[:100]!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# Ingestion manifest shared by the Mistral OCR and Unstructured.io pipelines
+# Records, per input file, its content hash, mtime, the last stage reached and
+# the outcome, so interrupted runs resume and re-runs only touch new or
+# modified files.
+
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable
+
+from utils import compute_file_hash
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Outcomes recorded in the manifest
+OUTCOME_IN_PROGRESS = "in_progress"
+OUTCOME_SUCCESS = "success"
+OUTCOME_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    pipeline TEXT NOT NULL,
+    path TEXT NOT NULL,
+    content_hash TEXT,
+    size_bytes INTEGER,
+    modified_time REAL,
+    stage TEXT,
+    outcome TEXT,
+    error TEXT,
+    updated_at REAL,
+    PRIMARY KEY (pipeline, path)
+)
+"""
+
+class IngestionManifest:
+    """
+    Durable per-file journal backed by SQLite.
+    
+    The database runs in WAL mode and every update is committed immediately,
+    so the manifest reflects progress up to the last completed stage even if
+    the process is killed. A single instance can be shared between threads.
+    """
+    
+    def __init__(self, db_path: Path, pipeline: str):
+        self.db_path = Path(db_path)
+        self.pipeline = pipeline
+        self.db_path.parent.mkdir(exist_ok=True, parents=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(SCHEMA)
+            self._conn.commit()
+    
+    @staticmethod
+    def _key(file_path: Path) -> str:
+        return str(Path(file_path).resolve())
+    
+    def get(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """
+        Get the manifest entry for a file.
+        
+        Args:
+            file_path: Path to the input file
+            
+        Returns:
+            Dictionary with the recorded state, or None if the file is unknown
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM files WHERE pipeline = ? AND path = ?",
+                (self.pipeline, self._key(file_path))
+            ).fetchone()
+        return dict(row) if row else None
+    
+    def needs_processing(self, file_path: Path) -> bool:
+        """
+        Check whether a file is new, modified, or unfinished.
+        
+        Files whose size and mtime match a successful entry are skipped without
+        reading them. If only the mtime changed, the content hash decides.
+        
+        Args:
+            file_path: Path to the input file
+            
+        Returns:
+            True if the file must be (re)processed
+        """
+        entry = self.get(file_path)
+        if entry is None or entry["outcome"] != OUTCOME_SUCCESS:
+            return True
+        
+        stats = Path(file_path).stat()
+        if entry["size_bytes"] == stats.st_size and entry["modified_time"] == stats.st_mtime:
+            return False
+        
+        if entry["size_bytes"] != stats.st_size or compute_file_hash(file_path) != entry["content_hash"]:
+            return True
+        
+        # Same bytes with a new mtime (e.g. touched or copied again)
+        self._update(file_path, modified_time=stats.st_mtime)
+        return False
+    
+    def pending(self, files: Iterable[Path]) -> List[Path]:
+        """
+        Filter a list of files down to those that need processing.
+        
+        Args:
+            files: Candidate input files
+            
+        Returns:
+            Files that are new, modified, failed, or were interrupted
+        """
+        return [file_path for file_path in files if self.needs_processing(file_path)]
+    
+    def start(self, file_path: Path, content_hash: Optional[str] = None):
+        """Record that processing of a file has started"""
+        stats = Path(file_path).stat()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO files (pipeline, path, content_hash, size_bytes, modified_time,
+                                   stage, outcome, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, 'started', ?, NULL, ?)
+                ON CONFLICT (pipeline, path) DO UPDATE SET
+                    content_hash = COALESCE(excluded.content_hash, files.content_hash),
+                    size_bytes = excluded.size_bytes,
+                    modified_time = excluded.modified_time,
+                    stage = excluded.stage,
+                    outcome = excluded.outcome,
+                    error = NULL,
+                    updated_at = excluded.updated_at
+                """,
+                (self.pipeline, self._key(file_path), content_hash, stats.st_size,
+                 stats.st_mtime, OUTCOME_IN_PROGRESS, time.time())
+            )
+            self._conn.commit()
+    
+    def record_stage(self, file_path: Path, stage: str, content_hash: Optional[str] = None):
+        """Record the last stage a file has completed"""
+        fields = {"stage": stage}
+        if content_hash is not None:
+            fields["content_hash"] = content_hash
+        self._update(file_path, **fields)
+    
+    def finish(self, file_path: Path, success: bool, error: Optional[str] = None):
+        """Record the final outcome of processing a file"""
+        entry = self.get(file_path)
+        if entry is None:
+            self.start(file_path)
+            entry = self.get(file_path)
+        
+        fields = {"outcome": OUTCOME_SUCCESS if success else OUTCOME_FAILED, "error": error}
+        if success:
+            fields["stage"] = "completed"
+            if entry["content_hash"] is None:
+                fields["content_hash"] = compute_file_hash(file_path)
+        self._update(file_path, **fields)
+    
+    def summary(self) -> Dict[str, int]:
+        """Count manifest entries by outcome"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT outcome, COUNT(*) AS count FROM files WHERE pipeline = ? GROUP BY outcome",
+                (self.pipeline,)
+            ).fetchall()
+        return {row["outcome"]: row["count"] for row in rows}
+    
+    def _update(self, file_path: Path, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE files SET {assignments}, updated_at = ? WHERE pipeline = ? AND path = ?",
+                (*fields.values(), time.time(), self.pipeline, self._key(file_path))
+            )
+            self._conn.commit()
+    
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
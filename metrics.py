@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# Per-stage timing and metrics for the ingestion pipelines
+# Records how long each stage takes per document, along with byte and page
+# counts, and exports them as JSON, Prometheus text and OpenTelemetry spans.
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+# OpenTelemetry is optional; without it no spans are emitted
+try:
+    from opentelemetry import trace
+    OPENTELEMETRY_AVAILABLE = True
+except ImportError:
+    trace = None
+    OPENTELEMETRY_AVAILABLE = False
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Prefix of every exported Prometheus metric
+PROMETHEUS_PREFIX = "ingest"
+
+# Long-running (watch mode) services keep the metrics of this many recent
+# documents and roll older ones up into the totals
+WATCH_MAX_DOCUMENTS = 1000
+
+# Seconds between metric exports of a long-running service
+DEFAULT_WRITE_INTERVAL = 30.0
+
+def get_tracer():
+    """Get the tracer used for pipeline spans, or None without OpenTelemetry"""
+    if not OPENTELEMETRY_AVAILABLE:
+        return None
+    return trace.get_tracer("ingestion_pipeline")
+
+def configure_tracing(output_path: Path):
+    """
+    Export OpenTelemetry spans to a file, one JSON object per span.
+    
+    Args:
+        output_path: File receiving the spans
+    
+    Returns:
+        The tracer provider; call its shutdown() to flush pending spans
+    """
+    try:
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        raise RuntimeError("opentelemetry-sdk is required to export traces (pip install opentelemetry-sdk)")
+    
+    span_file = open(output_path, "w", encoding="utf-8")
+    exporter = ConsoleSpanExporter(
+        out=span_file,
+        formatter=lambda span: span.to_json(indent=None) + os.linesep
+    )
+    provider = TracerProvider()
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Writing OpenTelemetry spans to {output_path}")
+    return provider
+
+class DocumentMetrics:
+    """
+    Stage timings and counters of one document.
+    
+    Stages can be timed from several threads (e.g. the page ranges of a
+    split PDF); repeated stages accumulate their time and call count.
+    When OpenTelemetry is available the document is a span (a child of
+    parent's span, if given) and every timed stage a child span.
+    """
+    
+    def __init__(self, pipeline: str, document: str, tracer=None, parent: Optional["DocumentMetrics"] = None):
+        self.pipeline = pipeline
+        self.document = document
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_calls: Dict[str, int] = {}
+        self.counters: Dict[str, float] = {}
+        self.outcome: Optional[str] = None
+        self.duration: Optional[float] = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._tracer = tracer
+        self._span = None
+        if tracer is not None:
+            self._span = tracer.start_span(
+                f"{pipeline}.{document}" if parent is None else f"{pipeline}.document",
+                context=trace.set_span_in_context(parent._span) if parent is not None and parent._span else None,
+                attributes={"ingest.pipeline": pipeline, "ingest.document": document}
+            )
+    
+    @contextmanager
+    def stage(self, name: str, **attributes):
+        """Time a block of code as the given stage"""
+        span = None
+        if self._span is not None:
+            span = self._tracer.start_span(
+                name,
+                context=trace.set_span_in_context(self._span),
+                attributes={f"ingest.{key}": value for key, value in attributes.items()}
+            )
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+            if span is not None:
+                span.end()
+    
+    def record_stage(self, name: str, seconds: float, calls: int = 1):
+        """Record time spent in a stage that was measured elsewhere"""
+        with self._lock:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+            self.stage_calls[name] = self.stage_calls.get(name, 0) + calls
+    
+    def add(self, name: str, value: float = 1):
+        """Add to a counter such as bytes_read or pages"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def elapsed(self) -> float:
+        """Seconds since the document was started, or its total once finished"""
+        if self.duration is not None:
+            return self.duration
+        return time.perf_counter() - self._start
+    
+    def finish(self, success: bool):
+        """Record the document's outcome and total duration"""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        self.outcome = "success" if success else "failed"
+        if self._span is not None:
+            for name, value in self.counters.items():
+                self._span.set_attribute(f"ingest.{name}", value)
+            self._span.set_attribute("ingest.outcome", self.outcome)
+            if not success:
+                self._span.set_status(trace.Status(trace.StatusCode.ERROR))
+            self._span.end()
+    
+    def stage_timings(self, digits: int = 3) -> Dict[str, float]:
+        """Seconds per stage, rounded for reporting"""
+        with self._lock:
+            return {name: round(seconds, digits) for name, seconds in self.stage_seconds.items()}
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Machine-readable form of the metrics"""
+        with self._lock:
+            stages = {
+                name: {"seconds": round(seconds, 6), "calls": self.stage_calls[name]}
+                for name, seconds in self.stage_seconds.items()
+            }
+            counters = dict(self.counters)
+        return {
+            "document": self.document,
+            "outcome": self.outcome,
+            "duration_seconds": round(self.elapsed(), 6),
+            "stages": stages,
+            "counters": counters,
+        }
+
+class MetricsRegistry:
+    """
+    Metrics of every document processed by one pipeline run.
+    
+    Run-level stages that do not belong to a single document (e.g. an
+    external pipeline run) are recorded on the run metrics via stage().
+    The run lasts until finish() is called, however often it is written.
+    
+    With max_documents set, only that many documents are kept individually;
+    the oldest finished ones are rolled up into the totals, so a service
+    running for days keeps a bounded amount of metrics.
+    """
+    
+    def __init__(self, pipeline: str, max_documents: Optional[int] = None):
+        self.pipeline = pipeline
+        self.max_documents = max_documents
+        self.started_at = time.time()
+        self._tracer = get_tracer()
+        self.run = DocumentMetrics(pipeline, "run", self._tracer)
+        self._documents: List[DocumentMetrics] = []
+        self._rolled_up = {"documents": 0, "stages": {}, "counters": {}, "outcomes": {}, "duration_seconds": 0.0}
+        self._lock = threading.Lock()
+    
+    def document(self, name: str) -> DocumentMetrics:
+        """Start collecting metrics for a document"""
+        metrics = DocumentMetrics(self.pipeline, name, self._tracer, parent=self.run)
+        with self._lock:
+            self._documents.append(metrics)
+            if self.max_documents is not None and len(self._documents) > self.max_documents:
+                self._roll_up(len(self._documents) - self.max_documents)
+        return metrics
+    
+    def _roll_up(self, count: int):
+        """Fold the oldest finished documents into the rolled-up totals (called with the lock held)"""
+        kept = []
+        for metrics in self._documents:
+            if count > 0 and metrics.duration is not None:
+                count -= 1
+                document = metrics.to_dict()
+                rolled_up = self._rolled_up
+                rolled_up["documents"] += 1
+                rolled_up["duration_seconds"] += metrics.duration
+                rolled_up["outcomes"][metrics.outcome] = rolled_up["outcomes"].get(metrics.outcome, 0) + 1
+                for name, stage in document["stages"].items():
+                    total = rolled_up["stages"].setdefault(name, {"seconds": 0.0, "calls": 0})
+                    total["seconds"] += stage["seconds"]
+                    total["calls"] += stage["calls"]
+                for name, value in document["counters"].items():
+                    rolled_up["counters"][name] = rolled_up["counters"].get(name, 0) + value
+            else:
+                kept.append(metrics)
+        self._documents = kept
+    
+    def finish(self, success: bool = True):
+        """End the run; its duration and span stop here"""
+        self.run.finish(success)
+    
+    def stage(self, name: str, **attributes):
+        """Time a run-level stage"""
+        return self.run.stage(name, **attributes)
+    
+    @property
+    def documents(self) -> List[DocumentMetrics]:
+        with self._lock:
+            return list(self._documents)
+    
+    def totals(self) -> Dict[str, Any]:
+        """Stage timings and counters summed over all documents, including rolled-up ones"""
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self._rolled_up["stages"].items()}
+            counters = dict(self._rolled_up["counters"])
+            outcomes = dict(self._rolled_up["outcomes"])
+            documents = list(self._documents)
+        for metrics in documents:
+            for name, stage in metrics.to_dict()["stages"].items():
+                total = stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+                total["seconds"] += stage["seconds"]
+                total["calls"] += stage["calls"]
+            for name, value in metrics.counters.items():
+                counters[name] = counters.get(name, 0) + value
+            outcome = metrics.outcome or "in_progress"
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        for total in stages.values():
+            total["seconds"] = round(total["seconds"], 6)
+        return {"stages": stages, "counters": counters, "outcomes": outcomes}
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Machine-readable form of the run's metrics"""
+        return {
+            "pipeline": self.pipeline,
+            "started_at": self.started_at,
+            "run": self.run.to_dict(),
+            "totals": self.totals(),
+            "rolled_up_documents": self._rolled_up["documents"],
+            "documents": [metrics.to_dict() for metrics in self.documents],
+        }
+    
+    def prometheus_text(self) -> str:
+        """Render the run's totals in the Prometheus text exposition format"""
+        totals = self.totals()
+        pipeline = _escape_label(self.pipeline)
+        lines = []
+        
+        def metric(name, metric_type, help_text, samples):
+            full_name = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for labels, value in samples:
+                label_text = ",".join([f'pipeline="{pipeline}"'] + [f'{k}="{_escape_label(v)}"' for k, v in labels])
+                lines.append(f"{full_name}{{{label_text}}} {value}")
+        
+        stages = dict(totals["stages"])
+        for name, stage in self.run.to_dict()["stages"].items():
+            total = stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            stages[name] = {"seconds": total["seconds"] + stage["seconds"], "calls": total["calls"] + stage["calls"]}
+        
+        metric("stage_seconds_total", "counter", "Time spent in each pipeline stage",
+               [([("stage", name)], round(stage["seconds"], 6)) for name, stage in sorted(stages.items())])
+        metric("stage_calls_total", "counter", "Number of times each pipeline stage ran",
+               [([("stage", name)], stage["calls"]) for name, stage in sorted(stages.items())])
+        metric("documents_total", "counter", "Documents processed by outcome",
+               [([("outcome", name)], count) for name, count in sorted(totals["outcomes"].items())])
+        
+        with self._lock:
+            durations = sorted(m.duration for m in self._documents if m.duration is not None)
+            rolled_up_seconds = self._rolled_up["duration_seconds"]
+            rolled_up_count = self._rolled_up["documents"]
+        full_name = f"{PROMETHEUS_PREFIX}_document_seconds"
+        lines.append(f"# HELP {full_name} Processing time per document")
+        lines.append(f"# TYPE {full_name} summary")
+        for quantile in (0.5, 0.95, 0.99):
+            if durations:
+                value = durations[min(len(durations) - 1, int(quantile * len(durations)))]
+                lines.append(f'{full_name}{{pipeline="{pipeline}",quantile="{quantile}"}} {round(value, 6)}')
+        duration_sum = sum(durations) + rolled_up_seconds
+        duration_count = len(durations) + rolled_up_count
+        lines.append(f'{full_name}_sum{{pipeline="{pipeline}"}} {round(duration_sum, 6)}')
+        lines.append(f'{full_name}_count{{pipeline="{pipeline}"}} {duration_count}')
+        
+        for name, value in sorted(totals["counters"].items()):
+            metric(f"{name}_total", "counter", f"Total {name.replace('_', ' ')}", [([], value)])
+        
+        return "\n".join(lines) + "\n"
+    
+    def write(self, json_path: Optional[Path] = None, prometheus_path: Optional[Path] = None):
+        """
+        Write the run's metrics to disk.
+        
+        The run is not finished, so a long-running service can write its
+        metrics repeatedly; call finish() first for the final export.
+        
+        Args:
+            json_path: Destination of the JSON metrics (skipped if None)
+            prometheus_path: Destination of the Prometheus text (skipped if None)
+        """
+        if json_path is not None:
+            _write_atomic(json_path, json.dumps(self.to_dict(), indent=4))
+            logger.info(f"Metrics written to {json_path}")
+        if prometheus_path is not None:
+            _write_atomic(prometheus_path, self.prometheus_text())
+            logger.info(f"Prometheus metrics written to {prometheus_path}")
+
+class MetricsWriter:
+    """
+    Write a registry's metrics from a background thread every interval seconds.
+    
+    Used by long-running services instead of writing after every document,
+    whose cost would grow with the number of documents. stop() writes once
+    more, so the last state is always exported.
+    """
+    
+    def __init__(self, registry: MetricsRegistry, interval: float = DEFAULT_WRITE_INTERVAL,
+                 json_path: Optional[Path] = None, prometheus_path: Optional[Path] = None):
+        self.registry = registry
+        self.interval = interval
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+    
+    def start(self) -> "MetricsWriter":
+        self._thread.start()
+        return self
+    
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+    
+    def write(self):
+        """Write the metrics now, logging rather than raising errors"""
+        try:
+            self.registry.write(json_path=self.json_path, prometheus_path=self.prometheus_path)
+        except Exception as e:
+            logger.error(f"Error writing metrics: {str(e)}")
+    
+    def stop(self):
+        """Stop the background thread and write the metrics a last time"""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.write()
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _write_atomic(path: Path, text: str):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
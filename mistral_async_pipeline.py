@@ -0,0 +1,718 @@
+#!/usr/bin/env python3
+# Asynchronous Mistral OCR Document Ingestion Pipeline
+# Same outputs as mistrel_ocr_ingestion_pipeline.py, but every document is a
+# coroutine: uploads, signed URLs and OCR use the SDK's async methods and the
+# JSON, markdown and image files are written with aiofiles. A semaphore bounds
+# how many documents are in flight, so hundreds can be processed at once
+# without a thread per document.
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import time
+import argparse
+import tempfile
+import functools
+import traceback
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import aiofiles
+from dotenv import load_dotenv
+from mistralai import Mistral, DocumentURLChunk
+from mistralai.models import OCRResponse
+
+from api_scheduler import RequestScheduler
+from manifest import IngestionManifest
+from catalog import DEFAULT_CATALOG_PATH, DocumentCatalog
+from metrics import DocumentMetrics, MetricsRegistry, configure_tracing
+from ocr_cache import OCRCache
+from disposition import DEFAULT_DISPOSITION, DISPOSITIONS, describe, dispose
+from ocr_output import (
+    IMAGE_FORMATS,
+    MARKDOWN_IMAGE_MODES,
+    PILLOW_AVAILABLE,
+    OCRJsonFormatter,
+    decode_image,
+    rewrite_image_placeholders
+)
+from mistrel_ocr_ingestion_pipeline import (
+    INPUT_DIR,
+    JSON_OUTPUT_DIR,
+    MARKDOWN_OUTPUT_DIR,
+    IMAGES_OUTPUT_DIR,
+    PROCESSED_DIR,
+    ERROR_DIR,
+    CACHE_DIR,
+    MANIFEST_PATH,
+    METRICS_JSON_PATH,
+    METRICS_PROMETHEUS_PATH,
+    OCR_MODEL,
+    INCLUDE_IMAGE_BASE64,
+    DEFAULT_INLINE_MAX_BYTES,
+    DEFAULT_SPLIT_THRESHOLD_PAGES,
+    DEFAULT_PAGES_PER_CHUNK,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_MAX_RETRIES,
+    JSON_IMAGE_MODES,
+    DEFAULT_JSON_IMAGE_MODE,
+    setup_directories,
+    get_file_metadata,
+    build_document_data_url,
+    split_pdf,
+    load_previous_response,
+    display_processing_summary
+)
+
+logger = logging.getLogger("mistral_async_pipeline")
+
+# Number of documents processed concurrently
+DEFAULT_MAX_IN_FLIGHT = 100
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a CPU-bound or blocking function on the event loop's default thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+class AsyncOCRJsonWriter:
+    """
+    Write an OCR response as JSON page by page with aiofiles.
+    
+    Produces the same text as ocr_output.OCRJsonWriter. Use open() to create
+    a writer; close() finishes the document and abort() discards it. With
+    atomic=True the JSON only appears at path once close() has run.
+    """
+    
+    def __init__(self, path: Path, write_path: str, file, formatter: OCRJsonFormatter, atomic: bool):
+        self.path = Path(path)
+        self.atomic = atomic
+        self._write_path = write_path
+        self._file = file
+        self._formatter = formatter
+    
+    @classmethod
+    async def open(cls, path: Path, indent: Optional[int] = 4, atomic: bool = False,
+                   externalize_images: bool = False) -> "AsyncOCRJsonWriter":
+        path = Path(path)
+        formatter = OCRJsonFormatter(path.parent, indent=indent, externalize_images=externalize_images)
+        if atomic:
+            fd, write_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            os.close(fd)
+        else:
+            write_path = str(path)
+        file = await aiofiles.open(write_path, "w", encoding="utf-8")
+        await file.write(formatter.start())
+        return cls(path, write_path, file, formatter, atomic)
+    
+    async def write_page(self, page_data: Dict[str, Any], image_files: Optional[Dict[str, Path]] = None):
+        """Append one page to the "pages" list"""
+        await self._file.write(self._formatter.page(page_data, image_files))
+    
+    async def close(self, response_fields: Dict[str, Any]) -> Path:
+        """Write the remaining top-level fields and finish the JSON document"""
+        await self._file.write(self._formatter.end(response_fields))
+        await self._file.close()
+        if self.atomic:
+            os.replace(self._write_path, self.path)
+        return self.path
+    
+    async def abort(self):
+        """Stop writing and discard a partially written atomic file"""
+        await self._file.close()
+        if self.atomic and os.path.exists(self._write_path):
+            os.unlink(self._write_path)
+
+async def run_ocr_async(document_name: str, file_bytes: bytes, purpose: str, client: Mistral,
+                        scheduler: RequestScheduler, inline_max_bytes: int = DEFAULT_INLINE_MAX_BYTES,
+                        keep_uploads: bool = False,
+                        metrics: Optional[DocumentMetrics] = None) -> OCRResponse:
+    """
+    Run Mistral OCR on a document with the SDK's async methods.
+    
+    Documents up to inline_max_bytes are sent inline as a base64 data URL;
+    larger ones are uploaded, passed to OCR through a signed URL and deleted
+    afterwards unless keep_uploads is set.
+    
+    Args:
+        document_name: Name of the document (or page range) being sent
+        file_bytes: Contents of the document
+        purpose: Upload purpose
+        client: Mistral client
+        scheduler: Request scheduler applying the rate limit and retries
+        inline_max_bytes: Largest document sent inline (0 always uploads)
+        keep_uploads: Do not delete the upload after OCR
+        metrics: Metrics receiving the upload, signed URL and OCR timings
+    
+    Returns:
+        The OCR response
+    
+    Raises:
+        The API error if a call fails after its retries
+    """
+    if metrics is None:
+        metrics = DocumentMetrics("mistral-async", document_name)
+    
+    file_id = None
+    try:
+        if len(file_bytes) <= inline_max_bytes:
+            logger.info(f"Sending {document_name} inline ({len(file_bytes)} bytes)")
+            document_url = build_document_data_url(document_name, file_bytes)
+        else:
+            logger.info(f"Uploading file to Mistral: {document_name}")
+            with metrics.stage("upload", document=document_name):
+                uploaded_file = await scheduler.call_async(
+                    client.files.upload_async,
+                    description=f"Upload of {document_name}",
+                    file={
+                        "file_name": document_name,
+                        "content": file_bytes,
+                    },
+                    purpose=purpose
+                )
+            file_id = uploaded_file.id
+            
+            with metrics.stage("signed_url", document=document_name):
+                signed_url = await scheduler.call_async(
+                    client.files.get_signed_url_async,
+                    description=f"Signed URL for {document_name}",
+                    file_id=file_id,
+                    expiry=1
+                )
+            document_url = signed_url.url
+        
+        logger.info(f"Processing with Mistral OCR: {document_name}")
+        with metrics.stage("ocr", document=document_name):
+            return await scheduler.call_async(
+                client.ocr.process_async,
+                description=f"OCR of {document_name}",
+                document=DocumentURLChunk(document_url=document_url),
+                model=OCR_MODEL,
+                include_image_base64=INCLUDE_IMAGE_BASE64
+            )
+    finally:
+        if file_id is not None and not keep_uploads:
+            try:
+                await scheduler.call_async(client.files.delete_async, description=f"Delete of {file_id}",
+                                           file_id=file_id)
+            except Exception as e:
+                logger.warning(f"Could not delete uploaded file {file_id}: {str(e)}")
+
+async def run_split_ocr_async(file_path: Path, chunks: List[Tuple[int, int, bytes]], purpose: str,
+                              client: Mistral, **ocr_kwargs) -> OCRResponse:
+    """
+    OCR the page ranges of a split PDF concurrently and reassemble the result.
+    
+    Args:
+        file_path: Path to the original PDF
+        chunks: Page ranges from split_pdf()
+        purpose: Upload purpose
+        client: Mistral client
+        **ocr_kwargs: Extra keyword arguments passed to run_ocr_async()
+    
+    Returns:
+        The merged OCR response, with page indexes offset to the whole document
+    """
+    logger.info(f"Splitting {file_path.name} into {len(chunks)} chunks")
+    responses = await asyncio.gather(*(
+        run_ocr_async(f"{file_path.stem}_pages{first_page}-{last_page}.pdf", chunk_bytes, purpose, client,
+                      **ocr_kwargs)
+        for first_page, last_page, chunk_bytes in chunks
+    ))
+    
+    merged_pages = []
+    for (first_page, _, _), response in zip(chunks, responses):
+        for page in response.pages:
+            page.index += first_page - 1
+            merged_pages.append(page)
+    
+    merged = responses[0]
+    merged.pages = merged_pages
+    if merged.usage_info is not None:
+        merged.usage_info.pages_processed = sum(
+            response.usage_info.pages_processed for response in responses if response.usage_info is not None
+        )
+        merged.usage_info.doc_size_bytes = file_path.stat().st_size
+    return merged
+
+async def write_image_async(image_base64: str, output_path: Path, image_format: Optional[str],
+                            image_quality: int, metrics: DocumentMetrics) -> int:
+    """Decode an image off the event loop and write it with aiofiles"""
+    with metrics.stage("image_decode"):
+        image_bytes = await run_blocking(decode_image, image_base64, image_format, image_quality)
+    with metrics.stage("image_write"):
+        async with aiofiles.open(output_path, "wb") as f:
+            await f.write(image_bytes)
+    return len(image_bytes)
+
+async def write_ocr_outputs_async(ocr_response: OCRResponse, file_base: str, doc_images_dir: Path,
+                                  output_markdown_path: Path, json_writers: List[AsyncOCRJsonWriter],
+                                  markdown_images: str, image_format: Optional[str], image_quality: int,
+                                  metrics: DocumentMetrics) -> Tuple[int, int, int]:
+    """
+    Write the images, markdown and JSON of an OCR response one page at a time.
+    
+    A page's images are written concurrently; its markdown is then appended
+    with the image links rewritten and the page is appended to the JSON
+    writers. Finished pages are dropped from the response.
+    
+    Returns:
+        Tuple of (number of pages, number of extracted images, image bytes written)
+    """
+    pages = ocr_response.pages
+    ocr_response.pages = []
+    total_images = 0
+    image_bytes_written = 0
+    global_counter = 1
+    
+    async with aiofiles.open(output_markdown_path, "w", encoding="utf-8") as md_file:
+        for page_idx in range(1, len(pages) + 1):
+            page = pages[page_idx - 1]
+            pages[page_idx - 1] = None
+            
+            image_names = []
+            for image_obj in page.images:
+                ext = IMAGE_FORMATS[image_format] if image_format else (Path(image_obj.id).suffix or ".png")
+                image_names.append(f"{file_base}_page{page_idx}_img_{global_counter}{ext}")
+                global_counter += 1
+            
+            results = await asyncio.gather(*(
+                write_image_async(image_obj.image_base64, doc_images_dir / name, image_format, image_quality, metrics)
+                for image_obj, name in zip(page.images, image_names)
+            ), return_exceptions=True)
+            
+            image_files = {}
+            replacements = {}
+            for image_obj, name, result in zip(page.images, image_names, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error processing image {image_obj.id}: {str(result)}")
+                    continue
+                image_bytes_written += result
+                image_files[image_obj.id] = doc_images_dir / name
+                if markdown_images == "inline":
+                    replacements[image_obj.id] = (name, image_obj.image_base64)
+                else:
+                    replacements[image_obj.id] = (name, f"../images/{file_base}/{name}")
+            total_images += len(image_files)
+            
+            with metrics.stage("markdown_write"):
+                updated_markdown = rewrite_image_placeholders(page.markdown, replacements)
+                await md_file.write(("\n\n" if page_idx > 1 else "") + updated_markdown)
+            
+            if json_writers:
+                with metrics.stage("json_write"):
+                    page_data = page.model_dump()
+                    for writer in json_writers:
+                        await writer.write_page(page_data, image_files)
+                    del page_data
+    
+    with metrics.stage("json_write"):
+        response_fields = ocr_response.model_dump(exclude={"pages"})
+        for writer in json_writers:
+            await writer.close(response_fields)
+    
+    return len(pages), total_images, image_bytes_written
+
+async def process_document_async(file_path: Path, client: Mistral, scheduler: RequestScheduler,
+                                 cache: Optional[OCRCache] = None,
+                                 manifest: Optional[IngestionManifest] = None,
+                                 metrics: Optional[MetricsRegistry] = None,
+                                 disposition: str = DEFAULT_DISPOSITION, **options) -> bool:
+    """
+    Process a document using Mistral OCR, recording its outcome.
+    
+    Args:
+        file_path: Path to the document
+        client: Mistral client
+        scheduler: Request scheduler shared by all documents of the run
+        cache: OCR response cache
+        manifest: Ingestion manifest recording the stages and outcome
+        metrics: Registry collecting the per-stage timings of the run
+        disposition: How the input file is placed in processed_files/ or error_files/
+        **options: Output and transport options (see _process_document_async())
+    
+    Returns:
+        True if processing was successful, False otherwise
+    """
+    doc_metrics = metrics.document(file_path.name) if metrics is not None else \
+        DocumentMetrics("mistral-async", file_path.name)
+    if manifest is not None:
+        await run_blocking(manifest.start, file_path)
+    
+    try:
+        success = await _process_document_async(file_path, client, scheduler, cache, manifest, doc_metrics,
+                                                disposition, **options)
+    except Exception as e:
+        logger.error(f"Error processing {file_path.name}: {str(e)}")
+        logger.error(traceback.format_exc())
+        print(f"ERROR: Failed to process {file_path.name}: {str(e)}")
+        success = False
+    
+    if not success:
+        try:
+            error_file_path = await run_blocking(dispose, file_path, ERROR_DIR, disposition)
+            logger.info(f"{describe(disposition, error_file_path)} (error directory)")
+        except Exception as copy_error:
+            logger.error(f"Error copying file to error directory: {str(copy_error)}")
+    
+    doc_metrics.finish(success)
+    if manifest is not None:
+        await run_blocking(manifest.finish, file_path, success)
+    return success
+
+async def _process_document_async(file_path: Path, client: Mistral, scheduler: RequestScheduler,
+                                  cache: Optional[OCRCache], manifest: Optional[IngestionManifest],
+                                  metrics: DocumentMetrics, disposition: str,
+                                  json_images: str = DEFAULT_JSON_IMAGE_MODE, compact_json: bool = False,
+                                  markdown_images: str = "link", image_format: Optional[str] = None,
+                                  image_quality: int = 80, inline_max_bytes: int = DEFAULT_INLINE_MAX_BYTES,
+                                  keep_uploads: bool = False,
+                                  split_threshold_pages: int = DEFAULT_SPLIT_THRESHOLD_PAGES,
+                                  pages_per_chunk: int = DEFAULT_PAGES_PER_CHUNK,
+                                  catalog: Optional[DocumentCatalog] = None) -> bool:
+    """Run the stages of process_document_async(); raises on unexpected errors"""
+    metadata = get_file_metadata(file_path)
+    file_base = file_path.stem
+    file_ext = file_path.suffix.lower()
+    if file_ext not in ['.pdf', '.docx', '.doc']:
+        logger.warning(f"Unsupported file type: {file_ext}")
+        return False
+    purpose = "ocr"
+    
+    logger.info(f"Processing {file_path.name} ({metadata['size_human']})...")
+    print(f"PROCESSING: {file_path.name} ({metadata['size_human']})")
+    start_time = time.time()
+    
+    doc_json_dir = JSON_OUTPUT_DIR / file_base
+    doc_markdown_dir = MARKDOWN_OUTPUT_DIR / file_base
+    doc_images_dir = IMAGES_OUTPUT_DIR / file_base
+    for directory in (doc_json_dir, doc_markdown_dir, doc_images_dir):
+        directory.mkdir(exist_ok=True)
+    
+    # Read file
+    with metrics.stage("read"):
+        async with aiofiles.open(file_path, "rb") as f:
+            file_bytes = await f.read()
+    metrics.add("bytes_read", len(file_bytes))
+    
+    with metrics.stage("hash"):
+        content_hash = await run_blocking(lambda: hashlib.sha256(file_bytes).hexdigest())
+    if manifest is not None:
+        await run_blocking(manifest.record_stage, file_path, "read", content_hash=content_hash)
+    
+    # Look up a previous OCR response for identical content
+    cache_key = None
+    ocr_response = None
+    if cache is not None:
+        with metrics.stage("cache_lookup"):
+            cache_key = OCRCache.make_key(content_hash, OCR_MODEL, INCLUDE_IMAGE_BASE64)
+            cached_response = await run_blocking(cache.get, cache_key)
+            if cached_response is None and INCLUDE_IMAGE_BASE64:
+                cached_response = await run_blocking(load_previous_response, file_path, content_hash)
+                if cached_response is not None:
+                    await run_blocking(cache.put, cache_key, cached_response)
+            if cached_response is not None:
+                ocr_response = await run_blocking(OCRResponse.model_validate, cached_response)
+                del cached_response
+        if ocr_response is not None:
+            logger.info(f"Using cached OCR response for {file_path.name} (key {cache_key[:12]})")
+    
+    cache_hit = ocr_response is not None
+    if cache_hit:
+        transport = "cache"
+    else:
+        chunks = []
+        if file_ext == '.pdf' and split_threshold_pages > 0:
+            try:
+                with metrics.stage("split"):
+                    chunks = await run_blocking(split_pdf, file_bytes, pages_per_chunk,
+                                                min_pages=split_threshold_pages)
+            except Exception as e:
+                logger.warning(f"Could not split {file_path.name}, sending it whole: {str(e)}")
+        
+        ocr_kwargs = {
+            "scheduler": scheduler,
+            "inline_max_bytes": inline_max_bytes,
+            "keep_uploads": keep_uploads,
+            "metrics": metrics,
+        }
+        try:
+            if chunks:
+                transport = "split"
+                ocr_response = await run_split_ocr_async(file_path, chunks, purpose, client, **ocr_kwargs)
+                del chunks
+            else:
+                transport = "inline" if len(file_bytes) <= inline_max_bytes else "upload"
+                ocr_response = await run_ocr_async(file_path.name, file_bytes, purpose, client, **ocr_kwargs)
+        except Exception as e:
+            logger.error(f"Error processing with Mistral OCR: {str(e)}")
+            print(f"ERROR: Failed to process {file_path.name} with Mistral OCR: {str(e)}")
+            return False
+    
+    del file_bytes
+    if manifest is not None:
+        await run_blocking(manifest.record_stage, file_path, "ocr")
+    
+    # Stream pages to the JSON, cache, image and markdown outputs
+    ocr_json_path = doc_json_dir / "ocr_response.json"
+    output_markdown_path = doc_markdown_dir / f"{file_base}.md"
+    json_writers = [await AsyncOCRJsonWriter.open(
+        ocr_json_path,
+        indent=None if compact_json else 4,
+        externalize_images=json_images == "external"
+    )]
+    if cache is not None and not cache_hit:
+        try:
+            json_writers.append(await AsyncOCRJsonWriter.open(cache.entry_path(cache_key), indent=None, atomic=True))
+        except Exception as e:
+            logger.error(f"Error opening cache entry for {file_path.name}: {str(e)}")
+    try:
+        page_count, total_images, image_bytes_written = await write_ocr_outputs_async(
+            ocr_response, file_base, doc_images_dir, output_markdown_path, json_writers,
+            markdown_images, image_format, image_quality, metrics
+        )
+    except Exception:
+        for writer in json_writers:
+            await writer.abort()
+        raise
+    
+    metrics.add("pages", page_count)
+    metrics.add("images", total_images)
+    metrics.add("image_bytes_written", image_bytes_written)
+    metrics.add("markdown_bytes_written", output_markdown_path.stat().st_size)
+    metrics.add("json_bytes_written", ocr_json_path.stat().st_size)
+    
+    summary = {
+        "filename": file_path.name,
+        "file_type": "PDF" if metadata["is_pdf"] else "DOCX/DOC",
+        "file_size": metadata["size_human"],
+        "processing_time": f"{time.time() - start_time:.2f} seconds",
+        "processing_seconds": round(time.time() - start_time, 3),
+        "stage_timings": metrics.stage_timings(),
+        "pages": page_count,
+        "total_images": total_images,
+        "image_bytes_written": image_bytes_written,
+        "cache_hit": cache_hit,
+        "transport": transport,
+        "json_images": json_images,
+        "json_path": str(ocr_json_path),
+        "markdown_path": str(output_markdown_path),
+        "images_dir": str(doc_images_dir)
+    }
+    async with aiofiles.open(doc_json_dir / "summary.json", "w", encoding="utf-8") as f:
+        await f.write(json.dumps(summary, indent=4))
+    if manifest is not None:
+        await run_blocking(manifest.record_stage, file_path, "outputs_written")
+    
+    # Let the viewer find the document without scanning the output directory
+    if catalog is not None:
+        try:
+            await run_blocking(catalog.record, "mistral", JSON_OUTPUT_DIR, ocr_json_path, pages=page_count)
+        except Exception as e:
+            logger.error(f"Error updating the document catalog: {str(e)}")
+    
+    with metrics.stage("copy"):
+        processed_file_path = await run_blocking(dispose, file_path, PROCESSED_DIR, disposition)
+    logger.info(describe(disposition, processed_file_path))
+    
+    elapsed_time = time.time() - start_time
+    logger.info(f"Document {file_path.name} processed in {elapsed_time:.2f} seconds")
+    print(f"DONE: {file_path.name} ({page_count} pages, {total_images} images) in {elapsed_time:.2f} seconds")
+    return True
+
+async def process_documents_async(files: List[Path], client: Mistral, scheduler: RequestScheduler,
+                                  max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                                  **process_kwargs) -> Dict[Path, bool]:
+    """
+    Process documents as coroutines, at most max_in_flight at a time.
+    
+    Files sharing an output stem (e.g. "report.doc" and "report.docx") write to
+    the same per-document directories, so they are processed one after the other.
+    
+    Args:
+        files: Files to process
+        client: Mistral client
+        scheduler: Request scheduler shared by all documents
+        max_in_flight: Maximum number of documents processed at once
+        **process_kwargs: Extra keyword arguments passed to process_document_async()
+    
+    Returns:
+        Dictionary mapping each file to its processing result
+    """
+    semaphore = asyncio.Semaphore(max_in_flight)
+    stem_locks: Dict[str, asyncio.Lock] = {}
+    
+    async def process(file: Path) -> bool:
+        lock = stem_locks.setdefault(file.stem, asyncio.Lock())
+        async with lock, semaphore:
+            return await process_document_async(file, client, scheduler, **process_kwargs)
+    
+    results = await asyncio.gather(*(process(file) for file in files))
+    return dict(zip(files, results))
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Asynchronous Mistral OCR document ingestion pipeline")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help=f"Number of documents processed concurrently (default: {DEFAULT_MAX_IN_FLIGHT})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always send documents to Mistral, ignoring cached OCR responses")
+    parser.add_argument("--reprocess", action="store_true",
+                        help="Process every input file, even those the manifest records as completed")
+    parser.add_argument("--json-images", choices=JSON_IMAGE_MODES, default=DEFAULT_JSON_IMAGE_MODE,
+                        help="Keep image base64 in ocr_response.json (inline) or reference the extracted image files (external)")
+    parser.add_argument("--compact-json", action="store_true",
+                        help="Write ocr_response.json without indentation")
+    parser.add_argument("--markdown-images", choices=MARKDOWN_IMAGE_MODES, default="link",
+                        help="Link extracted images from the markdown (link) or embed them as base64 (inline)")
+    parser.add_argument("--image-format", choices=sorted(IMAGE_FORMATS), default=None,
+                        help="Re-encode extracted images to this format (requires Pillow)")
+    parser.add_argument("--image-quality", type=int, default=80,
+                        help="Quality used when re-encoding images (default: 80)")
+    parser.add_argument("--max-rps", type=float, default=None,
+                        help="Maximum Mistral API requests started per second (default: unlimited)")
+    parser.add_argument("--max-concurrent-requests", type=int, default=DEFAULT_MAX_CONCURRENT_REQUESTS,
+                        help=f"Maximum Mistral API requests in flight (default: {DEFAULT_MAX_CONCURRENT_REQUESTS})")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help=f"Retries for throttled or failed API requests (default: {DEFAULT_MAX_RETRIES})")
+    parser.add_argument("--inline-max-bytes", type=int, default=DEFAULT_INLINE_MAX_BYTES,
+                        help=f"Send documents up to this size inline instead of uploading them "
+                             f"(default: {DEFAULT_INLINE_MAX_BYTES}, 0 = always upload)")
+    parser.add_argument("--keep-uploads", action="store_true",
+                        help="Do not delete uploaded documents from Mistral after OCR")
+    parser.add_argument("--split-threshold-pages", type=int, default=DEFAULT_SPLIT_THRESHOLD_PAGES,
+                        help=f"Split PDFs with more pages than this into page ranges OCR'd concurrently "
+                             f"(default: {DEFAULT_SPLIT_THRESHOLD_PAGES}, 0 = never split)")
+    parser.add_argument("--pages-per-chunk", type=int, default=DEFAULT_PAGES_PER_CHUNK,
+                        help=f"Pages per range when splitting a PDF (default: {DEFAULT_PAGES_PER_CHUNK})")
+    parser.add_argument("--metrics-json", type=Path, default=METRICS_JSON_PATH,
+                        help=f"Write per-stage timings and counters as JSON (default: {METRICS_JSON_PATH})")
+    parser.add_argument("--metrics-prom", type=Path, default=METRICS_PROMETHEUS_PATH,
+                        help=f"Write the same metrics in Prometheus text format (default: {METRICS_PROMETHEUS_PATH})")
+    parser.add_argument("--trace-file", type=Path, default=None,
+                        help="Export OpenTelemetry spans to this file (requires opentelemetry-sdk)")
+    parser.add_argument("--disposition", choices=DISPOSITIONS, default=DEFAULT_DISPOSITION,
+                        help=f"How input files are placed in processed_files/ and error_files/ "
+                             f"(default: {DEFAULT_DISPOSITION})")
+    return parser.parse_args()
+
+async def main_async(max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, use_cache: bool = True, reprocess: bool = False,
+                     max_rps: Optional[float] = None,
+                     max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+                     max_retries: int = DEFAULT_MAX_RETRIES,
+                     metrics_json: Optional[Path] = METRICS_JSON_PATH,
+                     metrics_prom: Optional[Path] = METRICS_PROMETHEUS_PATH,
+                     trace_file: Optional[Path] = None, **options):
+    """Run the asynchronous Mistral OCR pipeline over the input directory"""
+    print(f"{'='*80}")
+    print(f"MISTRAL OCR DOCUMENT INGESTION PIPELINE (ASYNC)")
+    print(f"{'='*80}")
+    
+    if options.get("image_format") is not None and not PILLOW_AVAILABLE:
+        logger.error("Pillow is required to re-encode images")
+        print("Error: --image-format requires Pillow (pip install Pillow)")
+        return
+    
+    tracer_provider = None
+    if trace_file is not None:
+        try:
+            tracer_provider = configure_tracing(trace_file)
+        except RuntimeError as e:
+            logger.error(str(e))
+            print(f"Error: {str(e)}")
+            return
+    
+    load_dotenv()
+    api_key = os.getenv("MISTRAL_API_KEY")
+    if not api_key:
+        logger.error("MISTRAL_API_KEY not found in environment variables")
+        print("Error: MISTRAL_API_KEY not found in environment variables")
+        print("Please set the MISTRAL_API_KEY environment variable or create a .env file")
+        return
+    
+    setup_directories()
+    cache = OCRCache(CACHE_DIR) if use_cache else None
+    manifest = IngestionManifest(MANIFEST_PATH, pipeline="mistral")
+    catalog = DocumentCatalog(DEFAULT_CATALOG_PATH)
+    metrics = MetricsRegistry("mistral-async")
+    scheduler = RequestScheduler(
+        requests_per_second=max_rps,
+        max_concurrent=max_concurrent_requests,
+        max_retries=max_retries
+    )
+    
+    all_files = sorted(INPUT_DIR.glob("*.pdf")) + sorted(INPUT_DIR.glob("*.docx")) + sorted(INPUT_DIR.glob("*.doc"))
+    if not all_files:
+        logger.warning("No PDF or DOCX files found in the input directory")
+        print(f"No PDF or DOCX files found in {INPUT_DIR}")
+        return
+    
+    if not reprocess:
+        pending_files = set(manifest.pending(all_files))
+        skipped_count = len(all_files) - len(pending_files)
+        if skipped_count:
+            logger.info(f"Skipping {skipped_count} unchanged files already completed in {MANIFEST_PATH}")
+            print(f"Skipping {skipped_count} unchanged files already processed (use --reprocess to force)")
+        all_files = [f for f in all_files if f in pending_files]
+        if not all_files:
+            print(f"All files in {INPUT_DIR} are up to date")
+            return
+    
+    print(f"Processing {len(all_files)} files with up to {max_in_flight} in flight...")
+    logger.info(f"Processing {len(all_files)} files asynchronously, {max_in_flight} in flight")
+    
+    async with Mistral(api_key=api_key, server_url=os.getenv("MISTRAL_SERVER_URL")) as client:
+        results = await process_documents_async(
+            all_files, client, scheduler, max_in_flight=max_in_flight,
+            cache=cache, manifest=manifest, metrics=metrics, catalog=catalog, **options
+        )
+    
+    successful_files = [file for file in all_files if results[file]]
+    failed_files = [file for file in all_files if not results[file]]
+    display_processing_summary(successful_files, failed_files)
+    
+    request_stats = scheduler.stats()
+    print(f"API requests: {request_stats['requests']} sent, {request_stats['retries']} retried, "
+          f"{request_stats['throttled']} throttled, {request_stats['failures']} failed")
+    logger.info(f"API request stats: {request_stats}")
+    
+    metrics.finish()
+    try:
+        metrics.write(json_path=metrics_json, prometheus_path=metrics_prom)
+        if metrics_json is not None:
+            print(f"Metrics saved to {metrics_json}")
+    except Exception as e:
+        logger.error(f"Error writing metrics: {str(e)}")
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
+    manifest.close()
+    catalog.close()
+
+def main(**kwargs):
+    """Run the asynchronous pipeline on a new event loop"""
+    asyncio.run(main_async(**kwargs))
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        max_in_flight=args.max_in_flight,
+        use_cache=not args.no_cache,
+        reprocess=args.reprocess,
+        max_rps=args.max_rps,
+        max_concurrent_requests=args.max_concurrent_requests,
+        max_retries=args.max_retries,
+        metrics_json=args.metrics_json,
+        metrics_prom=args.metrics_prom,
+        trace_file=args.trace_file,
+        json_images=args.json_images,
+        compact_json=args.compact_json,
+        markdown_images=args.markdown_images,
+        image_format=args.image_format,
+        image_quality=args.image_quality,
+        inline_max_bytes=args.inline_max_bytes,
+        keep_uploads=args.keep_uploads,
+        split_threshold_pages=args.split_threshold_pages,
+        pages_per_chunk=args.pages_per_chunk,
+        disposition=args.disposition
+    )
@@ -2,19 +2,51 @@
 # Mistral OCR Document Ingestion Pipeline
 # This script processes PDF and DOCX files using Mistral's OCR capabilities
 
+import io
 import os
 import json
 import base64
-import shutil
+import hashlib
 import logging
 import time
+import argparse
+import threading
 import traceback
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
 from mistralai import Mistral, DocumentURLChunk
 from mistralai.models import OCRResponse
+from pypdf import PdfReader, PdfWriter
+
+from api_scheduler import RequestScheduler
+from manifest import IngestionManifest
+from catalog import DEFAULT_CATALOG_PATH, DocumentCatalog
+from converter import (
+    BACKENDS as CONVERTER_BACKENDS, CONVERTIBLE_EXTENSIONS, DEFAULT_WORKERS as DEFAULT_CONVERTER_WORKERS,
+    convert_documents
+)
+from dedup import (
+    DEDUP_FILENAME, DEDUP_MODES, DEFAULT_DEDUP_MODE, DEFAULT_THRESHOLD as DEFAULT_DEDUP_THRESHOLD, DuplicateIndex
+)
+from metrics import WATCH_MAX_DOCUMENTS, DocumentMetrics, MetricsRegistry, MetricsWriter, configure_tracing
+from ocr_cache import OCRCache
+from disposition import DEFAULT_DISPOSITION, DISPOSITIONS, describe, dispose
+from work_queue import DEFAULT_LEASE_SECONDS, WorkQueue, worker_output_path
+from watcher import DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_SECONDS, DirectoryWatcher, watch_and_dispatch
+from ocr_output import (
+    IMAGE_FORMATS,
+    MARKDOWN_IMAGE_MODES,
+    PILLOW_AVAILABLE,
+    ImageSink,
+    OCRJsonWriter,
+    load_ocr_response,
+    rewrite_image_placeholders
+)
 
 # Configure logging
 logging.basicConfig(
@@ -35,6 +67,54 @@ MARKDOWN_OUTPUT_DIR = OUTPUT_ROOT_DIR / "markdown"  # Folder for Markdown output
 IMAGES_OUTPUT_DIR = OUTPUT_ROOT_DIR / "images"  # Folder for extracted images
 PROCESSED_DIR = OUTPUT_ROOT_DIR / "processed_files"  # Folder for processed files
 ERROR_DIR = OUTPUT_ROOT_DIR / "error_files"  # Folder for files that failed processing
+CACHE_DIR = OUTPUT_ROOT_DIR / "ocr_cache"  # Content-addressed cache of OCR responses
+MANIFEST_PATH = OUTPUT_ROOT_DIR / "manifest.sqlite3"  # Per-file progress journal
+METRICS_JSON_PATH = OUTPUT_ROOT_DIR / "metrics.json"  # Per-stage timings of the last run
+METRICS_PROMETHEUS_PATH = OUTPUT_ROOT_DIR / "metrics.prom"  # Same, in Prometheus text format
+QUEUE_DIR = OUTPUT_ROOT_DIR / "queue"  # Work queue shared by worker processes (--processes)
+CONVERTED_DIR = OUTPUT_ROOT_DIR / "converted"  # PDFs converted locally from DOCX/DOC inputs (--convert-docx)
+DEDUP_PATH = OUTPUT_ROOT_DIR / DEDUP_FILENAME  # Processed documents by content hash and text signature (--dedup)
+
+# OCR configuration
+OCR_MODEL = "mistral-ocr-latest"
+INCLUDE_IMAGE_BASE64 = True
+
+# Added to the source hash in the cache key of DOCX/DOC files OCR'd as a
+# locally converted PDF, whose bytes differ between conversions
+CONVERTED_CACHE_MARKER = "converted-pdf"
+
+# Documents up to this size are sent inline (base64 data URL) instead of
+# being uploaded and referenced through a signed URL
+DEFAULT_INLINE_MAX_BYTES = 1024 * 1024
+DOCUMENT_MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".doc": "application/msword",
+}
+
+# PDFs with more pages than this are split into page ranges that are
+# OCR'd concurrently (0 disables splitting)
+DEFAULT_SPLIT_THRESHOLD_PAGES = 100
+DEFAULT_PAGES_PER_CHUNK = 25
+DEFAULT_SPLIT_WORKERS = 4
+
+# API request budget shared by all workers
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+DEFAULT_MAX_RETRIES = 5
+
+# Image extraction: threads decoding/writing images per document
+DEFAULT_IMAGE_WORKERS = 4
+
+# ocr_response.json persistence: "inline" keeps image base64 payloads,
+# "external" replaces them with references to the files under IMAGES_OUTPUT_DIR
+JSON_IMAGE_MODES = ["inline", "external"]
+DEFAULT_JSON_IMAGE_MODE = "inline"
+
+# Concurrency configuration
+DEFAULT_WORKERS = 4  # Number of documents processed concurrently
+
+# Wait before retrying a document whose output stem is claimed by another file
+SIBLING_RETRY_SECONDS = 1.0
 
 def setup_directories():
     """Create necessary directories if they don't exist"""
@@ -81,34 +161,520 @@ def replace_images_in_markdown(markdown_str: str, images_dict: dict) -> str:
     Convert base64 encoded images in markdown to links to external images
     for better readability and organization.
     """
-    for img_name, base64_str in images_dict.items():
-        markdown_str = markdown_str.replace(f"![{img_name}]({img_name})", f"![{img_name}]({base64_str})")
-    return markdown_str
+    replacements = {img_name: (img_name, base64_str) for img_name, base64_str in images_dict.items()}
+    return rewrite_image_placeholders(markdown_str, replacements)
 
 def get_combined_markdown(ocr_response: OCRResponse) -> str:
     """
     Combine the markdown of all pages from the OCR response.
     """
-    markdowns: list[str] = []
-    for page in ocr_response.pages:
-        image_data = {}
-        for img in page.images:
-            image_data[img.id] = img.image_base64
-        markdowns.append(replace_images_in_markdown(page.markdown, image_data))
+    return "\n\n".join(
+        replace_images_in_markdown(page.markdown, {img.id: img.image_base64 for img in page.images})
+        for page in ocr_response.pages
+    )
 
-    return "\n\n".join(markdowns)
+def stream_ocr_outputs(ocr_response: OCRResponse, file_base: str, doc_images_dir: Path,
+                       output_markdown_path: Path, json_writers: List[OCRJsonWriter],
+                       markdown_images: str = "link", image_sink: Optional[ImageSink] = None,
+                       metrics: Optional[DocumentMetrics] = None) -> Tuple[int, int]:
+    """
+    Write the outputs of an OCR response one page at a time.
+    
+    Each page's images are queued on the image sink, which decodes and writes
+    them on a thread pool. While they are being written the next page is
+    queued, and the previous page is finished: its markdown (with image links
+    rewritten) is appended to the markdown file and it is appended to the JSON
+    writers. Finished pages are dropped from the response so that peak memory
+    stays close to the size of two pages.
+    
+    Args:
+        ocr_response: OCR response; its pages are consumed
+        file_base: Document name used for image names and links
+        doc_images_dir: Directory for the extracted images
+        output_markdown_path: Path of the combined markdown file
+        json_writers: Writers receiving every page and the response fields
+        markdown_images: "link" to reference the saved image files from the
+            markdown, "inline" to embed the base64 data URIs
+        image_sink: Sink used to write images; a default one is created
+            (and shut down) when none is given
+        metrics: Metrics receiving the JSON and markdown write timings
+        
+    Returns:
+        Tuple of (number of pages, number of extracted images)
+    """
+    if metrics is None:
+        metrics = DocumentMetrics("mistral", file_base)
+    pages = ocr_response.pages
+    ocr_response.pages = []
+    page_count = len(pages)
+    global_counter = 1
+    total_images = 0
+    
+    # Log the number of pages in the response
+    logger.info(f"Document has {page_count} pages")
+    
+    owns_sink = image_sink is None
+    if owns_sink:
+        image_sink = ImageSink()
+    
+    def finish_page(md_file, page_idx, page, image_jobs) -> int:
+        image_files = {}
+        replacements = {}
+        
+        for image_obj, new_image_name, future in image_jobs:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Error processing image {image_obj.id}: {str(e)}")
+                print(f"ERROR: Failed to process image: {str(e)}")
+                continue
+            
+            image_files[image_obj.id] = doc_images_dir / new_image_name
+            
+            # Point the markdown at the saved image or embed its data URI
+            if markdown_images == "inline":
+                replacements[image_obj.id] = (new_image_name, image_obj.image_base64)
+            else:
+                replacements[image_obj.id] = (new_image_name, f"../images/{file_base}/{new_image_name}")
+        
+        # Resolve all image placeholders of the page in one pass
+        with metrics.stage("markdown_write"):
+            updated_markdown = rewrite_image_placeholders(page.markdown, replacements)
+        
+        if json_writers:
+            with metrics.stage("json_write"):
+                page_data = page.model_dump()
+                for writer in json_writers:
+                    writer.write_page(page_data, image_files)
+                del page_data
+        
+        # Append the page to the combined markdown
+        with metrics.stage("markdown_write"):
+            if page_idx > 1:
+                md_file.write("\n\n")
+            md_file.write(updated_markdown)
+        logger.info(f"Page {page_idx}: Extracted {len(image_files)} images")
+        return len(image_files)
+    
+    try:
+        with open(output_markdown_path, "w", encoding="utf-8") as md_file:
+            previous_page = None
+            for page_idx in range(1, page_count + 1):
+                page = pages[page_idx - 1]
+                pages[page_idx - 1] = None
+                
+                # Log the number of images on this page
+                logger.info(f"Page {page_idx} has {len(page.images)} images")
+                
+                # Queue the page's images for decoding and writing
+                image_jobs = []
+                for image_obj in page.images:
+                    ext = image_sink.extension_for(image_obj.id)
+                    new_image_name = f"{file_base}_page{page_idx}_img_{global_counter}{ext}"
+                    global_counter += 1
+                    future = image_sink.submit(image_obj.image_base64, doc_images_dir / new_image_name)
+                    image_jobs.append((image_obj, new_image_name, future))
+                
+                if previous_page is not None:
+                    total_images += finish_page(md_file, *previous_page)
+                previous_page = (page_idx, page, image_jobs)
+            
+            if previous_page is not None:
+                total_images += finish_page(md_file, *previous_page)
+    finally:
+        if owns_sink:
+            image_sink.close()
+    
+    with metrics.stage("json_write"):
+        response_fields = ocr_response.model_dump(exclude={"pages"})
+        for writer in json_writers:
+            writer.close(response_fields)
+    
+    return page_count, total_images
+
+def load_previous_response(file_path: Path, content_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Load the OCR response written by an earlier run for identical bytes.
+    
+    Outputs produced before the cache existed are only reused when the copy in
+    PROCESSED_DIR has the same content hash as the current file.
+    
+    Args:
+        file_path: Path to the document
+        content_hash: SHA-256 hex digest of the document bytes
+        
+    Returns:
+        The previous OCR response as a dictionary, or None if there is none
+    """
+    processed_copy = PROCESSED_DIR / file_path.name
+    previous_json = JSON_OUTPUT_DIR / file_path.stem / "ocr_response.json"
+    if not processed_copy.exists() or not previous_json.exists():
+        return None
+    
+    with open(processed_copy, "rb") as f:
+        if hashlib.sha256(f.read()).hexdigest() != content_hash:
+            return None
+    
+    try:
+        return load_ocr_response(previous_json)
+    except Exception as e:
+        logger.warning(f"Could not reuse previous OCR response {previous_json}: {str(e)}")
+        return None
 
-def process_document(file_path: Path, client: Mistral) -> bool:
+class UploadRegistry:
+    """
+    Tracks documents uploaded to Mistral during a run.
+    
+    Uploads are keyed by content hash so identical bytes are only uploaded
+    once. A file is deleted from Mistral once its OCR has succeeded; files
+    left behind by failed attempts are deleted by cleanup() at the end of
+    the run, unless uploads are kept.
+    """
+    
+    def __init__(self, client: Mistral, scheduler: RequestScheduler, keep_uploads: bool = False):
+        self.client = client
+        self.scheduler = scheduler
+        self.keep_uploads = keep_uploads
+        self._file_ids: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def upload(self, file_name: str, file_bytes: bytes, purpose: str) -> str:
+        """
+        Upload a document, reusing an earlier upload of identical bytes.
+        
+        Args:
+            file_name: Name of the document
+            file_bytes: Contents of the document
+            purpose: Upload purpose
+            
+        Returns:
+            ID of the uploaded file
+        """
+        content_hash = hashlib.sha256(file_bytes).hexdigest()
+        with self._lock:
+            file_id = self._file_ids.get(content_hash)
+        if file_id is not None:
+            logger.info(f"Reusing uploaded file {file_id} for {file_name}")
+            return file_id
+        
+        uploaded_file = self.scheduler.call(
+            self.client.files.upload,
+            description=f"Upload of {file_name}",
+            file={
+                "file_name": file_name,
+                "content": file_bytes,
+            },
+            purpose=purpose
+        )
+        with self._lock:
+            self._file_ids[content_hash] = uploaded_file.id
+        return uploaded_file.id
+    
+    def release(self, file_id: str):
+        """Delete an uploaded file that is no longer needed"""
+        with self._lock:
+            self._file_ids = {h: f for h, f in self._file_ids.items() if f != file_id}
+        if not self.keep_uploads:
+            self._delete(file_id)
+    
+    def cleanup(self):
+        """Delete every upload still tracked by the registry"""
+        with self._lock:
+            file_ids = list(self._file_ids.values())
+            self._file_ids.clear()
+        if not self.keep_uploads:
+            for file_id in file_ids:
+                self._delete(file_id)
+    
+    def _delete(self, file_id: str):
+        try:
+            self.scheduler.call(self.client.files.delete, description=f"Delete of {file_id}", file_id=file_id)
+            logger.info(f"Deleted uploaded file {file_id}")
+        except Exception as e:
+            logger.warning(f"Could not delete uploaded file {file_id}: {str(e)}")
+
+def build_document_data_url(file_name: str, file_bytes: bytes) -> str:
+    """
+    Encode a document as a base64 data URL for inline OCR requests.
+    
+    Args:
+        file_name: Name of the document (its extension selects the MIME type)
+        file_bytes: Contents of the document
+        
+    Returns:
+        The data URL
+    """
+    mime_type = DOCUMENT_MIME_TYPES.get(Path(file_name).suffix.lower(), "application/octet-stream")
+    return f"data:{mime_type};base64,{base64.b64encode(file_bytes).decode('ascii')}"
+
+def run_ocr(file_path: Path, file_bytes: bytes, purpose: str, client: Mistral,
+            scheduler: Optional[RequestScheduler] = None, uploads: Optional[UploadRegistry] = None,
+            inline_max_bytes: int = DEFAULT_INLINE_MAX_BYTES,
+            document_name: Optional[str] = None,
+            metrics: Optional[DocumentMetrics] = None) -> Optional[OCRResponse]:
+    """
+    Run Mistral OCR on a document.
+    
+    Documents up to inline_max_bytes are sent inline as a base64 data URL in
+    a single OCR call. Larger documents are uploaded and passed to OCR through
+    a signed URL.
+    
+    Args:
+        file_path: Path to the document
+        file_bytes: Contents of the document
+        purpose: Upload purpose
+        client: Mistral client
+        scheduler: Request scheduler applying the rate limit and retries;
+            without one each call is made once
+        uploads: Registry of uploaded files shared by the run; without one
+            the upload is deleted once OCR has run, whether it succeeded or not
+        inline_max_bytes: Largest document sent inline (0 always uploads)
+        document_name: Name used for the upload and in messages when
+            file_bytes is only part of the file (defaults to the file name)
+        metrics: Metrics receiving the upload, signed URL and OCR timings
+        
+    Returns:
+        The OCR response, or None if any of the API calls failed
+    """
+    document_name = document_name or file_path.name
+    if metrics is None:
+        metrics = DocumentMetrics("mistral", document_name)
+    if scheduler is None:
+        scheduler = RequestScheduler(max_retries=0)
+    owns_uploads = uploads is None
+    if owns_uploads:
+        uploads = UploadRegistry(client, scheduler)
+    
+    # Uploads are removed once OCR succeeds; a run-local registry also
+    # removes them when the signed URL or OCR call fails
+    try:
+        file_id = None
+        if len(file_bytes) <= inline_max_bytes:
+            logger.info(f"Sending {document_name} inline ({len(file_bytes)} bytes)")
+            document_url = build_document_data_url(document_name, file_bytes)
+        else:
+            # Upload file to Mistral
+            print(f"Uploading file to Mistral...")
+            logger.info(f"Uploading file to Mistral: {document_name}")
+            try:
+                with metrics.stage("upload", document=document_name):
+                    file_id = uploads.upload(document_name, file_bytes, purpose)
+                logger.info(f"File uploaded successfully with ID: {file_id}")
+            except Exception as e:
+                logger.error(f"Error uploading file to Mistral: {str(e)}")
+                print(f"ERROR: Failed to upload file to Mistral: {str(e)}")
+                return None
+            
+            # Get signed URL
+            try:
+                with metrics.stage("signed_url", document=document_name):
+                    signed_url = scheduler.call(
+                        client.files.get_signed_url,
+                        description=f"Signed URL for {document_name}",
+                        file_id=file_id,
+                        expiry=1
+                    )
+                document_url = signed_url.url
+                logger.info(f"Got signed URL for file: {file_id}")
+            except Exception as e:
+                logger.error(f"Error getting signed URL: {str(e)}")
+                print(f"ERROR: Failed to get signed URL: {str(e)}")
+                return None
+        
+        # Process with OCR
+        print(f"Processing with Mistral OCR...")
+        logger.info(f"Processing with Mistral OCR: {document_name}")
+        try:
+            with metrics.stage("ocr", document=document_name):
+                ocr_response = scheduler.call(
+                    client.ocr.process,
+                    description=f"OCR of {document_name}",
+                    document=DocumentURLChunk(document_url=document_url),
+                    model=OCR_MODEL,
+                    include_image_base64=INCLUDE_IMAGE_BASE64
+                )
+            logger.info(f"OCR processing completed successfully")
+            if file_id is not None:
+                uploads.release(file_id)
+            return ocr_response
+        except Exception as e:
+            logger.error(f"Error processing with Mistral OCR: {str(e)}")
+            logger.error(traceback.format_exc())
+            print(f"ERROR: Failed to process with Mistral OCR: {str(e)}")
+            return None
+    finally:
+        if owns_uploads:
+            uploads.cleanup()
+
+def split_pdf(file_bytes: bytes, pages_per_chunk: int, min_pages: int = 0) -> List[Tuple[int, int, bytes]]:
+    """
+    Split a PDF into page ranges.
+    
+    Args:
+        file_bytes: Contents of the PDF
+        pages_per_chunk: Maximum number of pages per chunk
+        min_pages: Only split PDFs with more pages than this
+        
+    Returns:
+        List of (first page, last page, chunk bytes) tuples, with 1-based
+        inclusive page numbers, in page order; empty if the PDF is not split
+    """
+    reader = PdfReader(io.BytesIO(file_bytes))
+    page_count = len(reader.pages)
+    if page_count <= min_pages or page_count <= pages_per_chunk:
+        return []
+    
+    chunks = []
+    for start in range(0, page_count, pages_per_chunk):
+        end = min(start + pages_per_chunk, page_count)
+        writer = PdfWriter()
+        for page_number in range(start, end):
+            writer.add_page(reader.pages[page_number])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        chunks.append((start + 1, end, buffer.getvalue()))
+    return chunks
+
+def run_split_ocr(file_path: Path, chunks: List[Tuple[int, int, bytes]], purpose: str, client: Mistral,
+                  split_workers: int = DEFAULT_SPLIT_WORKERS, **ocr_kwargs) -> Optional[OCRResponse]:
+    """
+    OCR the page ranges of a split PDF concurrently and reassemble the result.
+    
+    Pages are merged in document order and their "index" is offset by the
+    chunk's first page, so the merged response looks like a single request.
+    
+    Args:
+        file_path: Path to the original PDF
+        chunks: Page ranges from split_pdf()
+        purpose: Upload purpose
+        client: Mistral client
+        split_workers: Maximum number of chunks in flight
+        **ocr_kwargs: Extra keyword arguments passed to run_ocr()
+        
+    Returns:
+        The merged OCR response, or None if any chunk failed
+    """
+    logger.info(f"Splitting {file_path.name} into {len(chunks)} chunks")
+    print(f"Processing {len(chunks)} page ranges with Mistral OCR...")
+    
+    def ocr_chunk(chunk: Tuple[int, int, bytes]) -> Optional[OCRResponse]:
+        first_page, last_page, chunk_bytes = chunk
+        chunk_name = f"{file_path.stem}_pages{first_page}-{last_page}.pdf"
+        return run_ocr(file_path, chunk_bytes, purpose, client, document_name=chunk_name, **ocr_kwargs)
+    
+    with ThreadPoolExecutor(max_workers=split_workers, thread_name_prefix="ocr-chunk") as executor:
+        responses = list(executor.map(ocr_chunk, chunks))
+    
+    if any(response is None for response in responses):
+        logger.error(f"OCR failed for {sum(r is None for r in responses)} of {len(chunks)} chunks of {file_path.name}")
+        return None
+    
+    merged_pages = []
+    for (first_page, _, _), response in zip(chunks, responses):
+        for page in response.pages:
+            page.index += first_page - 1
+            merged_pages.append(page)
+    
+    merged = responses[0]
+    merged.pages = merged_pages
+    if merged.usage_info is not None:
+        merged.usage_info.pages_processed = sum(
+            response.usage_info.pages_processed for response in responses if response.usage_info is not None
+        )
+        merged.usage_info.doc_size_bytes = file_path.stat().st_size
+    return merged
+
+def process_document(file_path: Path, client: Mistral, cache: Optional[OCRCache] = None,
+                     manifest: Optional[IngestionManifest] = None,
+                     json_images: str = DEFAULT_JSON_IMAGE_MODE, compact_json: bool = False,
+                     markdown_images: str = "link", image_workers: int = DEFAULT_IMAGE_WORKERS,
+                     image_format: Optional[str] = None, image_quality: int = 80,
+                     scheduler: Optional[RequestScheduler] = None, uploads: Optional[UploadRegistry] = None,
+                     inline_max_bytes: int = DEFAULT_INLINE_MAX_BYTES,
+                     split_threshold_pages: int = DEFAULT_SPLIT_THRESHOLD_PAGES,
+                     pages_per_chunk: int = DEFAULT_PAGES_PER_CHUNK,
+                     split_workers: int = DEFAULT_SPLIT_WORKERS,
+                     metrics: Optional[MetricsRegistry] = None,
+                     disposition: str = DEFAULT_DISPOSITION,
+                     catalog: Optional[DocumentCatalog] = None,
+                     convert_docx: Optional[str] = None,
+                     dedup: Optional[DuplicateIndex] = None) -> bool:
     """
     Process a document using Mistral OCR.
     
     Args:
         file_path: Path to the document
         client: Mistral client
+        cache: OCR response cache; when a response for identical bytes and
+            settings exists, the upload and OCR calls are skipped
+        manifest: Ingestion manifest recording the stages and outcome
+        json_images: How images are stored in ocr_response.json ("inline" or "external")
+        compact_json: Write ocr_response.json without indentation
+        markdown_images: Link images from the markdown ("link") or embed them ("inline")
+        image_workers: Threads decoding and writing the document's images
+        image_format: Re-encode images to this format (see IMAGE_FORMATS); None keeps the original
+        image_quality: Quality used when re-encoding images
+        scheduler: Request scheduler shared by all documents of the run
+        uploads: Registry of files uploaded to Mistral during the run
+        inline_max_bytes: Largest document sent inline instead of uploaded
+        split_threshold_pages: Split PDFs with more pages than this into page
+            ranges OCR'd concurrently (0 disables splitting)
+        pages_per_chunk: Pages per range when splitting
+        split_workers: Page ranges of one document in flight at once
+        metrics: Registry collecting the per-stage timings of the run
+        disposition: How the input file is placed in processed_files/ or
+            error_files/ afterwards (see disposition.DISPOSITIONS)
+        catalog: Document catalog recording the written outputs for the viewer
+        convert_docx: Convert DOCX/DOC files to PDF locally with this
+            converter backend (see converter.BACKENDS) and OCR the PDF;
+            None sends them to Mistral as they are
+        dedup: Index of processed documents; a duplicate or near-duplicate
+            of one reuses its OCR response instead of calling Mistral
         
     Returns:
         True if processing was successful, False otherwise
     """
+    options = {
+        "json_images": json_images,
+        "compact_json": compact_json,
+        "markdown_images": markdown_images,
+        "image_workers": image_workers,
+        "image_format": image_format,
+        "image_quality": image_quality,
+        "scheduler": scheduler,
+        "uploads": uploads,
+        "inline_max_bytes": inline_max_bytes,
+        "split_threshold_pages": split_threshold_pages,
+        "pages_per_chunk": pages_per_chunk,
+        "split_workers": split_workers,
+        "disposition": disposition,
+        "catalog": catalog,
+        "convert_docx": convert_docx,
+        "dedup": dedup,
+    }
+    if metrics is not None:
+        doc_metrics = metrics.document(file_path.name)
+    else:
+        doc_metrics = DocumentMetrics("mistral", file_path.name)
+    
+    if manifest is not None:
+        manifest.start(file_path)
+    success = _process_document(file_path, client, cache, manifest, doc_metrics, **options)
+    doc_metrics.finish(success)
+    if manifest is not None:
+        manifest.finish(file_path, success)
+    return success
+
+def _process_document(file_path: Path, client: Mistral, cache: Optional[OCRCache],
+                      manifest: Optional[IngestionManifest], metrics: DocumentMetrics,
+                      json_images: str, compact_json: bool,
+                      markdown_images: str, image_workers: int, image_format: Optional[str],
+                      image_quality: int, scheduler: Optional[RequestScheduler],
+                      uploads: Optional[UploadRegistry], inline_max_bytes: int,
+                      split_threshold_pages: int, pages_per_chunk: int, split_workers: int,
+                      disposition: str, catalog: Optional[DocumentCatalog],
+                      convert_docx: Optional[str], dedup: Optional[DuplicateIndex]) -> bool:
+    """Run the stages of process_document(), recording progress in the manifest"""
     try:
         # Get file metadata
         metadata = get_file_metadata(file_path)
@@ -133,8 +699,10 @@ def process_document(file_path: Path, client: Mistral) -> bool:
         start_time = time.time()
         
         # Read file
-        with open(file_path, "rb") as f:
-            file_bytes = f.read()
+        with metrics.stage("read"):
+            with open(file_path, "rb") as f:
+                file_bytes = f.read()
+        metrics.add("bytes_read", len(file_bytes))
         
         # Log file type information
         if file_ext == '.pdf':
@@ -147,122 +715,157 @@ def process_document(file_path: Path, client: Mistral) -> bool:
             logger.warning(f"Unsupported file type: {file_ext}")
             return False
         
-        # Upload file to Mistral
-        print(f"Uploading file to Mistral...")
-        logger.info(f"Uploading file to Mistral: {file_path.name}")
-        try:
-            uploaded_file = client.files.upload(
-                file={
-                    "file_name": file_path.name,
-                    "content": file_bytes,
-                },
-                purpose=purpose
-            )
-            logger.info(f"File uploaded successfully with ID: {uploaded_file.id}")
-        except Exception as e:
-            logger.error(f"Error uploading file to Mistral: {str(e)}")
-            print(f"ERROR: Failed to upload file to Mistral: {str(e)}")
-            return False
+        with metrics.stage("hash"):
+            content_hash = hashlib.sha256(file_bytes).hexdigest()
+        if manifest is not None:
+            manifest.record_stage(file_path, "read", content_hash=content_hash)
         
-        # Get signed URL
-        try:
-            signed_url = client.files.get_signed_url(file_id=uploaded_file.id, expiry=1)
-            logger.info(f"Got signed URL for file: {uploaded_file.id}")
-        except Exception as e:
-            logger.error(f"Error getting signed URL: {str(e)}")
-            print(f"ERROR: Failed to get signed URL: {str(e)}")
-            return False
+        # OCR a locally converted PDF instead of the Word document; the
+        # conversion is skipped when the pre-stage in main() already made it
+        ocr_path = file_path
+        cache_hash = content_hash
+        if convert_docx is not None and file_ext in CONVERTIBLE_EXTENSIONS:
+            try:
+                with metrics.stage("convert"):
+                    pdf_path = convert_documents([file_path], CONVERTED_DIR, backend=convert_docx, workers=1)[file_path]
+            except Exception as e:
+                logger.warning(f"Could not convert {file_path.name} to PDF: {str(e)}")
+                pdf_path = None
+            if pdf_path is not None:
+                logger.info(f"Processing {file_path.name} as converted PDF {pdf_path}")
+                ocr_path = pdf_path
+                file_ext = ".pdf"
+                with open(pdf_path, "rb") as f:
+                    file_bytes = f.read()
+                metrics.add("bytes_read", len(file_bytes))
+                cache_hash = f"{content_hash}:{CONVERTED_CACHE_MARKER}"
+            else:
+                logger.warning(f"Sending {file_path.name} to Mistral as DOCX")
         
-        # Process with OCR
-        print(f"Processing with Mistral OCR...")
-        logger.info(f"Processing with Mistral OCR: {file_path.name}")
-        try:
-            ocr_response = client.ocr.process(
-                document=DocumentURLChunk(document_url=signed_url.url),
-                model="mistral-ocr-latest",
-                include_image_base64=True
-            )
-            logger.info(f"OCR processing completed successfully")
-        except Exception as e:
-            logger.error(f"Error processing with Mistral OCR: {str(e)}")
-            logger.error(traceback.format_exc())
-            print(f"ERROR: Failed to process with Mistral OCR: {str(e)}")
-            # Move to error directory
-            error_file_path = ERROR_DIR / file_path.name
-            shutil.copy2(file_path, error_file_path)
-            logger.info(f"File copied to error directory: {error_file_path}")
-            return False
+        # Look up a previous OCR response for identical content
+        cache_key = None
+        ocr_response = None
+        if cache is not None:
+            with metrics.stage("cache_lookup"):
+                cache_key = OCRCache.make_key(cache_hash, OCR_MODEL, INCLUDE_IMAGE_BASE64)
+                cached_response = cache.get(cache_key)
+                if cached_response is None and INCLUDE_IMAGE_BASE64:
+                    cached_response = load_previous_response(file_path, content_hash)
+                    if cached_response is not None:
+                        cache.put(cache_key, cached_response)
+                if cached_response is not None:
+                    ocr_response = OCRResponse.model_validate(cached_response)
+                    del cached_response
+            if ocr_response is not None:
+                logger.info(f"Using cached OCR response for {file_path.name} (key {cache_key[:12]})")
+                print(f"Using cached OCR response")
         
-        # Save OCR response as JSON
+        # Reuse the OCR response of a document this one duplicates
+        duplicate = None
+        if ocr_response is None and dedup is not None:
+            try:
+                with metrics.stage("dedup"):
+                    duplicate = dedup.find(file_path)
+                    if duplicate is not None:
+                        ocr_response = OCRResponse.model_validate(load_ocr_response(duplicate["output"]))
+            except Exception as e:
+                logger.warning(f"Could not reuse the output of a duplicate of {file_path.name}: {str(e)}")
+                duplicate = None
+            if ocr_response is not None:
+                logger.info(f"{file_path.name} duplicates {duplicate['path'].name} ({duplicate['kind']} match, "
+                            f"similarity {duplicate['similarity']:.2f}), reusing its OCR response")
+                print(f"Reusing the OCR response of duplicate {duplicate['path'].name}")
+        
+        cache_hit = ocr_response is not None
+        if cache_hit:
+            transport = "duplicate" if duplicate is not None else "cache"
+        else:
+            # Large PDFs are OCR'd as concurrent page ranges
+            chunks = []
+            if file_ext == '.pdf' and split_threshold_pages > 0:
+                try:
+                    with metrics.stage("split"):
+                        chunks = split_pdf(file_bytes, pages_per_chunk, min_pages=split_threshold_pages)
+                except Exception as e:
+                    logger.warning(f"Could not split {file_path.name}, sending it whole: {str(e)}")
+            
+            ocr_kwargs = {
+                "scheduler": scheduler,
+                "uploads": uploads,
+                "inline_max_bytes": inline_max_bytes,
+                "metrics": metrics,
+            }
+            if chunks:
+                transport = "split"
+                ocr_response = run_split_ocr(
+                    ocr_path, chunks, purpose, client, split_workers=split_workers, **ocr_kwargs
+                )
+                del chunks
+            else:
+                transport = "inline" if len(file_bytes) <= inline_max_bytes else "upload"
+                ocr_response = run_ocr(ocr_path, file_bytes, purpose, client, **ocr_kwargs)
+            if ocr_response is None:
+                dispose_failed_file(file_path, disposition)
+                return False
+        
+        # The document bytes are no longer needed once OCR has run
+        del file_bytes
+        if manifest is not None:
+            manifest.record_stage(file_path, "ocr")
+        
+        # Stream pages to the JSON, cache, image and markdown outputs
         ocr_json_path = doc_json_dir / "ocr_response.json"
+        output_markdown_path = doc_markdown_dir / f"{file_base}.md"
+        json_writers = []
         try:
-            with open(ocr_json_path, "w", encoding="utf-8") as json_file:
-                json.dump(ocr_response.model_dump(), json_file, indent=4, ensure_ascii=False)
-            logger.info(f"OCR response saved to {ocr_json_path}")
-            print(f"OCR response saved to {ocr_json_path}")
+            json_writers.append(OCRJsonWriter(
+                ocr_json_path,
+                indent=None if compact_json else 4,
+                externalize_images=json_images == "external"
+            ))
+            json_saved = True
         except Exception as e:
             logger.error(f"Error saving OCR response: {str(e)}")
             print(f"ERROR: Failed to save OCR response: {str(e)}")
-        
-        # Process and save markdown with images
-        global_counter = 1
-        updated_markdown_pages = []
+            json_saved = False
+        if cache is not None and not cache_hit:
+            try:
+                json_writers.append(cache.writer(cache_key))
+            except Exception as e:
+                logger.error(f"Error opening cache entry for {file_path.name}: {str(e)}")
         
         print(f"Extracting and processing images...")
         logger.info(f"Extracting and processing images from {file_path.name}")
         
-        # Log the number of pages in the response
-        logger.info(f"Document has {len(ocr_response.pages)} pages")
+        try:
+            with ImageSink(workers=image_workers, image_format=image_format, quality=image_quality) as image_sink:
+                page_count, total_images = stream_ocr_outputs(
+                    ocr_response, file_base, doc_images_dir, output_markdown_path, json_writers,
+                    markdown_images=markdown_images, image_sink=image_sink, metrics=metrics
+                )
+        except Exception:
+            for writer in json_writers:
+                writer.abort()
+            raise
         
-        for page_idx, page in enumerate(ocr_response.pages, 1):
-            updated_markdown = page.markdown
-            page_images_count = 0
-            
-            # Log the number of images on this page
-            logger.info(f"Page {page_idx} has {len(page.images)} images")
-            
-            for image_obj in page.images:
-                # Extract base64 image data
-                base64_str = image_obj.image_base64
-                if base64_str.startswith("data:"):
-                    base64_str = base64_str.split(",", 1)[1]
-                
-                try:
-                    image_bytes = base64.b64decode(base64_str)
-                    
-                    # Determine image extension
-                    ext = Path(image_obj.id).suffix if Path(image_obj.id).suffix else ".png"
-                    new_image_name = f"{file_base}_page{page_idx}_img_{global_counter}{ext}"
-                    global_counter += 1
-                    page_images_count += 1
-                    
-                    # Save image
-                    image_output_path = doc_images_dir / new_image_name
-                    with open(image_output_path, "wb") as f:
-                        f.write(image_bytes)
-                    
-                    # Update markdown with relative path to image
-                    updated_markdown = updated_markdown.replace(
-                        f"![{image_obj.id}]({image_obj.id})",
-                        f"![{new_image_name}](../images/{file_base}/{new_image_name})"
-                    )
-                except Exception as e:
-                    logger.error(f"Error processing image {image_obj.id}: {str(e)}")
-                    print(f"ERROR: Failed to process image: {str(e)}")
-            
-            updated_markdown_pages.append(updated_markdown)
-            logger.info(f"Page {page_idx}: Extracted {page_images_count} images")
+        # Image work happens on the sink's threads; record its summed time
+        metrics.record_stage("image_decode", image_sink.decode_seconds, image_sink.images_written)
+        metrics.record_stage("image_write", image_sink.write_seconds, image_sink.images_written)
+        metrics.add("pages", page_count)
+        metrics.add("images", total_images)
+        metrics.add("image_bytes_written", image_sink.bytes_written)
+        metrics.add("markdown_bytes_written", output_markdown_path.stat().st_size)
+        
+        if json_saved:
+            metrics.add("json_bytes_written", ocr_json_path.stat().st_size)
+            logger.info(f"OCR response saved to {ocr_json_path}")
+            print(f"OCR response saved to {ocr_json_path}")
         
         # Check if we have any markdown content
-        if not updated_markdown_pages:
+        if not page_count:
             logger.warning(f"No markdown content extracted from {file_path.name}")
             print(f"WARNING: No markdown content extracted from {file_path.name}")
         
-        # Save combined markdown
-        final_markdown = "\n\n".join(updated_markdown_pages)
-        output_markdown_path = doc_markdown_dir / f"{file_base}.md"
-        with open(output_markdown_path, "w", encoding="utf-8") as md_file:
-            md_file.write(final_markdown)
         logger.info(f"Markdown saved to {output_markdown_path}")
         print(f"Markdown saved to {output_markdown_path}")
         
@@ -272,16 +875,41 @@ def process_document(file_path: Path, client: Mistral) -> bool:
             "file_type": "PDF" if metadata["is_pdf"] else "DOCX/DOC",
             "file_size": metadata["size_human"],
             "processing_time": f"{time.time() - start_time:.2f} seconds",
-            "pages": len(ocr_response.pages),
-            "total_images": global_counter - 1,
+            "processing_seconds": round(time.time() - start_time, 3),
+            "stage_timings": metrics.stage_timings(),
+            "pages": page_count,
+            "total_images": total_images,
+            "image_bytes_written": image_sink.bytes_written,
+            "cache_hit": cache_hit,
+            "transport": transport,
+            "duplicate_of": str(duplicate["path"]) if duplicate is not None else None,
+            "json_images": json_images,
             "json_path": str(ocr_json_path),
             "markdown_path": str(output_markdown_path),
             "images_dir": str(doc_images_dir)
         }
         
         summary_path = doc_json_dir / "summary.json"
-        with open(summary_path, "w", encoding="utf-8") as f:
+        tmp_summary_path = summary_path.with_name(f".{summary_path.name}.{os.getpid()}.tmp")
+        with open(tmp_summary_path, "w", encoding="utf-8") as f:
             json.dump(summary, f, indent=4)
+        os.replace(tmp_summary_path, summary_path)
+        if manifest is not None:
+            manifest.record_stage(file_path, "outputs_written")
+        
+        # Let the viewer find the document without scanning the output directory
+        if catalog is not None and json_saved:
+            try:
+                catalog.record("mistral", JSON_OUTPUT_DIR, ocr_json_path, pages=page_count)
+            except Exception as e:
+                logger.error(f"Error updating the document catalog: {str(e)}")
+        
+        # Let later duplicates of this document reuse its OCR response
+        if dedup is not None and json_saved:
+            try:
+                dedup.add(file_path, ocr_json_path)
+            except Exception as e:
+                logger.error(f"Error updating the duplicate index: {str(e)}")
         
         # End timer
         elapsed_time = time.time() - start_time
@@ -290,9 +918,9 @@ def process_document(file_path: Path, client: Mistral) -> bool:
         print(f"{'='*80}\n")
         
         # Move processed file to processed directory
-        processed_file_path = PROCESSED_DIR / file_path.name
-        shutil.copy2(file_path, processed_file_path)
-        logger.info(f"File copied to {processed_file_path}")
+        with metrics.stage("copy"):
+            processed_file_path = dispose(file_path, PROCESSED_DIR, disposition)
+        logger.info(describe(disposition, processed_file_path))
         
         return True
     
@@ -302,15 +930,17 @@ def process_document(file_path: Path, client: Mistral) -> bool:
         print(f"ERROR: Failed to process {file_path.name}: {str(e)}")
         
         # Move to error directory
-        try:
-            error_file_path = ERROR_DIR / file_path.name
-            shutil.copy2(file_path, error_file_path)
-            logger.info(f"File copied to error directory: {error_file_path}")
-        except Exception as copy_error:
-            logger.error(f"Error copying file to error directory: {str(copy_error)}")
-        
+        dispose_failed_file(file_path, disposition)
         return False
 
+def dispose_failed_file(file_path: Path, disposition: str):
+    """Place a document that failed processing in ERROR_DIR"""
+    try:
+        error_file_path = dispose(file_path, ERROR_DIR, disposition)
+        logger.info(f"{describe(disposition, error_file_path)} (error directory)")
+    except Exception as copy_error:
+        logger.error(f"Error copying file to error directory: {str(copy_error)}")
+
 def display_processing_summary(successful_files: List[Path], failed_files: List[Path]):
     """Display a summary of the processing results"""
     print(f"\n{'='*80}")
@@ -352,12 +982,337 @@ def display_processing_summary(successful_files: List[Path], failed_files: List[
     logger.info(f"PDF files: {pdf_success}/{pdf_success + pdf_failed} successful")
     logger.info(f"DOCX files: {docx_success}/{docx_success + docx_failed} successful")
 
-def main():
+def process_documents_concurrently(files: List[Path], client: Mistral, workers: int, **process_kwargs) -> Dict[Path, bool]:
+    """
+    Process documents on a bounded thread pool so that the network phases
+    (upload, signed URL, OCR) of different documents overlap.
+    
+    Files sharing an output stem (e.g. "report.doc" and "report.docx") write to
+    the same per-document directories, so they are processed sequentially
+    within a single task to keep their outputs from interleaving.
+    
+    Args:
+        files: Files to process, in the order they should be reported
+        client: Mistral client (shared between workers)
+        workers: Maximum number of documents in flight
+        **process_kwargs: Extra keyword arguments passed to process_document()
+        
+    Returns:
+        Dictionary mapping each file to its processing result
+    """
+    groups: Dict[str, List[Path]] = {}
+    for file in files:
+        groups.setdefault(file.stem, []).append(file)
+    
+    def process_group(group: List[Path]) -> Dict[Path, bool]:
+        return {file: process_document(file, client, **process_kwargs) for file in group}
+    
+    results: Dict[Path, bool] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-worker") as executor:
+        for group_results in executor.map(process_group, groups.values()):
+            results.update(group_results)
+    
+    return results
+
+def process_claimed_document(file_path: Path, client: Mistral, work_queue: WorkQueue,
+                             **process_kwargs) -> Optional[bool]:
+    """
+    Process a document only if this worker wins its claim in the work queue.
+    
+    Args:
+        file_path: Path to the document
+        client: Mistral client
+        work_queue: Queue shared with the other worker processes
+        **process_kwargs: Extra keyword arguments passed to process_document()
+    
+    Returns:
+        The processing result, or None if the document was done or claimed
+        by another worker
+    """
+    lease = work_queue.claim(file_path)
+    if lease is None:
+        return None
+    success = False
+    try:
+        success = process_document(file_path, client, **process_kwargs)
+    finally:
+        lease.release(success, error=None if success else "processing failed")
+    return success
+
+def process_documents_from_queue(files: List[Path], client: Mistral, workers: int, work_queue: WorkQueue,
+                                 **process_kwargs) -> Dict[Path, bool]:
+    """
+    Process the documents of a shared input set that this process manages to claim.
+    
+    Several processes (on one or several machines) can run this on the same
+    files: each document is processed by whichever worker claims it first.
+    A document whose output stem is claimed for another file (e.g.
+    "report.doc" while "report.docx" is processed) is retried once that
+    claim is released, so their outputs never interleave.
+    
+    Args:
+        files: Candidate files
+        client: Mistral client (shared between threads)
+        workers: Documents processed at once by this process
+        work_queue: Queue shared with the other worker processes
+        **process_kwargs: Extra keyword arguments passed to process_document()
+    
+    Returns:
+        Dictionary mapping each file processed by this process to its result
+    """
+    results: Dict[Path, bool] = {}
+    pending = deque(files)
+    lock = threading.Lock()
+    
+    def work():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                file_path = pending.popleft()
+            
+            success = process_claimed_document(file_path, client, work_queue, **process_kwargs)
+            if success is not None:
+                with lock:
+                    results[file_path] = success
+                continue
+            
+            holder = work_queue.holder(file_path)
+            if holder is not None and holder != file_path.name and not work_queue.is_finished(file_path):
+                time.sleep(SIBLING_RETRY_SECONDS)
+                with lock:
+                    pending.append(file_path)
+            else:
+                logger.info(f"Skipping {file_path.name}: done or claimed by another worker")
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(work) for _ in range(workers)]
+        for future in futures:
+            future.result()
+    
+    return results
+
+def run_worker_processes(processes: int, options: Dict[str, Any]) -> List[Optional[int]]:
+    """
+    Run main() in several processes that share a work queue.
+    
+    Args:
+        processes: Number of worker processes
+        options: Keyword arguments for main() in each worker
+    
+    Returns:
+        Exit codes of the worker processes
+    """
+    workers = [
+        multiprocessing.Process(target=main, kwargs=options, name=f"ingest-worker-{i + 1}")
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+        raise
+    return [worker.exitcode for worker in workers]
+
+def watch_input_directory(client: Mistral, workers: int, process_options: Dict[str, Any],
+                          settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+                          poll_interval: float = DEFAULT_POLL_INTERVAL,
+                          metrics_json: Optional[Path] = None, metrics_prom: Optional[Path] = None,
+                          work_queue: Optional[WorkQueue] = None):
+    """
+    Process documents as they arrive in INPUT_DIR until interrupted.
+    
+    The Mistral client, request scheduler and cache are created once and
+    shared by every document, so each arrival only pays for its own API
+    calls. Files the manifest records as completed are skipped; with a work
+    queue, files the queue records as finished are.
+    
+    Args:
+        client: Mistral client (kept open between documents)
+        workers: Number of documents processed at once
+        process_options: Keyword arguments passed to process_document(); its
+            "manifest" (None in queue mode) decides which arrivals need work and its "metrics"
+            are exported periodically and when the service stops
+        settle_seconds: Time a file must stay unchanged before it is processed
+        poll_interval: Rescan interval when inotify is unavailable
+        metrics_json: Metrics JSON rewritten periodically
+        metrics_prom: Prometheus metrics rewritten periodically
+        work_queue: Queue shared with other watching workers, if any
+    """
+    manifest = process_options["manifest"]
+    metrics = process_options["metrics"]
+    watcher = DirectoryWatcher(INPUT_DIR, settle_seconds=settle_seconds, poll_interval=poll_interval)
+    print(f"Watching {INPUT_DIR} for new documents ({watcher.backend}); press Ctrl+C to stop")
+    
+    def handle(file_path: Path) -> Optional[bool]:
+        if work_queue is not None:
+            return process_claimed_document(file_path, client, work_queue, **process_options)
+        return process_document(file_path, client, **process_options)
+    
+    def should_process(file_path: Path) -> bool:
+        if work_queue is not None:
+            return not work_queue.is_finished(file_path)
+        return manifest.needs_processing(file_path)
+    
+    def on_done(file_path: Path, success: Optional[bool]):
+        if success is None:
+            print(f"Skipped: {file_path.name} (claimed by another worker)")
+            return
+        print(f"{'Processed' if success else 'FAILED'}: {file_path.name}")
+    
+    metrics_writer = MetricsWriter(metrics, json_path=metrics_json, prometheus_path=metrics_prom).start()
+    try:
+        watch_and_dispatch(watcher, handle, workers=max(1, workers),
+                           should_process=should_process, on_done=on_done)
+    finally:
+        metrics.finish()
+        metrics_writer.stop()
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Mistral OCR document ingestion pipeline")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of documents to process concurrently (default: {DEFAULT_WORKERS}, 1 = sequential)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always send documents to Mistral, ignoring cached OCR responses")
+    parser.add_argument("--reprocess", action="store_true",
+                        help="Process every input file, even those the manifest records as completed")
+    parser.add_argument("--json-images", choices=JSON_IMAGE_MODES, default=DEFAULT_JSON_IMAGE_MODE,
+                        help="Keep image base64 in ocr_response.json (inline) or reference the extracted image files (external)")
+    parser.add_argument("--compact-json", action="store_true",
+                        help="Write ocr_response.json without indentation")
+    parser.add_argument("--markdown-images", choices=MARKDOWN_IMAGE_MODES, default="link",
+                        help="Link extracted images from the markdown (link) or embed them as base64 (inline)")
+    parser.add_argument("--image-workers", type=int, default=DEFAULT_IMAGE_WORKERS,
+                        help=f"Threads decoding and writing images per document (default: {DEFAULT_IMAGE_WORKERS})")
+    parser.add_argument("--image-format", choices=sorted(IMAGE_FORMATS), default=None,
+                        help="Re-encode extracted images to this format (requires Pillow)")
+    parser.add_argument("--image-quality", type=int, default=80,
+                        help="Quality used when re-encoding images (default: 80)")
+    parser.add_argument("--max-rps", type=float, default=None,
+                        help="Maximum Mistral API requests started per second (default: unlimited)")
+    parser.add_argument("--max-concurrent-requests", type=int, default=DEFAULT_MAX_CONCURRENT_REQUESTS,
+                        help=f"Maximum Mistral API requests in flight (default: {DEFAULT_MAX_CONCURRENT_REQUESTS})")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help=f"Retries for throttled or failed API requests (default: {DEFAULT_MAX_RETRIES})")
+    parser.add_argument("--inline-max-bytes", type=int, default=DEFAULT_INLINE_MAX_BYTES,
+                        help=f"Send documents up to this size inline instead of uploading them "
+                             f"(default: {DEFAULT_INLINE_MAX_BYTES}, 0 = always upload)")
+    parser.add_argument("--keep-uploads", action="store_true",
+                        help="Do not delete uploaded documents from Mistral after OCR")
+    parser.add_argument("--split-threshold-pages", type=int, default=DEFAULT_SPLIT_THRESHOLD_PAGES,
+                        help=f"Split PDFs with more pages than this into page ranges OCR'd concurrently "
+                             f"(default: {DEFAULT_SPLIT_THRESHOLD_PAGES}, 0 = never split)")
+    parser.add_argument("--pages-per-chunk", type=int, default=DEFAULT_PAGES_PER_CHUNK,
+                        help=f"Pages per range when splitting a PDF (default: {DEFAULT_PAGES_PER_CHUNK})")
+    parser.add_argument("--split-workers", type=int, default=DEFAULT_SPLIT_WORKERS,
+                        help=f"Page ranges of one PDF processed at once (default: {DEFAULT_SPLIT_WORKERS})")
+    parser.add_argument("--metrics-json", type=Path, default=METRICS_JSON_PATH,
+                        help=f"Write per-stage timings and counters as JSON (default: {METRICS_JSON_PATH})")
+    parser.add_argument("--metrics-prom", type=Path, default=METRICS_PROMETHEUS_PATH,
+                        help=f"Write the same metrics in Prometheus text format (default: {METRICS_PROMETHEUS_PATH})")
+    parser.add_argument("--trace-file", type=Path, default=None,
+                        help="Export OpenTelemetry spans to this file (requires opentelemetry-sdk)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and process documents as they arrive in the input directory")
+    parser.add_argument("--settle-seconds", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help=f"In watch mode, time a file must stay unchanged before it is processed "
+                             f"(default: {DEFAULT_SETTLE_SECONDS})")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"In watch mode, rescan interval when inotify is unavailable (default: {DEFAULT_POLL_INTERVAL})")
+    parser.add_argument("--queue-dir", type=Path, default=None,
+                        help="Claim documents through a work queue in this directory, shared with other "
+                             "worker processes on this or other machines")
+    parser.add_argument("--processes", type=int, default=1,
+                        help=f"Run this many worker processes sharing a work queue "
+                             f"(default: 1; the queue defaults to {QUEUE_DIR})")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help=f"Time after which a document claimed by an unresponsive worker is taken over "
+                             f"(default: {DEFAULT_LEASE_SECONDS})")
+    parser.add_argument("--disposition", choices=DISPOSITIONS, default=DEFAULT_DISPOSITION,
+                        help=f"How input files are placed in processed_files/ and error_files/: copy, move "
+                             f"(out of the input directory), hardlink, reflink (copy-on-write clone), or "
+                             f"manifest (leave them in place) (default: {DEFAULT_DISPOSITION})")
+    parser.add_argument("--convert-docx", action="store_true",
+                        help=f"Convert DOCX/DOC files to PDF locally before OCR (in {CONVERTED_DIR})")
+    parser.add_argument("--converter-backend", choices=CONVERTER_BACKENDS, default="auto",
+                        help="Converter used by --convert-docx: headless LibreOffice, docx2pdf (needs "
+                             "Microsoft Word), or auto (LibreOffice when installed) (default: auto)")
+    parser.add_argument("--converter-workers", type=int, default=DEFAULT_CONVERTER_WORKERS,
+                        help=f"LibreOffice processes converting DOCX/DOC files before OCR "
+                             f"(default: {DEFAULT_CONVERTER_WORKERS})")
+    parser.add_argument("--dedup", choices=DEDUP_MODES, default=DEFAULT_DEDUP_MODE,
+                        help=f"Reuse the OCR response of an already processed document for byte-identical "
+                             f"files (exact) or also for files with nearly the same text (near) "
+                             f"(default: {DEFAULT_DEDUP_MODE})")
+    parser.add_argument("--dedup-threshold", type=float, default=DEFAULT_DEDUP_THRESHOLD,
+                        help=f"Text similarity above which --dedup near treats documents as duplicates "
+                             f"(default: {DEFAULT_DEDUP_THRESHOLD})")
+    return parser.parse_args()
+
+def main(workers: int = DEFAULT_WORKERS, use_cache: bool = True, reprocess: bool = False,
+         json_images: str = DEFAULT_JSON_IMAGE_MODE, compact_json: bool = False,
+         markdown_images: str = "link", image_workers: int = DEFAULT_IMAGE_WORKERS,
+         image_format: Optional[str] = None, image_quality: int = 80,
+         max_rps: Optional[float] = None, max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+         max_retries: int = DEFAULT_MAX_RETRIES, inline_max_bytes: int = DEFAULT_INLINE_MAX_BYTES,
+         keep_uploads: bool = False, split_threshold_pages: int = DEFAULT_SPLIT_THRESHOLD_PAGES,
+         pages_per_chunk: int = DEFAULT_PAGES_PER_CHUNK, split_workers: int = DEFAULT_SPLIT_WORKERS,
+         metrics_json: Optional[Path] = METRICS_JSON_PATH,
+         metrics_prom: Optional[Path] = METRICS_PROMETHEUS_PATH,
+         trace_file: Optional[Path] = None, watch: bool = False,
+         settle_seconds: float = DEFAULT_SETTLE_SECONDS, poll_interval: float = DEFAULT_POLL_INTERVAL,
+         queue_dir: Optional[Path] = None, processes: int = 1, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+         disposition: str = DEFAULT_DISPOSITION, convert_docx: bool = False,
+         converter_backend: str = "auto", converter_workers: int = DEFAULT_CONVERTER_WORKERS,
+         dedup: str = DEFAULT_DEDUP_MODE, dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD):
     """Main function to run the Mistral OCR document ingestion pipeline"""
+    # Fan out to several worker processes sharing a work queue
+    if processes > 1:
+        options = dict(locals())
+        options.update(processes=1, queue_dir=queue_dir or QUEUE_DIR)
+        print(f"Starting {processes} worker processes sharing the work queue in {options['queue_dir']}")
+        exit_codes = run_worker_processes(processes, options)
+        failed_workers = sum(1 for code in exit_codes if code != 0)
+        if failed_workers:
+            logger.error(f"{failed_workers} of {processes} worker processes exited with an error")
+            print(f"Error: {failed_workers} of {processes} worker processes exited with an error")
+        return
+    
     print(f"{'='*80}")
     print(f"MISTRAL OCR DOCUMENT INGESTION PIPELINE")
     print(f"{'='*80}")
     
+    # Re-encoding images needs Pillow
+    if image_format is not None and not PILLOW_AVAILABLE:
+        logger.error("Pillow is required to re-encode images")
+        print("Error: --image-format requires Pillow (pip install Pillow)")
+        return
+    
+    # Join the shared work queue; per-run outputs get per-worker names
+    work_queue = None
+    if queue_dir is not None:
+        work_queue = WorkQueue(queue_dir, lease_seconds=lease_seconds)
+        metrics_json = worker_output_path(metrics_json, work_queue.worker_id)
+        metrics_prom = worker_output_path(metrics_prom, work_queue.worker_id)
+        trace_file = worker_output_path(trace_file, work_queue.worker_id)
+        logger.info(f"Worker {work_queue.worker_id} using work queue {queue_dir}")
+        print(f"Worker {work_queue.worker_id} using work queue {queue_dir}")
+    
+    # Export OpenTelemetry spans if requested
+    tracer_provider = None
+    if trace_file is not None:
+        try:
+            tracer_provider = configure_tracing(trace_file)
+        except RuntimeError as e:
+            logger.error(str(e))
+            print(f"Error: {str(e)}")
+            return
+    
     # Load environment variables
     load_dotenv()
     
@@ -369,14 +1324,81 @@ def main():
         print("Please set the MISTRAL_API_KEY environment variable or create a .env file")
         return
     
-    # Initialize Mistral client
-    client = Mistral(api_key=api_key)
+    # Initialize Mistral client (MISTRAL_SERVER_URL points it at another endpoint, e.g. mock_services.py)
+    client = Mistral(api_key=api_key, server_url=os.getenv("MISTRAL_SERVER_URL"))
     print(f"Initialized Mistral client with API key: {api_key[:4]}...")
     logger.info(f"Initialized Mistral client with API key: {api_key[:4]}...")
     
+    # Share one request budget between all workers
+    scheduler = RequestScheduler(
+        requests_per_second=max_rps,
+        max_concurrent=max_concurrent_requests,
+        max_retries=max_retries
+    )
+    uploads = UploadRegistry(client, scheduler, keep_uploads=keep_uploads)
+    
     # Setup directories
     setup_directories()
     
+    # Initialize OCR response cache
+    cache = OCRCache(CACHE_DIR) if use_cache else None
+    if cache is not None:
+        logger.info(f"Using OCR response cache at {CACHE_DIR}")
+    
+    # Open the ingestion manifest, the document catalog read by the viewer and the
+    # index of processed documents that duplicates reuse. Queue workers may run on
+    # several hosts sharing the output root over NFS/SMB, where SQLite's locking is
+    # not reliable, so in queue mode completion is recorded only by the queue's
+    # done/failed markers and these databases are left alone.
+    manifest = None
+    catalog = None
+    duplicate_index = None
+    if work_queue is None:
+        manifest = IngestionManifest(MANIFEST_PATH, pipeline="mistral")
+        catalog = DocumentCatalog(DEFAULT_CATALOG_PATH)
+        if dedup != "off":
+            duplicate_index = DuplicateIndex(DEDUP_PATH, mode=dedup, threshold=dedup_threshold)
+    else:
+        logger.info("Queue mode: skipping the shared manifest, document catalog and duplicate index")
+    
+    # Collect per-stage timings of every document; a service keeps only the recent ones
+    metrics = MetricsRegistry("mistral", max_documents=WATCH_MAX_DOCUMENTS if watch else None)
+    
+    # Options passed to process_document()
+    process_options = {
+        "cache": cache,
+        "manifest": manifest,
+        "json_images": json_images,
+        "compact_json": compact_json,
+        "markdown_images": markdown_images,
+        "image_workers": image_workers,
+        "image_format": image_format,
+        "image_quality": image_quality,
+        "scheduler": scheduler,
+        "uploads": uploads,
+        "inline_max_bytes": inline_max_bytes,
+        "split_threshold_pages": split_threshold_pages,
+        "pages_per_chunk": pages_per_chunk,
+        "split_workers": split_workers,
+        "metrics": metrics,
+        "disposition": disposition,
+        "catalog": catalog,
+        "convert_docx": converter_backend if convert_docx else None,
+        "dedup": duplicate_index,
+    }
+    
+    # Service mode: process documents as they arrive until interrupted
+    if watch:
+        watch_input_directory(client, workers, process_options, settle_seconds=settle_seconds,
+                              poll_interval=poll_interval, metrics_json=metrics_json, metrics_prom=metrics_prom,
+                              work_queue=work_queue)
+        uploads.cleanup()
+        request_stats = scheduler.stats()
+        logger.info(f"API request stats: {request_stats}")
+        if tracer_provider is not None:
+            tracer_provider.shutdown()
+        return
+    
     # Get list of files to process
     pdf_files = list(INPUT_DIR.glob("*.pdf"))
     docx_files = list(INPUT_DIR.glob("*.docx")) + list(INPUT_DIR.glob("*.doc"))
@@ -387,6 +1409,32 @@ def main():
         print(f"No PDF or DOCX files found in {INPUT_DIR}")
         return
     
+    # Skip files the manifest records as already completed
+    if manifest is not None and not reprocess:
+        pending_files = set(manifest.pending(all_files))
+        skipped_count = len(all_files) - len(pending_files)
+        if skipped_count:
+            logger.info(f"Skipping {skipped_count} unchanged files already completed in {MANIFEST_PATH}")
+            print(f"Skipping {skipped_count} unchanged files already processed (use --reprocess to force)")
+        pdf_files = [f for f in pdf_files if f in pending_files]
+        docx_files = [f for f in docx_files if f in pending_files]
+        all_files = pdf_files + docx_files
+        
+        if not all_files:
+            print(f"All files in {INPUT_DIR} are up to date")
+            return
+    
+    # Leave out files other workers have already finished
+    if work_queue is not None:
+        claimable_files = set(work_queue.claimable(all_files))
+        pdf_files = [f for f in pdf_files if f in claimable_files]
+        docx_files = [f for f in docx_files if f in claimable_files]
+        all_files = pdf_files + docx_files
+        
+        if not all_files:
+            print(f"All files in {INPUT_DIR} have been processed by the workers sharing {queue_dir}")
+            return
+    
     logger.info(f"Found {len(all_files)} files to process: {len(pdf_files)} PDFs, {len(docx_files)} DOCX/DOC")
     print(f"Found {len(all_files)} files to process:")
     print(f"  - PDF files: {len(pdf_files)}")
@@ -396,6 +1444,34 @@ def main():
         metadata = get_file_metadata(file)
         print(f"  {i}. {file.name} ({metadata['size_human']})")
     
+    # Convert the Word documents to PDF in one pooled pass before OCR
+    if convert_docx and docx_files:
+        print(f"\nConverting {len(docx_files)} DOCX/DOC files to PDF...")
+        try:
+            converted = convert_documents(docx_files, CONVERTED_DIR, backend=converter_backend,
+                                          workers=converter_workers, progress=True)
+            converted_count = sum(1 for pdf_path in converted.values() if pdf_path is not None)
+            print(f"Converted {converted_count} of {len(docx_files)} DOCX/DOC files to PDF in {CONVERTED_DIR}")
+        except (RuntimeError, ValueError) as e:
+            logger.error(f"DOCX/DOC conversion unavailable, sending the files as DOCX: {str(e)}")
+            print(f"Warning: {str(e)}; sending DOCX/DOC files to Mistral as they are")
+            process_options["convert_docx"] = None
+    
+    # Hold back files duplicating another file of this run until that one has been processed
+    duplicate_files = []
+    if duplicate_index is not None:
+        batch_duplicates = duplicate_index.group(all_files)
+        duplicate_files = [f for f in all_files if f in batch_duplicates and batch_duplicates[f]["output"] is None]
+        if batch_duplicates:
+            logger.info(f"Found {len(batch_duplicates)} duplicate files, {len(duplicate_files)} of them "
+                        f"duplicating another file of this run")
+            print(f"Found {len(batch_duplicates)} duplicate files; they reuse the OCR response of:")
+            for file, match in batch_duplicates.items():
+                print(f"  - {file.name} -> {match['path'].name} ({match['kind']}, {match['similarity']:.2f})")
+        pdf_files = [f for f in pdf_files if f not in duplicate_files]
+        docx_files = [f for f in docx_files if f not in duplicate_files]
+        all_files = pdf_files + docx_files
+    
     print(f"\nStarting processing...")
     logger.info("Starting document processing")
     
@@ -403,31 +1479,117 @@ def main():
     successful_files = []
     failed_files = []
     
-    # Process PDFs first
-    if pdf_files:
-        print(f"\nProcessing PDF files...")
-        logger.info(f"Processing {len(pdf_files)} PDF files")
-        for file in pdf_files:
-            success = process_document(file, client)
-            if success:
+    if work_queue is not None:
+        print(f"\nProcessing the files this worker claims with {max(1, workers)} threads...")
+        logger.info(f"Claiming files from {queue_dir} with {max(1, workers)} threads")
+        results = process_documents_from_queue(all_files, client, max(1, workers), work_queue, **process_options)
+        work_queue.close()
+        for file in all_files:
+            if file in results:
+                if results[file]:
+                    successful_files.append(file)
+                else:
+                    failed_files.append(file)
+    elif workers <= 1:
+        # Process PDFs first
+        if pdf_files:
+            print(f"\nProcessing PDF files...")
+            logger.info(f"Processing {len(pdf_files)} PDF files")
+            for file in pdf_files:
+                success = process_document(file, client, **process_options)
+                if success:
+                    successful_files.append(file)
+                else:
+                    failed_files.append(file)
+        
+        # Then process DOCX files
+        if docx_files:
+            print(f"\nProcessing DOCX/DOC files...")
+            logger.info(f"Processing {len(docx_files)} DOCX/DOC files")
+            for file in docx_files:
+                success = process_document(file, client, **process_options)
+                if success:
+                    successful_files.append(file)
+                else:
+                    failed_files.append(file)
+    else:
+        print(f"\nProcessing {len(all_files)} files with {workers} workers...")
+        logger.info(f"Processing {len(all_files)} files concurrently with {workers} workers")
+        results = process_documents_concurrently(all_files, client, workers, **process_options)
+        for file in all_files:
+            if results[file]:
                 successful_files.append(file)
             else:
                 failed_files.append(file)
     
-    # Then process DOCX files
-    if docx_files:
-        print(f"\nProcessing DOCX/DOC files...")
-        logger.info(f"Processing {len(docx_files)} DOCX/DOC files")
-        for file in docx_files:
-            success = process_document(file, client)
-            if success:
+    # Then the duplicates held back, which find their canonical document's output in the index
+    if duplicate_files:
+        print(f"\nProcessing {len(duplicate_files)} duplicate files...")
+        logger.info(f"Processing {len(duplicate_files)} duplicate files")
+        results = process_documents_concurrently(duplicate_files, client, max(1, workers), **process_options)
+        for file in duplicate_files:
+            if results[file]:
                 successful_files.append(file)
             else:
                 failed_files.append(file)
     
+    # Remove uploads left behind by failed documents
+    uploads.cleanup()
+    
     # Display summary
     display_processing_summary(successful_files, failed_files)
+    
+    request_stats = scheduler.stats()
+    print(f"API requests: {request_stats['requests']} sent, {request_stats['retries']} retried, "
+          f"{request_stats['throttled']} throttled, {request_stats['failures']} failed")
+    logger.info(f"API request stats: {request_stats}")
+    
+    # Export the run's metrics
+    metrics.finish()
+    try:
+        metrics.write(json_path=metrics_json, prometheus_path=metrics_prom)
+        if metrics_json is not None:
+            print(f"Metrics saved to {metrics_json}")
+    except Exception as e:
+        logger.error(f"Error writing metrics: {str(e)}")
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
+    
     logger.info("Document processing completed")
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        reprocess=args.reprocess,
+        json_images=args.json_images,
+        compact_json=args.compact_json,
+        markdown_images=args.markdown_images,
+        image_workers=args.image_workers,
+        image_format=args.image_format,
+        image_quality=args.image_quality,
+        max_rps=args.max_rps,
+        max_concurrent_requests=args.max_concurrent_requests,
+        max_retries=args.max_retries,
+        inline_max_bytes=args.inline_max_bytes,
+        keep_uploads=args.keep_uploads,
+        split_threshold_pages=args.split_threshold_pages,
+        pages_per_chunk=args.pages_per_chunk,
+        split_workers=args.split_workers,
+        metrics_json=args.metrics_json,
+        metrics_prom=args.metrics_prom,
+        trace_file=args.trace_file,
+        watch=args.watch,
+        settle_seconds=args.settle_seconds,
+        poll_interval=args.poll_interval,
+        queue_dir=args.queue_dir,
+        processes=args.processes,
+        lease_seconds=args.lease_seconds,
+        disposition=args.disposition,
+        convert_docx=args.convert_docx,
+        converter_backend=args.converter_backend,
+        converter_workers=args.converter_workers,
+        dedup=args.dedup,
+        dedup_threshold=args.dedup_threshold
+    )
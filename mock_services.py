@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+# Local stand-ins for the Mistral OCR and Unstructured.io APIs
+# Replays recorded responses (mistral_output/json/*/ocr_response.json and
+# unstructured_json/*.json) with configurable latency, throttling and failure
+# injection, so both pipelines can be run and benchmarked offline.
+
+import io
+import json
+import time
+import uuid
+import base64
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
+
+# pypdf is only used to match recorded pages to split PDF chunks
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Default fixture locations: the recorded outputs checked into the repository
+REPO_DIR = Path(__file__).resolve().parent
+MISTRAL_FIXTURE_DIRS = [REPO_DIR / "mistral_output/json", REPO_DIR / "mistral_scanned_pdf_output/json"]
+UNSTRUCTURED_FIXTURE_DIRS = [REPO_DIR / "unstructured_json", REPO_DIR / "unstructured_scanned_pdf_jsons"]
+
+class FaultInjector:
+    """
+    Latency, throttling and failure behaviour shared by the mock services.
+    
+    Args:
+        latency: Base delay added to every request, in seconds
+        jitter: Maximum extra random delay, in seconds
+        rate_limit: Requests per second accepted before answering 429
+            (None for no limit)
+        failure_rate: Fraction of requests answered with a 500 error
+        seed: Seed for the random number generator
+    """
+    
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_limit: Optional[float] = None,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = rate_limit or 0.0
+        self._last_refill = time.monotonic()
+    
+    def check(self) -> Optional[Tuple[int, Dict[str, str]]]:
+        """
+        Decide whether a request is throttled or fails.
+        
+        Returns:
+            (status code, headers) for an injected error, or None to serve
+            the request normally
+        """
+        with self._lock:
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._last_refill) * self.rate_limit)
+                self._last_refill = now
+                if self._tokens < 1:
+                    retry_after = (1 - self._tokens) / self.rate_limit
+                    return 429, {"Retry-After": f"{retry_after:.2f}"}
+                self._tokens -= 1
+            
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                return 500, {}
+            
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        
+        if delay > 0:
+            time.sleep(delay)
+        return None
+
+def count_pdf_pages(data: bytes) -> Optional[int]:
+    """Count the pages of a PDF, or return None if it cannot be read"""
+    if PdfReader is None or not data.startswith(b"%PDF"):
+        return None
+    try:
+        return len(PdfReader(io.BytesIO(data)).pages)
+    except Exception:
+        return None
+
+def parse_multipart(content_type: str, body: bytes) -> Dict[str, Tuple[Optional[str], bytes]]:
+    """
+    Parse a multipart/form-data request body.
+    
+    Args:
+        content_type: Value of the request's Content-Type header
+        body: Raw request body
+    
+    Returns:
+        Mapping of field name to (file name or None, field value)
+    """
+    message = BytesParser(policy=policy.default).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name is not None:
+            fields[name] = (part.get_filename(), part.get_payload(decode=True) or b"")
+    return fields
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Request handler shared by both mock services"""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+    
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+    
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _inject_fault(self) -> bool:
+        fault = self.server.faults.check()
+        if fault is None:
+            return False
+        status, headers = fault
+        self.server.record("throttled" if status == 429 else "failed")
+        self._send_json(status, {"detail": "Injected by mock service"}, headers)
+        return True
+
+class MockServer(ThreadingHTTPServer):
+    """Threading HTTP server with fault injection and request statistics"""
+    
+    daemon_threads = True
+    
+    def __init__(self, address, handler, faults: FaultInjector):
+        super().__init__(address, handler)
+        self.faults = faults
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "failed": 0}
+        self.document_timings: Dict[str, List[Tuple[float, float]]] = {}
+    
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def record(self, counter: str):
+        with self._stats_lock:
+            self.stats[counter] += 1
+    
+    def record_timing(self, document: str, started: float, finished: float):
+        """Record when a request for a document was received and answered"""
+        with self._stats_lock:
+            self.document_timings.setdefault(document, []).append((started, finished))
+    
+    def start(self) -> threading.Thread:
+        """Serve requests on a background thread"""
+        thread = threading.Thread(target=self.serve_forever, name=type(self).__name__, daemon=True)
+        thread.start()
+        return thread
+
+class FixtureSet:
+    """
+    Recorded responses indexed for lookup by document name or size.
+    
+    Unknown documents get a fixture chosen deterministically from a hash of
+    their content, so every request is answered with realistic data.
+    """
+    
+    def __init__(self, paths: Dict[str, Path], sizes: Optional[Dict[int, str]] = None):
+        if not paths:
+            raise ValueError("No fixtures found")
+        self.paths = paths
+        self.sizes = sizes or {}
+        self._names = sorted(paths)
+        self._cache: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+    
+    def load(self, name: str) -> Any:
+        with self._lock:
+            if name not in self._cache:
+                with open(self.paths[name], "r", encoding="utf-8") as f:
+                    self._cache[name] = json.load(f)
+            return self._cache[name]
+    
+    def select(self, document_name: Optional[str], data: bytes) -> str:
+        """Pick the fixture for a document"""
+        if document_name:
+            for candidate in (document_name, Path(document_name).stem):
+                if candidate in self.paths:
+                    return candidate
+        if len(data) in self.sizes:
+            return self.sizes[len(data)]
+        digest = int(hashlib.sha256(data).hexdigest(), 16)
+        return self._names[digest % len(self._names)]
+
+class MistralHandler(MockHandler):
+    """Implements the file and OCR endpoints used by the Mistral pipeline"""
+    
+    def do_POST(self):
+        started = time.time()
+        self.server.record("requests")
+        body = self._read_body()
+        if self._inject_fault():
+            return
+        
+        path = urlparse(self.path).path
+        if path == "/v1/files":
+            fields = parse_multipart(self.headers.get("Content-Type", ""), body)
+            file_name, content = fields.get("file", (None, b""))
+            file_id = str(uuid.uuid4())
+            self.server.files[file_id] = (file_name or "document", content)
+            self._send_json(200, {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(content),
+                "created_at": int(time.time()),
+                "filename": file_name or "document",
+                "purpose": "ocr",
+                "sample_type": "ocr_input",
+                "source": "upload",
+            })
+        elif path == "/v1/ocr":
+            request = json.loads(body or b"{}")
+            document_name, data = self._resolve_document(request.get("document", {}))
+            if data is None:
+                self._send_json(404, {"detail": "Unknown document"})
+                return
+            response = self._build_response(document_name, data, request)
+            self.server.record_timing(document_name or "inline", started, time.time())
+            self._send_json(200, response)
+        else:
+            self._send_json(404, {"detail": "Not found"})
+    
+    def do_GET(self):
+        self.server.record("requests")
+        self._read_body()
+        if self._inject_fault():
+            return
+        
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if len(parts) == 4 and parts[:2] == ["v1", "files"] and parts[3] == "url":
+            if parts[2] not in self.server.files:
+                self._send_json(404, {"detail": "Unknown file"})
+                return
+            self._send_json(200, {"url": f"{self.server.url}/signed/{parts[2]}"})
+        else:
+            self._send_json(404, {"detail": "Not found"})
+    
+    def do_DELETE(self):
+        self.server.record("requests")
+        self._read_body()
+        if self._inject_fault():
+            return
+        
+        parts = urlparse(self.path).path.strip("/").split("/")
+        file_id = parts[2] if len(parts) == 3 else None
+        deleted = self.server.files.pop(file_id, None) is not None
+        self._send_json(200, {"id": file_id, "object": "file", "deleted": deleted})
+    
+    def _resolve_document(self, document: Dict[str, Any]) -> Tuple[Optional[str], Optional[bytes]]:
+        url = document.get("document_url", "")
+        if url.startswith("data:"):
+            return document.get("document_name"), base64.b64decode(url.split(",", 1)[1])
+        file_id = url.rstrip("/").rsplit("/", 1)[-1]
+        if file_id in self.server.files:
+            return self.server.files[file_id]
+        return None, None
+    
+    def _build_response(self, document_name: Optional[str], data: bytes, request: Dict[str, Any]) -> Dict[str, Any]:
+        fixture = self.server.fixtures.load(self.server.fixtures.select(document_name, data))
+        pages = fixture["pages"]
+        
+        # Answer split chunks with as many recorded pages as the chunk has
+        page_count = count_pdf_pages(data) or len(pages)
+        if pages:
+            pages = [dict(pages[i % len(pages)], index=i) for i in range(page_count)]
+        if not request.get("include_image_base64", False):
+            pages = [dict(page, images=[dict(image, image_base64=None) for image in page["images"]])
+                     for page in pages]
+        
+        return {
+            "pages": pages,
+            "model": fixture.get("model", request.get("model")),
+            "usage_info": {"pages_processed": len(pages), "doc_size_bytes": len(data)},
+        }
+
+class UnstructuredHandler(MockHandler):
+    """Implements the partition endpoint used by the Unstructured.io pipeline"""
+    
+    def do_POST(self):
+        started = time.time()
+        self.server.record("requests")
+        body = self._read_body()
+        if self._inject_fault():
+            return
+        
+        if urlparse(self.path).path.rstrip("/") != "/general/v0/general":
+            self._send_json(404, {"detail": "Not found"})
+            return
+        
+        fields = parse_multipart(self.headers.get("Content-Type", ""), body)
+        file_name, content = fields.get("files", (None, b""))
+        elements = self.server.fixtures.load(self.server.fixtures.select(file_name, content))
+        
+        # Split PDF requests carry the first page of the chunk they contain
+        starting_page = fields.get("starting_page_number", (None, b""))[1]
+        page_count = count_pdf_pages(content)
+        if starting_page and page_count:
+            first_page = int(starting_page)
+            elements = [
+                element for element in elements
+                if first_page <= element.get("metadata", {}).get("page_number", first_page) < first_page + page_count
+            ]
+        
+        self.server.record_timing(file_name or "unknown", started, time.time())
+        self._send_json(200, elements)
+
+def load_mistral_fixtures(fixture_dirs: List[Path] = MISTRAL_FIXTURE_DIRS) -> FixtureSet:
+    """Index recorded Mistral OCR responses by document name and size"""
+    paths = {path.parent.name: path
+             for fixtures_dir in fixture_dirs
+             for path in Path(fixtures_dir).glob("*/ocr_response.json")}
+    sizes = {}
+    for name, path in paths.items():
+        with open(path, "r", encoding="utf-8") as f:
+            usage = json.load(f).get("usage_info") or {}
+        if usage.get("doc_size_bytes"):
+            sizes[usage["doc_size_bytes"]] = name
+    return FixtureSet(paths, sizes)
+
+def load_unstructured_fixtures(fixture_dirs: List[Path] = UNSTRUCTURED_FIXTURE_DIRS) -> FixtureSet:
+    """Index recorded Unstructured.io element files by original file name"""
+    paths = {path.name[:-len(".json")]: path
+             for fixtures_dir in fixture_dirs
+             for path in Path(fixtures_dir).glob("*.json")}
+    return FixtureSet(paths)
+
+def start_mistral_server(faults: Optional[FaultInjector] = None, host: str = "127.0.0.1", port: int = 0,
+                         fixture_dirs: List[Path] = MISTRAL_FIXTURE_DIRS) -> MockServer:
+    """
+    Start the mock Mistral API on a background thread.
+    
+    Args:
+        faults: Latency, throttling and failure behaviour
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free port)
+        fixture_dirs: Directories of recorded OCR responses
+    
+    Returns:
+        The running server; its url attribute is the client's server_url
+    """
+    server = MockServer((host, port), MistralHandler, faults or FaultInjector())
+    server.fixtures = load_mistral_fixtures(fixture_dirs)
+    server.files = {}
+    server.start()
+    logger.info(f"Mock Mistral API listening on {server.url}")
+    return server
+
+def start_unstructured_server(faults: Optional[FaultInjector] = None, host: str = "127.0.0.1", port: int = 0,
+                              fixture_dirs: List[Path] = UNSTRUCTURED_FIXTURE_DIRS) -> MockServer:
+    """
+    Start the mock Unstructured.io partition API on a background thread.
+    
+    Args:
+        faults: Latency, throttling and failure behaviour
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free port)
+        fixture_dirs: Directories of recorded element files
+    
+    Returns:
+        The running server; its url attribute is the partition endpoint
+    """
+    server = MockServer((host, port), UnstructuredHandler, faults or FaultInjector())
+    server.fixtures = load_unstructured_fixtures(fixture_dirs)
+    server.start()
+    logger.info(f"Mock Unstructured.io API listening on {server.url}")
+    return server
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    """Add the fault injection options to a command line parser"""
+    parser.add_argument("--latency", type=float, default=0.5,
+                        help="Base delay per request in seconds (default: 0.5)")
+    parser.add_argument("--jitter", type=float, default=0.2,
+                        help="Maximum extra random delay per request in seconds (default: 0.2)")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="Requests per second accepted before answering 429 (default: unlimited)")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with a 500 error (default: 0)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for jitter and failures")
+
+def faults_from_args(args) -> FaultInjector:
+    """Build a FaultInjector from parsed fault injection options"""
+    return FaultInjector(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        failure_rate=args.failure_rate,
+        seed=args.seed
+    )
+
+def main():
+    """Run the mock services until interrupted"""
+    parser = argparse.ArgumentParser(description="Mock Mistral OCR and Unstructured.io services")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--mistral-port", type=int, default=8081, help="Port of the mock Mistral API")
+    parser.add_argument("--unstructured-port", type=int, default=8082, help="Port of the mock Unstructured.io API")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    mistral = start_mistral_server(faults_from_args(args), args.host, args.mistral_port)
+    unstructured = start_unstructured_server(faults_from_args(args), args.host, args.unstructured_port)
+    
+    print(f"Mock Mistral API:       MISTRAL_SERVER_URL={mistral.url}")
+    print(f"Mock Unstructured.io:   UNSTRUCTURED_API_URL={unstructured.url}")
+    print("Press Ctrl+C to stop")
+    
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        mistral.shutdown()
+        unstructured.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# Content-addressed cache for Mistral OCR responses
+# Responses are keyed by the hash of the document bytes plus the OCR settings,
+# so identical documents are never uploaded or OCR'd twice.
+
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from ocr_output import OCRJsonWriter
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class OCRCache:
+    """
+    Persistent OCR response cache stored as one JSON file per key.
+    
+    Entries are written atomically (temporary file + rename), so the cache can
+    be shared by concurrent workers and survives interrupted runs.
+    """
+    
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True, parents=True)
+    
+    @staticmethod
+    def make_key(content_hash: str, model: str, include_image_base64: bool) -> str:
+        """
+        Build a cache key from the document hash and the OCR settings.
+        
+        Args:
+            content_hash: SHA-256 hex digest of the document bytes
+            model: OCR model name
+            include_image_base64: Whether the response contains image payloads
+            
+        Returns:
+            Hex digest identifying the cache entry
+        """
+        key_source = f"{content_hash}:{model}:{int(include_image_base64)}"
+        return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+    
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+    
+    def entry_path(self, key: str) -> Path:
+        """Get the file a cache entry is stored in, creating its directory"""
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(exist_ok=True)
+        return entry_path
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a cached OCR response.
+        
+        Args:
+            key: Cache key from make_key()
+            
+        Returns:
+            The cached response as a dictionary, or None on a cache miss
+        """
+        entry_path = self._entry_path(key)
+        if not entry_path.exists():
+            return None
+        
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {entry_path}: {str(e)}")
+            return None
+    
+    def put(self, key: str, response_data: Dict[str, Any]) -> Optional[Path]:
+        """
+        Store an OCR response in the cache.
+        
+        Args:
+            key: Cache key from make_key()
+            response_data: OCR response as a dictionary (OCRResponse.model_dump())
+            
+        Returns:
+            Path of the cache entry, or None if it could not be written
+        """
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(exist_ok=True)
+        tmp_path = None
+        
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=entry_path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(response_data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, entry_path)
+            return entry_path
+        except Exception as e:
+            logger.error(f"Error writing cache entry {entry_path}: {str(e)}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return None
+    
+    def writer(self, key: str) -> OCRJsonWriter:
+        """
+        Open a streaming writer for a cache entry.
+        
+        The entry only becomes visible once the writer is closed, so readers
+        never see a partially written response.
+        
+        Args:
+            key: Cache key from make_key()
+            
+        Returns:
+            An atomic, compact OCRJsonWriter for the entry
+        """
+        return OCRJsonWriter(self.entry_path(key), indent=None, atomic=True)
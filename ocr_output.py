@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# Helpers for persisting Mistral OCR output
+# OCR responses are written one page at a time so that a page's payload can be
+# released as soon as it has been persisted.
+
+import io
+import os
+import re
+import json
+import base64
+import logging
+import mimetypes
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from utils import iter_json_array
+
+# Pillow is only needed when extracted images are re-encoded
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PILLOW_AVAILABLE = Image is not None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Markdown image syntax; Mistral emits placeholders as ![<image id>](<image id>)
+IMAGE_PLACEHOLDER_PATTERN = re.compile(r"!\[([^\]\n]*)\]\(([^)\n]*)\)")
+
+# How images are referenced in generated markdown
+MARKDOWN_IMAGE_MODES = ["link", "inline"]
+
+# Formats extracted images can be re-encoded to (requires Pillow)
+IMAGE_FORMATS = {"webp": ".webp", "png": ".png", "jpeg": ".jpeg"}
+
+def rewrite_image_placeholders(markdown: str, replacements: Dict[str, Tuple[str, str]]) -> str:
+    """
+    Resolve all image placeholders of a page in a single scan.
+    
+    Only placeholders whose alt text and target are the same image id are
+    rewritten; other images and ids without a replacement are left unchanged.
+    
+    Args:
+        markdown: Page markdown returned by Mistral OCR
+        replacements: Mapping of image id to the (alt text, target) to emit,
+            where the target is a relative file link or a base64 data URI
+        
+    Returns:
+        The markdown with placeholders replaced
+    """
+    if not replacements:
+        return markdown
+    
+    def replace(match):
+        image_id = match.group(2)
+        if match.group(1) != image_id or image_id not in replacements:
+            return match.group(0)
+        alt_text, target = replacements[image_id]
+        return f"![{alt_text}]({target})"
+    
+    return IMAGE_PLACEHOLDER_PATTERN.sub(replace, markdown)
+
+def decode_image(image_base64: str, image_format: Optional[str] = None, quality: int = 80) -> bytes:
+    """
+    Decode an extracted image, optionally re-encoding it.
+    
+    Args:
+        image_base64: Base64 payload, optionally as a data URI
+        image_format: Re-encode to this format (see IMAGE_FORMATS); None keeps the original
+        quality: Quality used when re-encoding
+        
+    Returns:
+        The image file contents
+    """
+    if image_base64.startswith("data:"):
+        image_base64 = image_base64.split(",", 1)[1]
+    image_bytes = base64.b64decode(image_base64)
+    
+    if image_format is not None:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            if image_format == "jpeg" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, format=image_format.upper(), quality=quality)
+        image_bytes = buffer.getvalue()
+    
+    return image_bytes
+
+class ImageSink:
+    """
+    Decode, optionally re-encode, and write extracted images on a thread pool.
+    
+    submit() returns immediately with a future for the number of bytes
+    written, so the caller can keep processing pages while images are saved.
+    Use as a context manager; leaving the block waits for pending writes.
+    """
+    
+    def __init__(self, workers: int = 4, image_format: Optional[str] = None, quality: int = 80):
+        if image_format is not None:
+            if image_format not in IMAGE_FORMATS:
+                raise ValueError(f"Unsupported image format: {image_format}")
+            if not PILLOW_AVAILABLE:
+                raise RuntimeError("Pillow is required to re-encode images (pip install Pillow)")
+        self.image_format = image_format
+        self.quality = quality
+        self.bytes_written = 0
+        self.images_written = 0
+        self.decode_seconds = 0.0  # Decoding and re-encoding, summed over threads
+        self.write_seconds = 0.0   # Writing image files, summed over threads
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-writer")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def close(self):
+        """Wait for pending writes and shut down the thread pool"""
+        self._executor.shutdown(wait=True)
+    
+    def extension_for(self, image_id: str) -> str:
+        """Get the file extension an image will be saved with"""
+        if self.image_format is not None:
+            return IMAGE_FORMATS[self.image_format]
+        return Path(image_id).suffix if Path(image_id).suffix else ".png"
+    
+    def submit(self, image_base64: str, output_path: Path) -> Future:
+        """
+        Queue an image for decoding and writing.
+        
+        Args:
+            image_base64: Base64 payload, optionally as a data URI
+            output_path: File to write the image to
+            
+        Returns:
+            Future resolving to the number of bytes written
+        """
+        return self._executor.submit(self._write, image_base64, Path(output_path))
+    
+    def _write(self, image_base64: str, output_path: Path) -> int:
+        decode_start = time.perf_counter()
+        image_bytes = decode_image(image_base64, self.image_format, self.quality)
+        
+        write_start = time.perf_counter()
+        with open(output_path, "wb") as f:
+            f.write(image_bytes)
+        write_end = time.perf_counter()
+        
+        with self._lock:
+            self.bytes_written += len(image_bytes)
+            self.images_written += 1
+            self.decode_seconds += write_start - decode_start
+            self.write_seconds += write_end - write_start
+        return len(image_bytes)
+
+class OCRJsonFormatter:
+    """
+    Render an OCR response as JSON text, piece by piece.
+    
+    Concatenating start(), page() for every page and end() gives the same
+    text as json.dump(ocr_response.model_dump()) with the given indent, so
+    writers can stream it to any kind of file.
+    """
+    
+    def __init__(self, json_dir: Path, indent: Optional[int] = 4, externalize_images: bool = False):
+        self.json_dir = Path(json_dir)
+        self.indent = indent
+        self.externalize_images = externalize_images
+        self.page_count = 0
+    
+    def _dumps(self, value: Any, level: int) -> str:
+        if self.indent is None:
+            return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        text = json.dumps(value, ensure_ascii=False, indent=self.indent)
+        return text.replace("\n", "\n" + " " * (self.indent * level))
+    
+    def start(self) -> str:
+        """Text opening the document and its "pages" list"""
+        if self.indent is None:
+            return '{"pages":['
+        return '{\n' + ' ' * self.indent + '"pages": ['
+    
+    def page(self, page_data: Dict[str, Any], image_files: Optional[Dict[str, Path]] = None) -> str:
+        """Text appending one page to the "pages" list (see OCRJsonWriter.write_page())"""
+        if self.externalize_images and image_files:
+            page_data = externalize_page_images(page_data, image_files, self.json_dir)
+        separator = "," if self.page_count else ""
+        self.page_count += 1
+        if self.indent is None:
+            return separator + self._dumps(page_data, 2)
+        return separator + "\n" + " " * (self.indent * 2) + self._dumps(page_data, 2)
+    
+    def end(self, response_fields: Dict[str, Any]) -> str:
+        """Text closing the "pages" list, followed by the remaining response fields"""
+        if self.indent is None:
+            parts = ["]"]
+            for key, value in response_fields.items():
+                parts.append(f",{json.dumps(key)}:{self._dumps(value, 1)}")
+            parts.append("}")
+        else:
+            pad = " " * self.indent
+            parts = [("\n" + pad + "]") if self.page_count else "]"]
+            for key, value in response_fields.items():
+                parts.append(f",\n{pad}{json.dumps(key)}: {self._dumps(value, 1)}")
+            parts.append("\n}")
+        return "".join(parts)
+
+class OCRJsonWriter:
+    """
+    Incrementally write an OCR response as JSON, page by page.
+    
+    The output has the same layout as json.dump(ocr_response.model_dump()):
+    a top-level object whose "pages" list comes first, followed by the
+    remaining response fields passed to close().
+    
+    With atomic=True the JSON is written to a temporary file next to the
+    target and only renamed into place by close(); abort() discards it.
+    
+    With externalize_images=True, images that were saved to disk are stored
+    as a reference to the image file instead of their base64 payload (see
+    externalize_page_images()); load_ocr_response() restores them.
+    """
+    
+    def __init__(self, path: Path, indent: Optional[int] = 4, atomic: bool = False,
+                 externalize_images: bool = False):
+        self.path = Path(path)
+        self.atomic = atomic
+        self._formatter = OCRJsonFormatter(self.path.parent, indent=indent, externalize_images=externalize_images)
+        
+        if atomic:
+            fd, self._write_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            self._file = os.fdopen(fd, "w", encoding="utf-8")
+        else:
+            self._write_path = str(self.path)
+            self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write(self._formatter.start())
+    
+    @property
+    def page_count(self) -> int:
+        return self._formatter.page_count
+    
+    def write_page(self, page_data: Dict[str, Any], image_files: Optional[Dict[str, Path]] = None):
+        """
+        Append one page to the "pages" list.
+        
+        Args:
+            page_data: Page as a dictionary (OCRPageObject.model_dump())
+            image_files: Mapping of image id to the file the image was saved
+                to; used when the writer externalizes images
+        """
+        self._file.write(self._formatter.page(page_data, image_files))
+    
+    def close(self, response_fields: Dict[str, Any]) -> Path:
+        """
+        Write the remaining top-level fields and finish the JSON document.
+        
+        Args:
+            response_fields: Response fields other than "pages"
+                (ocr_response.model_dump(exclude={"pages"}))
+            
+        Returns:
+            Path of the written JSON file
+        """
+        self._file.write(self._formatter.end(response_fields))
+        self._file.close()
+        
+        if self.atomic:
+            os.replace(self._write_path, self.path)
+        return self.path
+    
+    def abort(self):
+        """Stop writing and discard a partially written atomic file"""
+        if not self._file.closed:
+            self._file.close()
+        if self.atomic and os.path.exists(self._write_path):
+            os.unlink(self._write_path)
+
+def externalize_page_images(page_data: Dict[str, Any], image_files: Dict[str, Path],
+                            json_dir: Path) -> Dict[str, Any]:
+    """
+    Replace the base64 payload of saved images with a reference to their file.
+    
+    Each externalized image gets "image_base64": None, an "image_file" path
+    relative to json_dir and the "image_base64_prefix" (e.g.
+    "data:image/jpeg;base64,") needed to rebuild the original value. Images
+    without a saved file keep their payload.
+    
+    Args:
+        page_data: Page as a dictionary; it is not modified
+        image_files: Mapping of image id to the saved image file
+        json_dir: Directory of the JSON file the page is written to
+        
+    Returns:
+        A copy of the page with externalized images
+    """
+    images = []
+    for image in page_data.get("images", []):
+        image_file = image_files.get(image.get("id"))
+        base64_str = image.get("image_base64")
+        if image_file is None or not base64_str:
+            images.append(image)
+            continue
+        
+        prefix = ""
+        if base64_str.startswith("data:"):
+            # Re-encoded images change type, so describe the saved file
+            mime_type = mimetypes.guess_type(str(image_file))[0]
+            prefix = f"data:{mime_type};base64," if mime_type else base64_str.split(",", 1)[0] + ","
+        image = dict(image)
+        image["image_base64"] = None
+        image["image_file"] = Path(os.path.relpath(image_file, json_dir)).as_posix()
+        image["image_base64_prefix"] = prefix
+        images.append(image)
+    
+    return {**page_data, "images": images}
+
+def rehydrate_page_images(page_data: Dict[str, Any], json_dir: Path) -> Dict[str, Any]:
+    """
+    Restore the base64 payload of images externalized by externalize_page_images().
+    
+    Args:
+        page_data: Page as a dictionary; modified in place
+        json_dir: Directory of the JSON file the page was read from
+        
+    Returns:
+        The page with "image_base64" filled in again
+    """
+    for image in page_data.get("images", []):
+        image_file = image.pop("image_file", None)
+        prefix = image.pop("image_base64_prefix", "")
+        if image_file is None or image.get("image_base64"):
+            continue
+        with open(Path(json_dir) / image_file, "rb") as f:
+            image["image_base64"] = prefix + base64.b64encode(f.read()).decode("ascii")
+    return page_data
+
+def load_ocr_response(json_path: Path, rehydrate: bool = True) -> Dict[str, Any]:
+    """
+    Load an OCR response written by the pipeline.
+    
+    Args:
+        json_path: Path to ocr_response.json
+        rehydrate: Whether to restore externalized image payloads from the
+            image files; the viewer and other text-only readers can skip this
+        
+    Returns:
+        The OCR response as a dictionary
+    """
+    json_path = Path(json_path)
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    
+    if rehydrate:
+        for page in data.get("pages", []):
+            rehydrate_page_images(page, json_path.parent)
+    
+    return data
+
+def iter_ocr_pages(json_path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the pages of an OCR response written by the pipeline.
+    
+    Pages are decoded one at a time, and each page's image payloads are
+    dropped as soon as it is decoded (externalized images are not read), so
+    a reader that stops after the pages it needs never parses the rest of
+    the response. Responses whose "pages" are not the first member are
+    loaded whole instead.
+    
+    Args:
+        json_path: Path to ocr_response.json
+        
+    Yields:
+        The pages in order, with image metadata but without image_base64
+    """
+    def without_payloads(page):
+        for image in page.get("images") or []:
+            image.pop("image_base64", None)
+        return page
+    
+    try:
+        pages = iter_json_array(json_path, key="pages")
+        first_page = next(pages, None)
+    except ValueError:
+        for page in load_ocr_response(json_path, rehydrate=False).get("pages", []):
+            yield without_payloads(page)
+        return
+    
+    if first_page is not None:
+        yield without_payloads(first_page)
+        for page in pages:
+            yield without_payloads(page)
@@ -3,15 +3,25 @@
 # This script helps view processed document data in a user-friendly way
 
 import os
+import io
+import re
 import json
+import pydoc
+import shutil
 import argparse
 import textwrap
+import contextlib
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 import colorama
 from colorama import Fore, Back, Style
 from tabulate import tabulate
 
+from catalog import DEFAULT_CATALOG_PATH, DocumentCatalog
+from ocr_output import IMAGE_PLACEHOLDER_PATTERN, iter_ocr_pages, load_ocr_response
+from search_index import HIGHLIGHT_END, HIGHLIGHT_START, SearchIndex
+from utils import document_stem, iter_elements, iter_json_array, trim_element
+
 # Initialize colorama
 colorama.init()
 
@@ -21,16 +31,22 @@ MISTRAL_JSON_DIR = Path("mistral_output/json")
 MISTRAL_MARKDOWN_DIR = Path("mistral_output/markdown")
 MISTRAL_IMAGES_DIR = Path("mistral_output/images")
 
+# Catalog of the pipelines' outputs, kept up to date by the pipelines
+CATALOG_PATH = DEFAULT_CATALOG_PATH
+
+# Page selections accepted by --pages, e.g. "12" or "10-20"
+PAGE_RANGE_PATTERN = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+))?\s*$")
+
 def print_header(title, color=Fore.CYAN):
     """Print a formatted header"""
-    width = os.get_terminal_size().columns
+    width = shutil.get_terminal_size().columns
     print(f"\n{color}" + "=" * width)
     print(f"{title}".center(width))
     print("=" * width + f"{Style.RESET_ALL}")
 
 def print_section(title, color=Fore.YELLOW):
     """Print a section header"""
-    width = os.get_terminal_size().columns
+    width = shutil.get_terminal_size().columns
     print(f"\n{color}" + "-" * width)
     print(f" {title} ".center(width, "-"))
     print("-" * width + f"{Style.RESET_ALL}")
@@ -39,34 +55,64 @@ def wrap_text(text, width=100):
     """Wrap text to a specified width"""
     return "\n".join(textwrap.wrap(text, width=width))
 
-def get_available_documents():
-    """Get a list of all available processed documents"""
-    unstructured_docs = []
-    mistral_docs = []
-    
-    # Check for Unstructured.io documents
-    if UNSTRUCTURED_DIR.exists():
-        for file_path in UNSTRUCTURED_DIR.glob("*.json"):
-            unstructured_docs.append(file_path.stem)
-    
-    # Check for Mistral documents
-    if MISTRAL_JSON_DIR.exists():
-        # Look for JSON files directly in the directory or its subdirectories
-        for file_path in MISTRAL_JSON_DIR.glob("**/*.json"):
-            # Get the parent directory name if it's in a subdirectory
-            if file_path.parent.name != MISTRAL_JSON_DIR.name:
-                mistral_docs.append(file_path.parent.name)
-            else:
-                # If JSON is directly in the main directory, use the filename without extension
-                mistral_docs.append(file_path.stem)
-    
-    # Remove duplicates
-    mistral_docs = list(set(mistral_docs))
+def open_catalog(rescan=False):
+    """
+    Open the document catalog.
+    
+    Output directories the catalog has not seen yet (e.g. outputs written
+    before it existed) are scanned once; with rescan, both directories are
+    reconciled with the filesystem again.
+    """
+    catalog = DocumentCatalog(CATALOG_PATH)
+    if rescan:
+        catalog.scan("unstructured", UNSTRUCTURED_DIR)
+        catalog.scan("mistral", MISTRAL_JSON_DIR)
+    else:
+        catalog.ensure_scanned("unstructured", UNSTRUCTURED_DIR)
+        catalog.ensure_scanned("mistral", MISTRAL_JSON_DIR)
+    return catalog
+
+def get_available_documents(rescan=False):
+    """
+    Get a list of all available processed documents from the catalog.
+    
+    Documents are named by input file name, so "report.pdf.json" and the
+    "report/" directory whose summary records "report.pdf" are listed once
+    as "report.pdf", and "report.doc" and "report.docx" are listed apart.
+    A Mistral output without a recorded input name is listed under the one
+    Unstructured.io input with its stem, if there is exactly one.
+    """
+    with open_catalog(rescan=rescan) as catalog:
+        unstructured_entries = catalog.documents(UNSTRUCTURED_DIR)
+        mistral_entries = catalog.documents(MISTRAL_JSON_DIR)
+    
+    unstructured_docs = {entry["name"] for entry in unstructured_entries}
+    stems = {}
+    for name in unstructured_docs:
+        stems.setdefault(document_stem(name), []).append(name)
+    
+    def mistral_name(entry):
+        candidates = stems.get(entry["name"], [])
+        if document_stem(entry["name"]) == entry["name"] and len(candidates) == 1:
+            return candidates[0]
+        return entry["name"]
+    
+    mistral_docs = {mistral_name(entry) for entry in mistral_entries}
+    
+    # Page counts, preferring Mistral's (Unstructured.io has none for DOCX inputs)
+    pages = {}
+    for entry in unstructured_entries:
+        if entry["pages"] is not None:
+            pages[entry["name"]] = entry["pages"]
+    for entry in mistral_entries:
+        if entry["pages"] is not None:
+            pages[mistral_name(entry)] = entry["pages"]
     
     return {
-        "unstructured": unstructured_docs,
-        "mistral": mistral_docs,
-        "both": list(set(unstructured_docs) & set(mistral_docs))
+        "unstructured": sorted(unstructured_docs),
+        "mistral": sorted(mistral_docs),
+        "both": sorted(unstructured_docs & mistral_docs),
+        "pages": pages
     }
 
 def display_document_list(documents):
@@ -77,44 +123,50 @@ def display_document_list(documents):
     combined_table = []
     
     # Add documents from both pipelines
-    for doc in sorted(set(documents["unstructured"] + documents["mistral"])):
-        in_unstructured = "✓" if doc in documents["unstructured"] else ""
-        in_mistral = "✓" if doc in documents["mistral"] else ""
-        combined_table.append([len(combined_table) + 1, doc, in_unstructured, in_mistral])
+    unstructured_docs = set(documents["unstructured"])
+    mistral_docs = set(documents["mistral"])
+    pages = documents.get("pages", {})
+    for doc in sorted(unstructured_docs | mistral_docs):
+        in_unstructured = "✓" if doc in unstructured_docs else ""
+        in_mistral = "✓" if doc in mistral_docs else ""
+        combined_table.append([len(combined_table) + 1, doc, in_unstructured, in_mistral, pages.get(doc, "")])
     
     # Display the combined table
-    print(tabulate(combined_table, headers=["#", "Document Name", "Unstructured", "Mistral"], tablefmt="pretty"))
+    print(tabulate(combined_table, headers=["#", "Document Name", "Unstructured", "Mistral", "Pages"],
+                   tablefmt="pretty"))
     
     # Return just the document names
     return [doc[1] for doc in combined_table]
 
 def read_unstructured_json(doc_name):
-    """Read and parse Unstructured.io JSON data"""
-    json_files = list(UNSTRUCTURED_DIR.glob(f"{doc_name}*.json"))
+    """Read the text fields of the Unstructured.io elements (streamed, without their source metadata)"""
+    # Look the element file up by exact name ("report.pdf") or stem ("report")
+    with open_catalog() as catalog:
+        entry = catalog.lookup(UNSTRUCTURED_DIR, doc_name)
     
-    if not json_files:
+    if entry is None:
         return None
     
     try:
-        with open(json_files[0], 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
+        return list(iter_elements(entry["path"]))
     except Exception as e:
         print(f"{Fore.RED}Error reading Unstructured.io JSON: {str(e)}{Style.RESET_ALL}")
         return None
 
 def read_mistral_json(doc_name):
     """Read and parse Mistral OCR JSON data"""
-    json_dir = MISTRAL_JSON_DIR / doc_name
+    with open_catalog() as catalog:
+        entry = catalog.lookup(MISTRAL_JSON_DIR, doc_name)
     
-    # First try looking in a subdirectory with the document name
-    if json_dir.exists():
+    # First try looking in the document's output directory
+    if entry is not None:
+        json_dir = Path(entry["path"]).parent
         try:
             # Read OCR response
             ocr_json_path = json_dir / "ocr_response.json"
             if ocr_json_path.exists():
-                with open(ocr_json_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                # Image payloads are not displayed, so externalized images stay on disk
+                data = load_ocr_response(ocr_json_path, rehydrate=False)
                 
                 # Read summary
                 summary_path = json_dir / "summary.json"
@@ -128,12 +180,11 @@ def read_mistral_json(doc_name):
         except Exception as e:
             print(f"{Fore.RED}Error reading Mistral JSON from directory: {str(e)}{Style.RESET_ALL}")
     
-    # If not found in subdirectory, try looking for files directly in the main directory
+    # If not found in subdirectory, try a JSON file named after the document in the main directory
     try:
-        # Look for files with the document name in the filename
-        ocr_files = list(MISTRAL_JSON_DIR.glob(f"{doc_name}*.json"))
-        if ocr_files:
-            with open(ocr_files[0], 'r', encoding='utf-8') as f:
+        ocr_file = MISTRAL_JSON_DIR / f"{document_stem(doc_name)}.json"
+        if ocr_file.exists():
+            with open(ocr_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             return {"ocr_data": data, "summary": {}}
     except Exception as e:
@@ -143,7 +194,7 @@ def read_mistral_json(doc_name):
 
 def read_mistral_markdown(doc_name):
     """Read Mistral OCR markdown data"""
-    markdown_dir = MISTRAL_MARKDOWN_DIR / doc_name
+    markdown_dir = MISTRAL_MARKDOWN_DIR / document_stem(doc_name)
     
     if not markdown_dir.exists():
         return None
@@ -163,7 +214,7 @@ def read_mistral_markdown(doc_name):
 
 def get_mistral_images(doc_name):
     """Get list of images extracted by Mistral OCR"""
-    images_dir = MISTRAL_IMAGES_DIR / doc_name
+    images_dir = MISTRAL_IMAGES_DIR / document_stem(doc_name)
     
     if not images_dir.exists():
         return []
@@ -179,13 +230,22 @@ def display_unstructured_data(data):
     print_section("UNSTRUCTURED.IO EXTRACTED CONTENT", Fore.GREEN)
     
     # Extract and display just the text content
-    full_text = ""
-    for element in data:
-        if "text" in element and element["text"]:
-            full_text += element["text"].strip() + "\n\n"
+    full_text = "\n\n".join(element["text"].strip() for element in data if element.get("text"))
     
     print(f"{Fore.WHITE}{full_text}{Style.RESET_ALL}")
 
+def without_image_payloads(value):
+    """Copy JSON data with base64 image payloads replaced by their size"""
+    if isinstance(value, dict):
+        return {
+            key: f"<{len(item)} characters of image data>" if key == "image_base64" and isinstance(item, str)
+            else without_image_payloads(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [without_image_payloads(item) for item in value]
+    return value
+
 def display_mistral_data(json_data, markdown_content, images):
     """Display Mistral OCR data in a readable format"""
     if not json_data and not markdown_content and not images:
@@ -219,12 +279,17 @@ def display_mistral_data(json_data, markdown_content, images):
             print(f"{Fore.WHITE}{ocr_data['text']}{Style.RESET_ALL}")
             text_found = True
         
-        # Check for pages array with text
+        # Check for pages array with text (or Mistral markdown, shown below)
         elif isinstance(ocr_data, dict) and "pages" in ocr_data and isinstance(ocr_data["pages"], list):
             for i, page in enumerate(ocr_data["pages"], 1):
-                if isinstance(page, dict) and "text" in page:
+                if isinstance(page, dict) and "markdown" in page and markdown_content:
+                    print(f"{Fore.YELLOW}{len(ocr_data['pages'])} pages, shown in the Markdown Content "
+                          f"section (use --page N to view one){Style.RESET_ALL}")
+                    text_found = True
+                    break
+                if isinstance(page, dict) and ("text" in page or "markdown" in page):
                     print(f"{Fore.YELLOW}[Page {i}]{Style.RESET_ALL}")
-                    print(f"{Fore.WHITE}{page['text']}{Style.RESET_ALL}")
+                    print(f"{Fore.WHITE}{page.get('text', page.get('markdown'))}{Style.RESET_ALL}")
                     print(f"{Fore.BLUE}{'-' * 50}{Style.RESET_ALL}")
                     text_found = True
         
@@ -243,7 +308,7 @@ def display_mistral_data(json_data, markdown_content, images):
         if not text_found:
             print(f"{Fore.YELLOW}Full JSON Content:{Style.RESET_ALL}")
             try:
-                formatted_json = json.dumps(ocr_data, indent=2)
+                formatted_json = json.dumps(without_image_payloads(ocr_data), indent=2)
                 print(f"{Fore.WHITE}{formatted_json}{Style.RESET_ALL}")
             except Exception as e:
                 print(f"{Fore.RED}Error formatting JSON: {str(e)}{Style.RESET_ALL}")
@@ -272,8 +337,10 @@ def view_document(doc_name):
     # Get data from both pipelines
     unstructured_data = read_unstructured_json(doc_name)
     mistral_json = read_mistral_json(doc_name)
-    mistral_markdown = read_mistral_markdown(doc_name)
-    mistral_images = get_mistral_images(doc_name)
+    # The markdown and images directories are shared by inputs with the same stem,
+    # so they belong to this document only if its OCR response was found
+    mistral_markdown = read_mistral_markdown(doc_name) if mistral_json else None
+    mistral_images = get_mistral_images(doc_name) if mistral_json else []
     
     # Display data from both pipelines
     print_header("DOCUMENT CONTENT COMPARISON", Fore.YELLOW)
@@ -286,6 +353,153 @@ def view_document(doc_name):
     if not unstructured_data and not mistral_json and not mistral_markdown and not mistral_images:
         print(f"{Fore.RED}No data available for this document from either pipeline.{Style.RESET_ALL}")
 
+def search_documents(query, pipeline=None, limit=20):
+    """Search both pipelines' outputs, updating the search index first"""
+    print_header(f"SEARCH: {query}", Fore.MAGENTA)
+    
+    try:
+        with SearchIndex() as index:
+            # Only output files changed since the last search are re-read
+            index.update()
+            results = index.search(query, pipeline=pipeline, limit=limit)
+    except Exception as e:
+        print(f"{Fore.RED}Error searching documents: {str(e)}{Style.RESET_ALL}")
+        return
+    
+    if not results:
+        print(f"{Fore.RED}No documents match '{query}'.{Style.RESET_ALL}")
+        return
+    
+    for i, result in enumerate(results, 1):
+        page = result["page"] if result["page"] is not None else "-"
+        pipeline_color = Fore.GREEN if result["pipeline"] == "unstructured" else Fore.MAGENTA
+        snippet = " ".join(result["snippet"].split())
+        snippet = snippet.replace(HIGHLIGHT_START, f"{Fore.YELLOW}{Style.BRIGHT}")
+        snippet = snippet.replace(HIGHLIGHT_END, f"{Style.RESET_ALL}{Fore.WHITE}")
+        print(f"\n{Fore.CYAN}{i}. {result['document']}{Style.RESET_ALL} "
+              f"{pipeline_color}[{result['pipeline']}]{Style.RESET_ALL} {Fore.YELLOW}page {page}{Style.RESET_ALL}")
+        print(f"   {Fore.WHITE}{snippet}{Style.RESET_ALL}")
+    
+    print(f"\n{Fore.YELLOW}{len(results)} matching pages (best matches first). "
+          f"Use --doc <name> to view a document.{Style.RESET_ALL}")
+
+def parse_page_range(text):
+    """
+    Parse a page selection such as "12" or "10-20".
+    
+    Returns:
+        (first page, last page), both inclusive
+    """
+    match = PAGE_RANGE_PATTERN.match(text)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid page range '{text}' (expected N or A-B)")
+    first = int(match.group(1))
+    last = int(match.group(2) or first)
+    if first < 1 or last < first:
+        raise argparse.ArgumentTypeError(f"invalid page range '{text}'")
+    return first, last
+
+def read_unstructured_pages(doc_name, first, last):
+    """
+    Read the element texts of the selected pages of an Unstructured.io output.
+    
+    The element file is streamed and reading stops at the first element
+    past the last page, so only the start of the file up to the selection
+    is parsed.
+    
+    Returns:
+        Dictionary mapping page numbers to their element texts, or None if
+        the document has no Unstructured.io output
+    """
+    with open_catalog() as catalog:
+        entry = catalog.lookup(UNSTRUCTURED_DIR, doc_name)
+    if entry is None:
+        return None
+    
+    pages = {}
+    for element in iter_json_array(entry["path"]):
+        element = trim_element(element)
+        page = (element.get("metadata") or {}).get("page_number")
+        if page is None:
+            continue
+        if page > last:
+            break
+        if page >= first and element.get("text"):
+            pages.setdefault(page, []).append(element["text"].strip())
+    return pages
+
+def read_mistral_pages(doc_name, first, last):
+    """
+    Read the selected pages of a Mistral OCR response.
+    
+    Pages are streamed from ocr_response.json and reading stops after the
+    last selected page; image payloads are never loaded.
+    
+    Returns:
+        List of the selected pages, or None if the document has no Mistral output
+    """
+    with open_catalog() as catalog:
+        entry = catalog.lookup(MISTRAL_JSON_DIR, doc_name)
+    if entry is None:
+        return None
+    
+    pages = []
+    for position, page in enumerate(iter_ocr_pages(entry["path"])):
+        page_number = page.get("index", position) + 1
+        if page_number > last:
+            break
+        if page_number >= first:
+            pages.append(page)
+    return pages
+
+def view_document_pages(doc_name, first, last):
+    """View the selected pages of a document from both pipelines, loading only those pages"""
+    page_label = f"PAGE {first}" if first == last else f"PAGES {first}-{last}"
+    print_header(f"VIEWING DOCUMENT: {doc_name} ({page_label})", Fore.MAGENTA)
+    
+    unstructured_pages = read_unstructured_pages(doc_name, first, last)
+    if unstructured_pages is None:
+        print(f"{Fore.RED}No Unstructured.io data available for this document.{Style.RESET_ALL}")
+    else:
+        print_section("UNSTRUCTURED.IO EXTRACTED CONTENT", Fore.GREEN)
+        if not unstructured_pages:
+            print(f"{Fore.RED}No Unstructured.io elements on these pages (DOCX outputs have no page "
+                  f"numbers; view them without --page).{Style.RESET_ALL}")
+        for page in sorted(unstructured_pages):
+            print(f"{Fore.YELLOW}[Page {page}]{Style.RESET_ALL}")
+            print(f"{Fore.WHITE}" + "\n\n".join(unstructured_pages[page]) + f"{Style.RESET_ALL}")
+            print(f"{Fore.BLUE}{'-' * 50}{Style.RESET_ALL}")
+    
+    mistral_pages = read_mistral_pages(doc_name, first, last)
+    if mistral_pages is None:
+        print(f"{Fore.RED}No Mistral OCR data available for this document.{Style.RESET_ALL}")
+        return
+    
+    print_section("MISTRAL OCR EXTRACTED CONTENT", Fore.MAGENTA)
+    if not mistral_pages:
+        print(f"{Fore.RED}The Mistral OCR output has no pages in this range.{Style.RESET_ALL}")
+    for position, page in enumerate(mistral_pages):
+        # Show images as their file names rather than links or inline data
+        markdown = IMAGE_PLACEHOLDER_PATTERN.sub(lambda match: f"[image: {match.group(1)}]",
+                                                 page.get("markdown") or "")
+        print(f"{Fore.YELLOW}[Page {page.get('index', position) + 1}]{Style.RESET_ALL}")
+        print(f"{Fore.WHITE}{markdown}{Style.RESET_ALL}")
+        
+        images = page.get("images") or []
+        if images:
+            image_table = [[image.get("id"), image.get("image_file", "")] for image in images]
+            print(tabulate(image_table, headers=["Image", "File"], tablefmt="pretty"))
+        print(f"{Fore.BLUE}{'-' * 50}{Style.RESET_ALL}")
+
+def show_in_pager(render):
+    """Run a display function and show its output in the system pager ($PAGER, or less)"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        render()
+    # Let less pass the colors through
+    os.environ.setdefault("LESS", "-R")
+    pydoc.pager(output.getvalue())
+
 def interactive_mode():
     """Run the viewer in interactive mode"""
     print_header("DOCUMENT VIEWER", Fore.MAGENTA)
@@ -333,16 +547,44 @@ def main():
     parser = argparse.ArgumentParser(description="Document Viewer for Mistral OCR and Unstructured.io Pipelines")
     parser.add_argument("--doc", help="View a specific document")
     parser.add_argument("--list", action="store_true", help="List available documents")
+    parser.add_argument("--page", type=int, help="With --doc, only load and show this page")
+    parser.add_argument("--pages", type=parse_page_range, metavar="A-B",
+                        help="With --doc, only load and show these pages, e.g. 10-20")
+    parser.add_argument("--pager", action="store_true", help="Show the output in the system pager ($PAGER or less)")
+    parser.add_argument("--rescan", action="store_true",
+                        help="Reconcile the document catalog with the output directories before listing "
+                             "(for outputs added or removed outside the pipelines)")
+    parser.add_argument("--search", metavar="QUERY",
+                        help='Find the documents and pages mentioning a term, e.g. --search "force majeure"')
+    parser.add_argument("--pipeline", choices=["mistral", "unstructured"], help="Only search one pipeline's output")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of search results")
     
     args = parser.parse_args()
+    if args.page is not None and args.pages is not None:
+        parser.error("use either --page or --pages")
+    if args.page is not None:
+        if args.page < 1:
+            parser.error("--page must be 1 or more")
+        args.pages = (args.page, args.page)
+    if args.pages is not None and not args.doc:
+        parser.error("--page and --pages require --doc")
     
     if args.list:
-        documents = get_available_documents()
-        display_document_list(documents)
+        render = lambda: display_document_list(get_available_documents(rescan=args.rescan))
+    elif args.search:
+        render = lambda: search_documents(args.search, pipeline=args.pipeline, limit=args.limit)
+    elif args.doc and args.pages is not None:
+        render = lambda: view_document_pages(args.doc, *args.pages)
     elif args.doc:
-        view_document(args.doc)
+        render = lambda: view_document(args.doc)
     else:
         interactive_mode()
+        return
+    
+    if args.pager:
+        show_in_pager(render)
+    else:
+        render()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -45,13 +45,13 @@ def check_environment():
     else:
         print(f"Found {len(pdf_files)} PDF files and {len(docx_files)} DOCX/DOC files in the Data directory")
 
-def run_unstructured_pipeline():
+def run_unstructured_pipeline(watch=False):
     """Run the Unstructured.io pipeline"""
     print_header("RUNNING UNSTRUCTURED.IO PIPELINE")
     
     try:
         from unstructured_io_ingestion_pipeline import main as unstructured_main
-        unstructured_main()
+        unstructured_main(watch=watch)
     except ImportError:
         print("Error: Could not import the Unstructured.io pipeline")
         print("Make sure you have installed the required packages:")
@@ -59,13 +59,13 @@ def run_unstructured_pipeline():
     except Exception as e:
         print(f"Error running Unstructured.io pipeline: {str(e)}")
 
-def run_mistral_pipeline():
+def run_mistral_pipeline(workers=None, watch=False):
     """Run the Mistral OCR pipeline"""
     print_header("RUNNING MISTRAL OCR PIPELINE")
     
     try:
-        from mistrel_ocr_ingestion_pipeline import main as mistral_main
-        mistral_main()
+        from mistrel_ocr_ingestion_pipeline import main as mistral_main, DEFAULT_WORKERS
+        mistral_main(workers=workers or DEFAULT_WORKERS, watch=watch)
     except ImportError:
         print("Error: Could not import the Mistral OCR pipeline")
         print("Make sure you have installed the required packages:")
@@ -73,14 +73,37 @@ def run_mistral_pipeline():
     except Exception as e:
         print(f"Error running Mistral OCR pipeline: {str(e)}")
 
+def run_mistral_async_pipeline(max_in_flight=None):
+    """Run the asynchronous Mistral OCR pipeline"""
+    print_header("RUNNING MISTRAL OCR PIPELINE (ASYNC)")
+    
+    try:
+        from mistral_async_pipeline import main as mistral_async_main, DEFAULT_MAX_IN_FLIGHT
+        mistral_async_main(max_in_flight=max_in_flight or DEFAULT_MAX_IN_FLIGHT)
+    except ImportError:
+        print("Error: Could not import the asynchronous Mistral OCR pipeline")
+        print("Make sure you have installed the required packages:")
+        print("pip install -r requirements.txt")
+    except Exception as e:
+        print(f"Error running asynchronous Mistral OCR pipeline: {str(e)}")
+
 def main():
     """Main function to run the selected pipeline"""
     parser = argparse.ArgumentParser(description="Run document ingestion pipelines")
-    parser.add_argument("--pipeline", choices=["unstructured", "mistral", "both"], 
+    parser.add_argument("--pipeline", choices=["unstructured", "mistral", "mistral-async", "both"], 
                         default="both", help="Which pipeline to run")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of documents the Mistral OCR pipeline processes concurrently")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Number of documents the asynchronous Mistral OCR pipeline keeps in flight")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and process documents as they arrive in the Data directory")
     
     args = parser.parse_args()
     
+    if args.watch and args.pipeline not in ("unstructured", "mistral"):
+        parser.error("--watch requires --pipeline unstructured or --pipeline mistral")
+    
     print_header("DOCUMENT INGESTION PIPELINE RUNNER")
     
     # Check environment
@@ -88,10 +111,13 @@ def main():
     
     # Run selected pipeline(s)
     if args.pipeline == "unstructured" or args.pipeline == "both":
-        run_unstructured_pipeline()
+        run_unstructured_pipeline(watch=args.watch)
     
     if args.pipeline == "mistral" or args.pipeline == "both":
-        run_mistral_pipeline()
+        run_mistral_pipeline(workers=args.workers, watch=args.watch)
+    
+    if args.pipeline == "mistral-async":
+        run_mistral_async_pipeline(max_in_flight=args.max_in_flight)
     
     print_header("PIPELINE EXECUTION COMPLETED")
 
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# Full-text search index over the outputs of both pipelines
+# Indexes the Mistral OCR page markdown and the Unstructured.io element texts
+# in a SQLite FTS5 table, one passage per document page, so reviewers can find
+# which documents (and pages) mention a term without scanning the JSON files.
+# The index is updated incrementally: only output files that changed since the
+# last update are re-read.
+
+import re
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ocr_output import IMAGE_PLACEHOLDER_PATTERN, load_ocr_response
+from utils import iter_elements
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Location of the index database
+DEFAULT_INDEX_PATH = Path("search_index.sqlite3")
+
+# Output directories indexed by default, per pipeline
+MISTRAL_JSON_DIRS = [Path("mistral_output/json"), Path("mistral_scanned_pdf_output/json")]
+UNSTRUCTURED_JSON_DIRS = [Path("unstructured_json"), Path("unstructured_scanned_pdf_jsons")]
+
+# Number of tokens around the matches shown in result snippets
+SNIPPET_TOKENS = 16
+
+# Markers around matched terms in snippets
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    pipeline TEXT NOT NULL,
+    document TEXT NOT NULL,
+    size_bytes INTEGER,
+    modified_time_ns INTEGER,
+    passages INTEGER
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5(
+    text,
+    document UNINDEXED,
+    pipeline UNINDEXED,
+    page UNINDEXED,
+    source UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+"""
+
+def mistral_pages(json_path: Path) -> Iterator[Tuple[int, str]]:
+    """
+    Read the page texts of a Mistral OCR response.
+    
+    Image links and inline image payloads are dropped from the markdown.
+    
+    Args:
+        json_path: Path to ocr_response.json
+    
+    Yields:
+        (page number, markdown) for each non-empty page
+    """
+    data = load_ocr_response(json_path, rehydrate=False)
+    for position, page in enumerate(data.get("pages", [])):
+        markdown = IMAGE_PLACEHOLDER_PATTERN.sub(" ", page.get("markdown") or "")
+        if markdown.strip():
+            yield page.get("index", position) + 1, markdown
+
+def unstructured_pages(json_path: Path) -> Iterator[Tuple[Optional[int], str]]:
+    """
+    Read the element texts of an Unstructured.io JSON file, grouped by page.
+    
+    Args:
+        json_path: Path to the element file
+    
+    Yields:
+        (page number, text) for each page; elements without a page number
+        (e.g. from DOCX files) are grouped under None
+    """
+    pages: Dict[Optional[int], List[str]] = {}
+    for element in iter_elements(json_path):
+        text = element.get("text")
+        if text:
+            page = (element.get("metadata") or {}).get("page_number")
+            pages.setdefault(page, []).append(text)
+    for page, texts in pages.items():
+        yield page, "\n".join(texts)
+
+def discover_sources(mistral_dirs: List[Path] = MISTRAL_JSON_DIRS,
+                     unstructured_dirs: List[Path] = UNSTRUCTURED_JSON_DIRS) -> List[Tuple[Path, str, str]]:
+    """
+    Find the output files to index.
+    
+    Documents are named the way printer.py lists them: the Mistral output
+    directory name and the Unstructured.io element file stem.
+    
+    Returns:
+        List of (path, pipeline, document name)
+    """
+    sources = []
+    for json_dir in mistral_dirs:
+        if Path(json_dir).exists():
+            for json_path in sorted(Path(json_dir).glob("*/ocr_response.json")):
+                sources.append((json_path, "mistral", json_path.parent.name))
+    for json_dir in unstructured_dirs:
+        if Path(json_dir).exists():
+            for json_path in sorted(Path(json_dir).glob("*.json")):
+                sources.append((json_path, "unstructured", json_path.stem))
+    return sources
+
+class SearchIndex:
+    """
+    SQLite FTS5 index of document passages from both pipelines.
+    
+    Each passage is one page of one document from one pipeline. A sources
+    table records the size and mtime of every indexed output file, so
+    update() only re-reads files that were added or changed and drops the
+    passages of files that were removed.
+    """
+    
+    def __init__(self, db_path: Path = DEFAULT_INDEX_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(exist_ok=True, parents=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        try:
+            with self._lock:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.executescript(SCHEMA)
+                self._conn.commit()
+        except sqlite3.OperationalError as e:
+            self._conn.close()
+            if "fts5" in str(e):
+                raise RuntimeError("The search index requires SQLite with the FTS5 extension") from e
+            raise
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _remove(self, path: str):
+        self._conn.execute("DELETE FROM passages WHERE source = ?", (path,))
+        self._conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+    
+    def index_file(self, json_path: Path, pipeline: str, document: str) -> int:
+        """
+        (Re)index one output file, replacing its previous passages.
+        
+        Args:
+            json_path: Mistral ocr_response.json or Unstructured.io element file
+            pipeline: "mistral" or "unstructured"
+            document: Document name stored with the passages
+        
+        Returns:
+            Number of passages indexed
+        """
+        json_path = Path(json_path)
+        stats = json_path.stat()
+        read_pages = mistral_pages if pipeline == "mistral" else unstructured_pages
+        pages = list(read_pages(json_path))
+        
+        path = str(json_path)
+        with self._lock:
+            try:
+                self._remove(path)
+                self._conn.executemany(
+                    "INSERT INTO passages (text, document, pipeline, page, source) VALUES (?, ?, ?, ?, ?)",
+                    [(text, document, pipeline, page, path) for page, text in pages]
+                )
+                self._conn.execute(
+                    "INSERT INTO sources (path, pipeline, document, size_bytes, modified_time_ns, passages) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (path, pipeline, document, stats.st_size, stats.st_mtime_ns, len(pages))
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return len(pages)
+    
+    def update(self, sources: Optional[List[Tuple[Path, str, str]]] = None,
+               rebuild: bool = False) -> Dict[str, int]:
+        """
+        Bring the index up to date with the output directories.
+        
+        Args:
+            sources: Files to index, as returned by discover_sources() (the
+                default); indexed files missing from this list are removed
+            rebuild: Re-read every file, even unchanged ones
+        
+        Returns:
+            Dictionary with the number of files indexed, unchanged, removed and failed
+        """
+        if sources is None:
+            sources = discover_sources()
+        with self._lock:
+            known = {
+                row["path"]: (row["size_bytes"], row["modified_time_ns"])
+                for row in self._conn.execute("SELECT path, size_bytes, modified_time_ns FROM sources")
+            }
+        
+        counts = {"indexed": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        seen = set()
+        for json_path, pipeline, document in sources:
+            path = str(json_path)
+            seen.add(path)
+            try:
+                stats = Path(json_path).stat()
+                if not rebuild and known.get(path) == (stats.st_size, stats.st_mtime_ns):
+                    counts["unchanged"] += 1
+                    continue
+                passages = self.index_file(json_path, pipeline, document)
+                logger.info(f"Indexed {passages} pages of {document} ({pipeline})")
+                counts["indexed"] += 1
+            except Exception as e:
+                logger.error(f"Error indexing {json_path}: {str(e)}")
+                counts["failed"] += 1
+        
+        with self._lock:
+            for path in set(known) - seen:
+                self._remove(path)
+                counts["removed"] += 1
+            self._conn.commit()
+        return counts
+    
+    def search(self, query: str, pipeline: Optional[str] = None, document: Optional[str] = None,
+               limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Find the pages matching a query, best matches first.
+        
+        The query uses FTS5 syntax (terms, "exact phrases", AND/OR/NOT,
+        prefix*); a query that is not valid FTS5 is searched as plain words.
+        Matched terms in snippets are wrapped in HIGHLIGHT_START/HIGHLIGHT_END.
+        
+        Args:
+            query: Search query
+            pipeline: Only return passages from this pipeline
+            document: Only return passages from this document
+            limit: Maximum number of results
+        
+        Returns:
+            List of dictionaries with document, pipeline, page, snippet and score
+        """
+        sql = (
+            "SELECT document, pipeline, page, source, bm25(passages) AS score, "
+            f"snippet(passages, 0, ?, ?, ' ... ', {SNIPPET_TOKENS}) AS snippet "
+            "FROM passages WHERE passages MATCH ?"
+        )
+        filters = []
+        if pipeline:
+            sql += " AND pipeline = ?"
+            filters.append(pipeline)
+        if document:
+            sql += " AND document = ?"
+            filters.append(document)
+        sql += " ORDER BY score LIMIT ?"
+        
+        def run(match):
+            with self._lock:
+                rows = self._conn.execute(sql, [HIGHLIGHT_START, HIGHLIGHT_END, match, *filters, limit])
+                return [dict(row) for row in rows]
+        
+        try:
+            return run(query)
+        except sqlite3.OperationalError:
+            # Not valid FTS5 syntax (e.g. unbalanced quotes or punctuation): quote every word
+            words = re.findall(r"\w+", query)
+            if not words:
+                return []
+            return run(" ".join(f'"{word}"' for word in words))
+    
+    def summary(self) -> Dict[str, Any]:
+        """Get the number of indexed documents and pages per pipeline"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT pipeline, COUNT(*) AS files, SUM(passages) AS pages FROM sources GROUP BY pipeline"
+            ).fetchall()
+        return {row["pipeline"]: {"documents": row["files"], "pages": row["pages"] or 0} for row in rows}
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+def main():
+    """Update or query the search index"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Full-text search over the outputs of both pipelines")
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX_PATH,
+                        help=f"Index database (default: {DEFAULT_INDEX_PATH})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    update_parser = subparsers.add_parser("update", help="Index new and changed output files")
+    update_parser.add_argument("--rebuild", action="store_true", help="Re-index every output file")
+    search_parser = subparsers.add_parser("search", help="Search the index")
+    search_parser.add_argument("query", help='FTS5 query, e.g. termination or "force majeure"')
+    search_parser.add_argument("--pipeline", choices=["mistral", "unstructured"], help="Only search one pipeline")
+    search_parser.add_argument("--limit", type=int, default=20, help="Maximum number of results")
+    args = parser.parse_args()
+    
+    try:
+        index = SearchIndex(args.index)
+    except RuntimeError as e:
+        print(f"Error: {str(e)}")
+        raise SystemExit(1)
+    
+    with index:
+        if args.command == "update":
+            counts = index.update(rebuild=args.rebuild)
+            print(f"Indexed {counts['indexed']} files, {counts['unchanged']} unchanged, "
+                  f"{counts['removed']} removed, {counts['failed']} failed")
+            for pipeline, totals in index.summary().items():
+                print(f"  {pipeline}: {totals['documents']} documents, {totals['pages']} pages")
+        else:
+            for result in index.search(args.query, pipeline=args.pipeline, limit=args.limit):
+                page = result["page"] if result["page"] is not None else "-"
+                snippet = result["snippet"].replace(HIGHLIGHT_START, "[").replace(HIGHLIGHT_END, "]")
+                print(f"{result['document']} ({result['pipeline']}, page {page}): {' '.join(snippet.split())}")
+
+if __name__ == "__main__":
+    main()
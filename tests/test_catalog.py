@@ -0,0 +1,104 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+import printer
+from catalog import DocumentCatalog
+
+def write_unstructured(root, input_name, pages=1):
+    path = root / f"{input_name}.json"
+    path.parent.mkdir(exist_ok=True, parents=True)
+    path.write_text(json.dumps([{"text": "x", "metadata": {"page_number": pages}}]), encoding="utf-8")
+    return path
+
+def write_mistral(root, stem, input_name=None, pages=1):
+    directory = root / stem
+    directory.mkdir(exist_ok=True, parents=True)
+    path = directory / "ocr_response.json"
+    path.write_text(json.dumps({"pages": [{"index": i, "markdown": ""} for i in range(pages)]}), encoding="utf-8")
+    if input_name is not None:
+        (directory / "summary.json").write_text(json.dumps({"filename": input_name}), encoding="utf-8")
+    return path
+
+@pytest.fixture
+def roots(tmp_path):
+    return tmp_path / "unstructured_json", tmp_path / "mistral_output" / "json"
+
+@pytest.fixture
+def catalog(tmp_path):
+    with DocumentCatalog(tmp_path / "catalog.sqlite3") as catalog:
+        yield catalog
+
+def test_lookup_tells_same_stem_inputs_apart(catalog, roots):
+    unstructured_dir, _ = roots
+    doc_path = write_unstructured(unstructured_dir, "Fake Request.doc")
+    docx_path = write_unstructured(unstructured_dir, "Fake Request.docx")
+    later = os.stat(docx_path).st_mtime + 10
+    os.utime(doc_path, (later, later))
+    catalog.scan("unstructured", unstructured_dir)
+    
+    assert catalog.lookup(unstructured_dir, "Fake Request.docx")["path"] == str(docx_path)
+    assert catalog.lookup(unstructured_dir, "Fake Request.doc")["path"] == str(doc_path)
+    assert catalog.lookup(unstructured_dir, "Fake Request.pdf") is None
+    # A bare stem opens the most recently written output
+    assert catalog.lookup(unstructured_dir, "Fake Request")["path"] == str(doc_path)
+
+def test_mistral_outputs_are_named_after_their_input(catalog, roots):
+    _, mistral_dir = roots
+    path = write_mistral(mistral_dir, "Fake Request", "Fake Request.docx", pages=3)
+    catalog.scan("mistral", mistral_dir)
+    
+    entry = catalog.lookup(mistral_dir, "Fake Request.docx")
+    assert (entry["name"], entry["stem"], entry["pages"]) == ("Fake Request.docx", "Fake Request", 3)
+    assert catalog.lookup(mistral_dir, "Fake Request.doc") is None
+    
+    # Processing the other input of the pair renames the output's entry
+    (path.parent / "summary.json").write_text(json.dumps({"filename": "Fake Request.doc"}), encoding="utf-8")
+    catalog.record("mistral", mistral_dir, path)
+    assert catalog.lookup(mistral_dir, "Fake Request.docx") is None
+    assert catalog.lookup(mistral_dir, "Fake Request.doc")["path"] == str(path)
+
+def test_mistral_output_without_summary_matches_by_stem(catalog, roots):
+    _, mistral_dir = roots
+    path = write_mistral(mistral_dir, "report")
+    catalog.scan("mistral", mistral_dir)
+    assert catalog.lookup(mistral_dir, "report.pdf")["path"] == str(path)
+    assert catalog.lookup(mistral_dir, "report")["path"] == str(path)
+
+def test_lookup_drops_missing_outputs(catalog, roots):
+    unstructured_dir, _ = roots
+    path = write_unstructured(unstructured_dir, "report.pdf")
+    catalog.scan("unstructured", unstructured_dir)
+    path.unlink()
+    assert catalog.lookup(unstructured_dir, "report.pdf") is None
+    assert catalog.documents(unstructured_dir) == []
+
+def test_old_catalog_is_rebuilt(tmp_path, roots):
+    db_path = tmp_path / "catalog.sqlite3"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE roots (root TEXT PRIMARY KEY, pipeline TEXT NOT NULL, scanned_at REAL)")
+        conn.execute("INSERT INTO roots VALUES ('old', 'mistral', 0)")
+    with DocumentCatalog(db_path) as catalog:
+        unstructured_dir, _ = roots
+        write_unstructured(unstructured_dir, "report.pdf")
+        catalog.ensure_scanned("unstructured", unstructured_dir)
+        assert [entry["name"] for entry in catalog.documents(unstructured_dir)] == ["report.pdf"]
+
+def test_viewer_lists_documents_by_input_name(tmp_path, roots, monkeypatch):
+    unstructured_dir, mistral_dir = roots
+    monkeypatch.setattr(printer, "UNSTRUCTURED_DIR", unstructured_dir)
+    monkeypatch.setattr(printer, "MISTRAL_JSON_DIR", mistral_dir)
+    monkeypatch.setattr(printer, "CATALOG_PATH", tmp_path / "catalog.sqlite3")
+    write_unstructured(unstructured_dir, "Fake Request.doc")
+    write_unstructured(unstructured_dir, "Fake Request.docx")
+    write_unstructured(unstructured_dir, "report.pdf", pages=2)
+    write_mistral(mistral_dir, "Fake Request", "Fake Request.docx", pages=4)
+    write_mistral(mistral_dir, "report", pages=5)
+    
+    documents = printer.get_available_documents()
+    assert documents["unstructured"] == ["Fake Request.doc", "Fake Request.docx", "report.pdf"]
+    assert documents["mistral"] == ["Fake Request.docx", "report.pdf"]
+    assert documents["both"] == ["Fake Request.docx", "report.pdf"]
+    assert documents["pages"] == {"Fake Request.doc": 1, "Fake Request.docx": 4, "report.pdf": 5}
@@ -0,0 +1,53 @@
+import json
+
+from compare_pipelines import find_document_pairs
+
+def write_json(path, data):
+    path.parent.mkdir(exist_ok=True, parents=True)
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+def make_outputs(tmp_path, unstructured_inputs, mistral_outputs):
+    unstructured_dir = tmp_path / "unstructured_json"
+    mistral_dir = tmp_path / "mistral_output" / "json"
+    unstructured_dir.mkdir(parents=True)
+    for input_name in unstructured_inputs:
+        write_json(unstructured_dir / f"{input_name}.json", [])
+    for stem, summary in mistral_outputs.items():
+        write_json(mistral_dir / stem / "ocr_response.json", {"pages": []})
+        if summary is not None:
+            write_json(mistral_dir / stem / "summary.json", summary)
+    return unstructured_dir, mistral_dir
+
+def test_pairs_by_input_name(tmp_path):
+    unstructured_dir, mistral_dir = make_outputs(
+        tmp_path,
+        ["Fake Request.doc", "Fake Request.docx", "report.pdf"],
+        {
+            "Fake Request": {"filename": "Fake Request.docx", "processing_time": "2.5 seconds"},
+            "report": {"filename": "report.pdf", "processing_time": 1.0},
+        },
+    )
+    write_json(unstructured_dir / "metrics" / "metrics.json", {"documents": [
+        {"document": "Fake Request.doc", "outcome": "success", "duration_seconds": 3.0},
+        {"document": "Fake Request.docx", "outcome": "success", "duration_seconds": 4.0},
+    ]})
+    
+    pairs, unmatched = find_document_pairs(unstructured_dir, mistral_dir)
+    assert [(pair["document"], pair["mistral_seconds"], pair["unstructured_seconds"]) for pair in pairs] == [
+        ("Fake Request.docx", 2.5, 4.0),
+        ("report.pdf", 1.0, None),
+    ]
+    assert pairs[0]["unstructured_path"].endswith("Fake Request.docx.json")
+    assert unmatched == {"unstructured_only": ["Fake Request.doc"], "mistral_only": []}
+
+def test_output_without_summary_is_matched_by_unique_stem(tmp_path):
+    unstructured_dir, mistral_dir = make_outputs(tmp_path, ["report.pdf"], {"report": None})
+    pairs, unmatched = find_document_pairs(unstructured_dir, mistral_dir)
+    assert [pair["document"] for pair in pairs] == ["report.pdf"]
+    assert unmatched == {"unstructured_only": [], "mistral_only": []}
+
+def test_colliding_stems_without_summary_are_unmatched(tmp_path):
+    unstructured_dir, mistral_dir = make_outputs(tmp_path, ["letter.doc", "letter.docx"], {"letter": None})
+    pairs, unmatched = find_document_pairs(unstructured_dir, mistral_dir)
+    assert pairs == []
+    assert unmatched == {"unstructured_only": ["letter.doc", "letter.docx"], "mistral_only": ["letter"]}
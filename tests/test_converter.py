@@ -0,0 +1,97 @@
+import os
+import sys
+
+import pytest
+
+from converter import _hash_path, _install, _source_state, convert_documents, is_up_to_date, pdf_path_for
+from utils import compute_file_hash
+
+FAKE_SOFFICE = """#!{python}
+import sys
+from pathlib import Path
+
+args = sys.argv[1:]
+out_dir = Path(args[args.index("--outdir") + 1])
+for arg in args:
+    if not arg.startswith("-") and arg not in ("pdf", str(out_dir)):
+        source = Path(arg)
+        (out_dir / (source.stem + ".pdf")).write_bytes(b"%PDF " + source.read_bytes())
+"""
+
+def set_mtime(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "letter.docx"
+    path.write_bytes(b"first version")
+    return path
+
+def install_pdf(tmp_path, source):
+    pdf_path = pdf_path_for(source, tmp_path / "converted")
+    converted = tmp_path / "converted.pdf"
+    converted.write_bytes(b"%PDF " + source.read_bytes())
+    _install(converted, pdf_path, _source_state(source))
+    return pdf_path
+
+def test_missing_pdf_is_not_up_to_date(tmp_path, source):
+    assert not is_up_to_date(source, pdf_path_for(source, tmp_path))
+
+def test_installed_pdf_is_up_to_date(tmp_path, source):
+    pdf_path = install_pdf(tmp_path, source)
+    stats = source.stat()
+    assert _hash_path(pdf_path).read_text().split() == [
+        compute_file_hash(str(source)), str(stats.st_size), str(stats.st_mtime_ns)
+    ]
+    assert is_up_to_date(source, pdf_path)
+
+def test_replaced_source_with_an_older_mtime_is_detected(tmp_path, source):
+    pdf_path = install_pdf(tmp_path, source)
+    set_mtime(pdf_path, source.stat().st_mtime + 100)
+    
+    source.write_bytes(b"second version")
+    set_mtime(source, source.stat().st_mtime - 100)
+    assert pdf_path.stat().st_mtime > source.stat().st_mtime
+    assert not is_up_to_date(source, pdf_path)
+
+def test_touched_source_is_rehashed_once(tmp_path, source, monkeypatch):
+    pdf_path = install_pdf(tmp_path, source)
+    set_mtime(source, source.stat().st_mtime + 100)
+    assert is_up_to_date(source, pdf_path)
+    assert _hash_path(pdf_path).read_text().split()[2] == str(source.stat().st_mtime_ns)
+    
+    # The refreshed size and mtime now answer without reading the source
+    monkeypatch.setattr("converter.compute_file_hash", pytest.fail)
+    assert is_up_to_date(source, pdf_path)
+
+def test_hash_only_record_is_still_checked(tmp_path, source):
+    pdf_path = install_pdf(tmp_path, source)
+    _hash_path(pdf_path).write_text(compute_file_hash(str(source)))
+    assert is_up_to_date(source, pdf_path)
+    assert len(_hash_path(pdf_path).read_text().split()) == 3
+    
+    _hash_path(pdf_path).write_text("0" * 64)
+    assert not is_up_to_date(source, pdf_path)
+
+def test_pdf_without_a_record_falls_back_to_mtime(tmp_path, source):
+    pdf_path = pdf_path_for(source, tmp_path)
+    pdf_path.write_bytes(b"%PDF")
+    set_mtime(pdf_path, source.stat().st_mtime + 10)
+    assert is_up_to_date(source, pdf_path)
+    set_mtime(pdf_path, source.stat().st_mtime - 10)
+    assert not is_up_to_date(source, pdf_path)
+
+def test_convert_documents_reconverts_replaced_sources(tmp_path, source, monkeypatch):
+    soffice = tmp_path / "soffice"
+    soffice.write_text(FAKE_SOFFICE.format(python=sys.executable))
+    soffice.chmod(0o755)
+    monkeypatch.setenv("SOFFICE_PATH", str(soffice))
+    output_dir = tmp_path / "converted"
+    
+    pdf_path = convert_documents([source], output_dir, backend="libreoffice", workers=1)[source]
+    assert pdf_path.read_bytes() == b"%PDF first version"
+    
+    source.write_bytes(b"second version")
+    set_mtime(source, pdf_path.stat().st_mtime - 100)
+    pdf_path = convert_documents([source], output_dir, backend="libreoffice", workers=1)[source]
+    assert pdf_path.read_bytes() == b"%PDF second version"
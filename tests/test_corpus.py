@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from corpus import CorpusReader, CorpusWriter, build_index, index_path_for
+
+def write_corpus(path, documents, append=False):
+    with CorpusWriter(path, append=append) as writer:
+        for name, text in documents:
+            writer.add(name, text, pages=1)
+    return path
+
+@pytest.fixture
+def corpus(tmp_path):
+    return write_corpus(tmp_path / "texts.jsonl", [("a.pdf", "alpha"), ("b.docx", "bravo ünïcode")])
+
+def read_index(corpus_path):
+    return json.loads(index_path_for(corpus_path).read_text(encoding="utf-8"))
+
+def test_writer_writes_a_matching_index(corpus):
+    index = read_index(corpus)
+    assert index["corpus_size"] == corpus.stat().st_size
+    assert {name: tuple(span) for name, span in index["documents"].items()} == build_index(corpus)
+    
+    reader = CorpusReader(corpus)
+    assert reader.names() == ["a.pdf", "b.docx"]
+    assert reader.get("b.docx") == {"name": "b.docx", "text": "bravo ünïcode", "pages": 1}
+    assert reader.get("missing.pdf") is None
+
+def test_append_extends_the_index(corpus):
+    write_corpus(corpus, [("c.pdf", "charlie"), ("a.pdf", "alpha, revised")], append=True)
+    reader = CorpusReader(corpus)
+    assert reader.names() == ["b.docx", "c.pdf", "a.pdf"]
+    assert reader.get("a.pdf")["text"] == "alpha, revised"
+    assert read_index(corpus)["corpus_size"] == corpus.stat().st_size
+
+def test_index_is_rebuilt_after_an_external_append(corpus):
+    with open(corpus, "ab") as f:
+        f.write(json.dumps({"name": "d.pdf", "text": "delta"}).encode("utf-8") + b"\n")
+    
+    reader = CorpusReader(corpus)
+    assert reader.get("d.pdf")["text"] == "delta"
+    assert read_index(corpus)["corpus_size"] == corpus.stat().st_size
+
+def test_index_is_rebuilt_after_a_same_size_rewrite(corpus):
+    stale_index = read_index(corpus)
+    corpus.write_text(corpus.read_text(encoding="utf-8").replace("alpha", "ALPHA"), encoding="utf-8")
+    later = stale_index["corpus_mtime"] + 5
+    os.utime(corpus, (later, later))
+    assert corpus.stat().st_size == stale_index["corpus_size"]
+    
+    assert CorpusReader(corpus).get("a.pdf")["text"] == "ALPHA"
+    assert read_index(corpus)["corpus_mtime"] == later
+
+@pytest.mark.parametrize("contents", ["", "not json", "{\"documents\": {}}"])
+def test_unusable_index_is_rebuilt(corpus, contents):
+    index_path_for(corpus).write_text(contents, encoding="utf-8")
+    reader = CorpusReader(corpus)
+    assert reader.names() == ["a.pdf", "b.docx"]
+    assert read_index(corpus)["corpus_size"] == corpus.stat().st_size
+
+def test_missing_index_is_built(corpus):
+    index_path_for(corpus).unlink()
+    assert len(CorpusReader(corpus)) == 2
+    assert index_path_for(corpus).exists()
+
+def test_failed_new_corpus_leaves_the_old_one(corpus):
+    with pytest.raises(RuntimeError):
+        with CorpusWriter(corpus) as writer:
+            writer.add("z.pdf", "zulu")
+            raise RuntimeError("extraction failed")
+    
+    reader = CorpusReader(corpus)
+    assert reader.names() == ["a.pdf", "b.docx"]
+    assert not list(corpus.parent.glob("*.tmp"))
+
+def test_failed_append_keeps_the_records_and_index(corpus):
+    with pytest.raises(RuntimeError):
+        with CorpusWriter(corpus, append=True) as writer:
+            writer.add("c.pdf", "charlie")
+            raise RuntimeError("extraction failed")
+    
+    assert read_index(corpus)["corpus_size"] == corpus.stat().st_size
+    assert CorpusReader(corpus).get("c.pdf")["text"] == "charlie"
@@ -0,0 +1,173 @@
+import os
+import sqlite3
+import zipfile
+
+import pytest
+
+import dedup
+from dedup import DuplicateIndex
+
+WORDS = ("the plaintiff requests that the defendant produce every document relating to the contract "
+         "signed in march including all correspondence invoices receipts memoranda and notes of meetings "
+         "between the parties their agents employees officers directors attorneys and accountants together "
+         "with any drafts amendments schedules exhibits and attachments thereto whether stored on paper or "
+         "in electronic form on any computer server phone or backup medium").split()
+
+OTHER_WORDS = ("weather station readings for the northern valley show rainfall well above the seasonal average "
+               "with flooding reported along the river banks near three villages while temperatures stayed mild "
+               "and winds remained calm for most of the month according to the regional office which publishes "
+               "daily tables of humidity pressure sunshine hours and snow depth for every monitored site").split()
+
+def write_docx(path, words):
+    paragraphs = "".join(f"<w:p><w:r><w:t>{word}</w:t></w:r></w:p>" for word in words)
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f"<w:document><w:body>{paragraphs}</w:body></w:document>")
+    return path
+
+def write_output(path, text):
+    path.parent.mkdir(exist_ok=True, parents=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+@pytest.fixture
+def inputs(tmp_path):
+    directory = tmp_path / "Data"
+    directory.mkdir()
+    return directory
+
+def test_exact_duplicates(tmp_path, inputs):
+    original = inputs / "report.pdf"
+    original.write_bytes(b"%PDF-1.4 same bytes")
+    copy = inputs / "report (copy).pdf"
+    copy.write_bytes(b"%PDF-1.4 same bytes")
+    other = inputs / "other.pdf"
+    other.write_bytes(b"%PDF-1.4 other bytes")
+    
+    with DuplicateIndex(tmp_path / "dedup.sqlite3", mode="exact") as index:
+        assert index.find(copy) is None
+        output = write_output(tmp_path / "out" / "report.pdf.json", "[]")
+        index.add(original, output)
+        
+        match = index.find(copy)
+        assert (match["path"], match["output"], match["kind"]) == (original.resolve(), output.resolve(), "exact")
+        assert index.find(original) is None
+        assert index.find(other) is None
+
+def test_exact_mode_ignores_similar_text(tmp_path, inputs):
+    original = write_docx(inputs / "request.docx", WORDS)
+    edited = write_docx(inputs / "request v2.docx", WORDS[:-1] + ["tape"])
+    with DuplicateIndex(tmp_path / "dedup.sqlite3", mode="exact") as index:
+        index.add(original, write_output(tmp_path / "out" / "request.docx.json", "[]"))
+        assert index.find(edited) is None
+
+def test_near_duplicates(tmp_path, inputs):
+    original = write_docx(inputs / "request.docx", WORDS)
+    edited = write_docx(inputs / "request v2.docx", WORDS[:-1] + ["tape"])
+    unrelated = write_docx(inputs / "weather.docx", OTHER_WORDS)
+    
+    with DuplicateIndex(tmp_path / "dedup.sqlite3", mode="near") as index:
+        output = write_output(tmp_path / "out" / "request.docx.json", "[]")
+        index.add(original, output)
+        match = index.find(edited)
+        assert match["path"] == original.resolve() and match["kind"] == "near"
+        assert index.threshold <= match["similarity"] < 1.0
+        assert index.find(unrelated) is None
+
+def test_short_documents_are_only_matched_exactly(tmp_path, inputs):
+    original = write_docx(inputs / "note.docx", WORDS[:10])
+    edited = write_docx(inputs / "note v2.docx", WORDS[:9] + ["tape"])
+    with DuplicateIndex(tmp_path / "dedup.sqlite3", mode="near") as index:
+        index.add(original, write_output(tmp_path / "out" / "note.docx.json", "[]"))
+        assert index.fingerprint(edited)["signature"] is None
+        assert index.find(edited) is None
+
+def test_overwritten_output_is_not_reused(tmp_path, inputs):
+    doc = inputs / "Fake Request.doc"
+    doc.write_bytes(b"doc bytes")
+    docx = inputs / "Fake Request.docx"
+    docx.write_bytes(b"docx bytes")
+    copy_of_doc = inputs / "Fake Request (copy).doc"
+    copy_of_doc.write_bytes(b"doc bytes")
+    
+    with DuplicateIndex(tmp_path / "dedup.sqlite3", mode="exact") as index:
+        # Both inputs write to the same stem directory; the .docx overwrites the .doc's response
+        shared_output = write_output(tmp_path / "json" / "Fake Request" / "ocr_response.json", "doc response")
+        index.add(doc, shared_output)
+        write_output(shared_output, "docx response, longer")
+        stats = os.stat(shared_output)
+        os.utime(shared_output, ns=(stats.st_atime_ns, stats.st_mtime_ns + 1_000_000))
+        index.add(docx, shared_output)
+        
+        assert index.find(copy_of_doc) is None
+        
+        copy_of_docx = inputs / "Fake Request (copy).docx"
+        copy_of_docx.write_bytes(b"docx bytes")
+        assert index.find(copy_of_docx)["path"] == docx.resolve()
+
+def test_missing_output_is_not_reused(tmp_path, inputs):
+    original = inputs / "report.pdf"
+    original.write_bytes(b"same")
+    copy = inputs / "copy.pdf"
+    copy.write_bytes(b"same")
+    with DuplicateIndex(tmp_path / "dedup.sqlite3", mode="exact") as index:
+        output = write_output(tmp_path / "out" / "report.pdf.json", "[]")
+        index.add(original, output)
+        output.unlink()
+        assert index.find(copy) is None
+
+def test_group_within_a_batch(tmp_path, inputs):
+    original = write_docx(inputs / "request.docx", WORDS)
+    edited = write_docx(inputs / "request v2.docx", WORDS[:-1] + ["tape"])
+    copy = inputs / "request copy.docx"
+    copy.write_bytes(original.read_bytes())
+    unrelated = write_docx(inputs / "weather.docx", OTHER_WORDS)
+    
+    with DuplicateIndex(":memory:", mode="near") as index:
+        duplicates = index.group([original, edited, copy, unrelated], workers=1)
+    # Equal word counts: the first name ("request copy.docx") is canonical
+    assert set(duplicates) == {original, edited}
+    assert (duplicates[original]["path"], duplicates[original]["kind"]) == (copy, "exact")
+    assert (duplicates[edited]["path"], duplicates[edited]["kind"]) == (copy, "near")
+    assert all(match["output"] is None for match in duplicates.values())
+
+def test_off_mode_finds_nothing(tmp_path, inputs):
+    original = inputs / "report.pdf"
+    original.write_bytes(b"same")
+    with DuplicateIndex(":memory:", mode="off") as index:
+        assert index.find(original) is None
+        assert index.group([original, original]) == {}
+
+def test_fingerprint_cache_is_bounded(tmp_path, inputs, monkeypatch):
+    monkeypatch.setattr(dedup, "FINGERPRINT_CACHE_SIZE", 3)
+    files = []
+    for i in range(5):
+        path = inputs / f"{i}.pdf"
+        path.write_bytes(f"file {i}".encode())
+        files.append(path)
+    
+    with DuplicateIndex(":memory:", mode="exact") as index:
+        for path in files:
+            index.fingerprint(path)
+        index.fingerprint(files[2])
+        index.fingerprint(files[0])
+        cached = [key[0] for key in index._fingerprints]
+    assert cached == [str(files[4].resolve()), str(files[2].resolve()), str(files[0].resolve())]
+
+def test_old_index_is_upgraded(tmp_path, inputs):
+    db_path = tmp_path / "dedup.sqlite3"
+    original = inputs / "report.pdf"
+    original.write_bytes(b"same")
+    copy = inputs / "copy.pdf"
+    copy.write_bytes(b"same")
+    output = write_output(tmp_path / "out" / "report.pdf.json", "[]")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE documents (path TEXT PRIMARY KEY, content_hash TEXT NOT NULL, words INTEGER, "
+                     "signature BLOB, output TEXT NOT NULL, updated_at REAL)")
+        conn.execute("INSERT INTO documents VALUES (?, ?, NULL, NULL, ?, 0)",
+                     (str(original.resolve()), dedup.compute_file_hash(str(original)), str(output.resolve())))
+    
+    with DuplicateIndex(db_path, mode="exact") as index:
+        # Unstamped rows cannot be verified and are not reused until re-added
+        assert index.find(copy) is None
+        index.add(original, output)
+        assert index.find(copy)["path"] == original.resolve()
@@ -0,0 +1,58 @@
+import json
+
+from metrics import MetricsRegistry, MetricsWriter
+
+def finished_document(registry, name, success=True, pages=1):
+    metrics = registry.document(name)
+    metrics.record_stage("ocr", 0.5)
+    metrics.add("pages", pages)
+    metrics.finish(success)
+    return metrics
+
+def test_write_does_not_finish_the_run(tmp_path):
+    registry = MetricsRegistry("test")
+    finished_document(registry, "a.pdf")
+    registry.write(json_path=tmp_path / "metrics.json")
+    assert registry.run.duration is None
+    
+    finished_document(registry, "b.pdf")
+    registry.finish()
+    registry.write(json_path=tmp_path / "metrics.json")
+    assert registry.run.outcome == "success"
+    data = json.loads((tmp_path / "metrics.json").read_text())
+    assert data["totals"]["outcomes"] == {"success": 2}
+
+def test_old_documents_are_rolled_up(tmp_path):
+    registry = MetricsRegistry("test", max_documents=3)
+    for index in range(10):
+        finished_document(registry, f"{index}.pdf", success=index % 2 == 0, pages=2)
+    
+    assert [metrics.document for metrics in registry.documents] == ["7.pdf", "8.pdf", "9.pdf"]
+    totals = registry.totals()
+    assert totals["outcomes"] == {"success": 5, "failed": 5}
+    assert totals["counters"] == {"pages": 20}
+    assert totals["stages"]["ocr"] == {"seconds": 5.0, "calls": 10}
+    
+    data = registry.to_dict()
+    assert data["rolled_up_documents"] == 7
+    assert len(data["documents"]) == 3
+    assert 'ingest_document_seconds_count{pipeline="test"} 10' in registry.prometheus_text()
+
+def test_documents_in_progress_are_not_rolled_up():
+    registry = MetricsRegistry("test", max_documents=1)
+    in_progress = registry.document("slow.pdf")
+    finished_document(registry, "fast.pdf")
+    finished_document(registry, "next.pdf")
+    assert in_progress in registry.documents
+    assert registry.to_dict()["rolled_up_documents"] == 1
+
+def test_writer_writes_on_stop(tmp_path):
+    registry = MetricsRegistry("test")
+    json_path = tmp_path / "metrics.json"
+    writer = MetricsWriter(registry, interval=3600, json_path=json_path).start()
+    finished_document(registry, "a.pdf")
+    registry.finish()
+    writer.stop()
+    data = json.loads(json_path.read_text())
+    assert data["run"]["outcome"] == "success"
+    assert data["totals"]["outcomes"] == {"success": 1}
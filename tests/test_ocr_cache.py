@@ -0,0 +1,54 @@
+
+from ocr_cache import OCRCache
+
+RESPONSE = {"pages": [{"index": 0, "markdown": "# Page", "images": []}], "model": "mistral-ocr-latest"}
+
+def test_make_key_depends_on_hash_and_settings():
+    key = OCRCache.make_key("abc", "mistral-ocr-latest", True)
+    assert key == OCRCache.make_key("abc", "mistral-ocr-latest", True)
+    assert len(key) == 64
+    assert key != OCRCache.make_key("abd", "mistral-ocr-latest", True)
+    assert key != OCRCache.make_key("abc", "other-model", True)
+    assert key != OCRCache.make_key("abc", "mistral-ocr-latest", False)
+
+def test_put_and_get_round_trip(tmp_path):
+    cache = OCRCache(tmp_path / "cache")
+    key = OCRCache.make_key("abc", "mistral-ocr-latest", True)
+    assert cache.get(key) is None
+    
+    entry_path = cache.put(key, RESPONSE)
+    assert entry_path == tmp_path / "cache" / key[:2] / f"{key}.json"
+    assert cache.get(key) == RESPONSE
+    assert list(entry_path.parent.glob("*.tmp")) == []
+
+def test_failed_put_leaves_no_entry_or_temporary_file(tmp_path):
+    cache = OCRCache(tmp_path / "cache")
+    key = OCRCache.make_key("abc", "mistral-ocr-latest", True)
+    assert cache.put(key, {"pages": [object()]}) is None
+    assert cache.get(key) is None
+    assert list((tmp_path / "cache" / key[:2]).iterdir()) == []
+
+def test_writer_entry_is_visible_only_after_close(tmp_path):
+    cache = OCRCache(tmp_path / "cache")
+    key = OCRCache.make_key("abc", "mistral-ocr-latest", True)
+    writer = cache.writer(key)
+    writer.write_page(RESPONSE["pages"][0])
+    assert cache.get(key) is None
+    
+    writer.close({"model": RESPONSE["model"]})
+    assert cache.get(key) == RESPONSE
+
+def test_aborted_writer_leaves_no_entry(tmp_path):
+    cache = OCRCache(tmp_path / "cache")
+    key = OCRCache.make_key("abc", "mistral-ocr-latest", True)
+    writer = cache.writer(key)
+    writer.write_page(RESPONSE["pages"][0])
+    writer.abort()
+    assert cache.get(key) is None
+    assert list((tmp_path / "cache" / key[:2]).iterdir()) == []
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = OCRCache(tmp_path / "cache")
+    key = OCRCache.make_key("abc", "mistral-ocr-latest", True)
+    cache.entry_path(key).write_text('{"pages": [', encoding="utf-8")
+    assert cache.get(key) is None
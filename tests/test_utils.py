@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from utils import iter_json_array
+
+ITEMS = [1, 22, 333, -4.5e10, 0.125, -7, 1e-3, True, None, "a, ]b", {"text": "x" * 50, "n": [1, 2]}, [], 12345678]
+
+def write_json(path, data, **kwargs):
+    path.write_text(json.dumps(data, **kwargs), encoding="utf-8")
+    return path
+
+def test_number_split_across_chunks(tmp_path):
+    path = tmp_path / "numbers.json"
+    path.write_text("[1, 22, 333, -4.5e10]", encoding="utf-8")
+    assert list(iter_json_array(path, chunk_size=2)) == [1, 22, 333, -4.5e10]
+
+@pytest.mark.parametrize("chunk_size", range(1, 40))
+@pytest.mark.parametrize("indent", [None, 2])
+def test_every_chunk_boundary(tmp_path, chunk_size, indent):
+    path = write_json(tmp_path / "items.json", ITEMS, indent=indent)
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == ITEMS
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64])
+def test_member_array(tmp_path, chunk_size):
+    path = write_json(tmp_path / "response.json", {"pages": ITEMS, "model": "ocr"})
+    assert list(iter_json_array(path, chunk_size=chunk_size, key="pages")) == ITEMS
+
+def test_top_level_number_at_end_of_file(tmp_path):
+    path = tmp_path / "numbers.json"
+    path.write_text("[10,\n200\n]", encoding="utf-8")
+    assert list(iter_json_array(path, chunk_size=4)) == [10, 200]
+
+def test_empty_array(tmp_path):
+    path = write_json(tmp_path / "empty.json", [])
+    assert list(iter_json_array(path, chunk_size=1)) == []
+
+def test_not_an_array(tmp_path):
+    path = write_json(tmp_path / "object.json", {"a": 1})
+    with pytest.raises(ValueError):
+        list(iter_json_array(path))
+
+def test_unterminated_array(tmp_path):
+    path = tmp_path / "truncated.json"
+    path.write_text("[1, 2, ", encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(path, chunk_size=2))
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+import watcher
+from watcher import DirectoryWatcher, watch_in_batches
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(watcher.time, "monotonic", fake)
+    return fake
+
+def make_watcher(directory):
+    return DirectoryWatcher(directory, settle_seconds=2.0, poll_interval=0.1, use_inotify=False)
+
+def test_file_is_reported_once_it_stops_changing(tmp_path, clock):
+    directory_watcher = make_watcher(tmp_path)
+    document = tmp_path / "report.pdf"
+    document.write_bytes(b"%PDF-1")
+    directory_watcher._scan()
+    assert directory_watcher._settled() == []
+    
+    # Still being written: the settle timer restarts
+    clock.now += 1.5
+    document.write_bytes(b"%PDF-1.4 more bytes")
+    directory_watcher._scan()
+    clock.now += 1.5
+    assert directory_watcher._settled() == []
+    
+    clock.now += 1.0
+    assert directory_watcher._settled() == [document]
+    
+    # Unchanged files are not reported again
+    directory_watcher._scan()
+    clock.now += 5.0
+    assert directory_watcher._settled() == []
+
+def test_patterns_filter_files(tmp_path, clock):
+    directory_watcher = make_watcher(tmp_path)
+    (tmp_path / "notes.txt").write_text("ignored")
+    (tmp_path / "Letter.DOCX").write_bytes(b"PK")
+    directory_watcher._scan()
+    clock.now += 3.0
+    assert directory_watcher._settled() == [tmp_path / "Letter.DOCX"]
+
+def test_changed_file_is_reported_again(tmp_path, clock):
+    directory_watcher = make_watcher(tmp_path)
+    document = tmp_path / "report.pdf"
+    document.write_bytes(b"%PDF-1")
+    directory_watcher._scan()
+    clock.now += 3.0
+    assert directory_watcher._settled() == [document]
+    
+    document.write_bytes(b"%PDF-1 revised")
+    directory_watcher._scan()
+    clock.now += 3.0
+    assert directory_watcher._settled() == [document]
+
+def test_deleted_files_are_forgotten(tmp_path, clock):
+    directory_watcher = make_watcher(tmp_path)
+    document = tmp_path / "report.pdf"
+    document.write_bytes(b"%PDF-1")
+    directory_watcher._scan()
+    clock.now += 3.0
+    assert directory_watcher._settled() == [document]
+    
+    document.unlink()
+    directory_watcher._scan()
+    assert directory_watcher._reported == {}
+    
+    # The same name arriving again is a new document
+    document.write_bytes(b"%PDF-1")
+    directory_watcher._scan()
+    clock.now += 3.0
+    assert directory_watcher._settled() == [document]
+
+def test_file_removed_before_settling_is_dropped(tmp_path, clock):
+    directory_watcher = make_watcher(tmp_path)
+    document = tmp_path / "report.pdf"
+    document.write_bytes(b"%PDF-1")
+    directory_watcher._scan()
+    document.unlink()
+    clock.now += 3.0
+    assert directory_watcher._settled() == []
+    assert directory_watcher._candidates == {}
+
+@pytest.mark.parametrize("use_inotify", [False, True])
+def test_iteration_reports_new_files(tmp_path, use_inotify):
+    directory_watcher = DirectoryWatcher(tmp_path, settle_seconds=0.2, poll_interval=0.05, use_inotify=use_inotify)
+    (tmp_path / "present.pdf").write_bytes(b"%PDF-1")
+    reported = []
+    
+    def collect():
+        for file_path in directory_watcher:
+            reported.append(file_path.name)
+    
+    thread = threading.Thread(target=collect, daemon=True)
+    thread.start()
+    time.sleep(0.1)
+    (tmp_path / "arrived.docx").write_bytes(b"PK")
+    deadline = time.monotonic() + 5
+    while len(reported) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    directory_watcher.stop()
+    thread.join(timeout=5)
+    assert sorted(reported) == ["arrived.docx", "present.pdf"]
+
+def test_watch_in_batches_groups_arrivals(tmp_path):
+    class Source:
+        def __iter__(self):
+            yield tmp_path / "a.pdf"
+            yield tmp_path / "b.pdf"
+            time.sleep(0.3)
+            yield tmp_path / "c.pdf"
+        
+        def stop(self):
+            pass
+    
+    batches = []
+    
+    def handle_batch(file_paths):
+        batches.append([file_path.name for file_path in file_paths])
+        if len(batches) == 2:
+            raise KeyboardInterrupt
+    
+    watch_in_batches(Source(), handle_batch, batch_window=0.15)
+    assert batches == [["a.pdf", "b.pdf"], ["c.pdf"]]
@@ -0,0 +1,114 @@
+import os
+import time
+
+import pytest
+
+from work_queue import WorkQueue, worker_output_path
+
+@pytest.fixture
+def document(tmp_path):
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    file_path = input_dir / "report.pdf"
+    file_path.write_bytes(b"%PDF-1.4 report")
+    return file_path
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+    
+    def make(worker_id, **kwargs):
+        queue = WorkQueue(tmp_path / "queue", worker_id=worker_id, lease_seconds=60, **kwargs)
+        queues.append(queue)
+        return queue
+    
+    yield make
+    for queue in queues:
+        queue.close()
+
+def expire(lease, seconds=120):
+    past = time.time() - seconds
+    os.utime(lease.lease_path, (past, past))
+
+def test_claim_is_exclusive(document, make_queue):
+    first = make_queue("host-a")
+    second = make_queue("host-b")
+    lease = first.claim(document)
+    assert lease is not None
+    assert second.claim(document) is None
+    assert second.holder(document) == "report.pdf"
+
+def test_same_stem_shares_a_lease(document, make_queue):
+    first = make_queue("host-a")
+    second = make_queue("host-b")
+    docx = document.with_suffix(".docx")
+    docx.write_bytes(b"PK")
+    assert first.claim(document) is not None
+    assert second.claim(docx) is None
+    assert second.holder(docx) == "report.pdf"
+
+def test_expired_lease_is_taken_over(document, make_queue):
+    crashed = make_queue("host-a")
+    survivor = make_queue("host-b")
+    stale = crashed.claim(document)
+    assert stale is not None
+    
+    expire(stale)
+    assert survivor.status()["expired_leases"] == 1
+    lease = survivor.claim(document)
+    assert lease is not None
+    assert survivor._owns(lease.lease_path)
+    
+    # The crashed worker can no longer renew or release the lease
+    assert not stale.renew()
+    assert crashed.claim(document) is None
+
+def test_live_lease_is_not_taken_over(document, make_queue):
+    first = make_queue("host-a")
+    second = make_queue("host-b")
+    lease = first.claim(document)
+    expire(lease, seconds=30)
+    assert second.claim(document) is None
+    assert lease.renew()
+
+def test_release_of_a_taken_over_lease_keeps_the_new_one(document, make_queue):
+    crashed = make_queue("host-a")
+    survivor = make_queue("host-b")
+    stale = crashed.claim(document)
+    expire(stale)
+    lease = survivor.claim(document)
+    
+    stale.release(False, error="late failure")
+    assert lease.lease_path.exists()
+    assert survivor._owns(lease.lease_path)
+
+def test_done_documents_are_not_claimed_until_modified(document, make_queue):
+    first = make_queue("host-a")
+    second = make_queue("host-b")
+    first.claim(document).release(True)
+    assert first.is_done(document)
+    assert second.claim(document) is None
+    assert second.claimable([document]) == []
+    
+    document.write_bytes(b"%PDF-1.4 report, revised")
+    later = time.time() + 10
+    os.utime(document, (later, later))
+    assert not second.is_done(document)
+    assert second.claim(document) is not None
+
+def test_failed_documents_are_retried_up_to_max_attempts(document, make_queue):
+    queue = make_queue("host-a", max_attempts=2)
+    queue.claim(document).release(False, error="boom")
+    assert queue.failed_attempts(document) == 1
+    queue.claim(document).release(False, error="boom")
+    assert queue.is_finished(document)
+    assert queue.claim(document) is None
+    
+    assert queue.reset_failures() == 1
+    assert queue.claim(document) is not None
+
+def test_worker_output_path():
+    path = worker_output_path("out/metrics.json", "host-a-1")
+    assert path.parent.name == "out"
+    assert path.name.startswith("metrics.host-a-1-") and path.suffix == ".json"
+    assert worker_output_path(None, "host-a-1") is None
@@ -4,8 +4,11 @@
 
 import os
 import json
+import shutil
 import logging
+import tempfile
 import time
+import argparse
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -21,14 +24,22 @@ from unstructured_ingest.v2.processes.partitioner import PartitionerConfig
 from unstructured_ingest.v2.processes.filter import FiltererConfig
 from unstructured_ingest.v2.processes.chunker import ChunkerConfig
 
+from manifest import IngestionManifest
+from metrics import WATCH_MAX_DOCUMENTS, MetricsRegistry
+from work_queue import DEFAULT_LEASE_SECONDS, WorkQueue, worker_output_path
+from watcher import DEFAULT_SETTLE_SECONDS, DirectoryWatcher, watch_in_batches
+
 # Import utility functions
 from utils import (
     ensure_directory,
     get_file_metadata,
     extract_text_from_json,
-    summarize_document_collection,
-    save_document_texts
+    summarize_document_collection
 )
+from corpus import CorpusWriter
+from catalog import DEFAULT_CATALOG_PATH, DocumentCatalog
+from element_store import DEFAULT_STORE_PATH, export_elements
+from dedup import DEDUP_FILENAME, DEDUP_MODES, DEFAULT_DEDUP_MODE, DEFAULT_THRESHOLD, DuplicateIndex
 
 # Configure logging
 logging.basicConfig(
@@ -37,6 +48,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Manifest recording which input files have been partitioned
+MANIFEST_FILENAME = "manifest.sqlite3"
+
+# Per-stage timings of the last run, as JSON and Prometheus text; kept in a
+# subdirectory so they are not mistaken for partitioned documents
+METRICS_DIRNAME = "metrics"
+METRICS_JSON_FILENAME = "metrics.json"
+METRICS_PROMETHEUS_FILENAME = "metrics.prom"
+
+# Extracted texts of every partitioned document, one JSON record per line,
+# with an offset index (documents_texts.jsonl.idx) for lookups by name
+CORPUS_PATH = "documents_texts.jsonl"
+
+# In watch mode, files arriving within this many seconds share one pipeline run
+DEFAULT_BATCH_WINDOW = 5.0
+
+# Partition API endpoint (UNSTRUCTURED_API_URL overrides it, e.g. for mock_services.py)
+DEFAULT_PARTITION_ENDPOINT = "https://api.unstructuredapp.io"
+
 def setup_directories():
     """Create necessary directories if they don't exist"""
     # Create output directory for processed JSON files
@@ -44,8 +74,97 @@ def setup_directories():
     logger.info(f"Output directory set to: {output_dir}")
     return str(output_dir)
 
-def run_ingestion_pipeline(input_dir, output_dir, api_key):
-    """Run the document ingestion pipeline"""
+def stage_pending_files(input_dir, file_names):
+    """
+    Create a staging directory exposing only the given input files.
+    
+    Files are symlinked when possible and copied otherwise, so the pipeline's
+    local indexer sees just the documents that still need processing.
+    
+    Args:
+        input_dir: Directory containing the original files
+        file_names: Names of the files to stage
+        
+    Returns:
+        Path to the staging directory (the caller removes it)
+    """
+    staging_dir = tempfile.mkdtemp(prefix="unstructured_staging_")
+    for file_name in file_names:
+        source = os.path.abspath(os.path.join(input_dir, file_name))
+        target = os.path.join(staging_dir, file_name)
+        try:
+            os.symlink(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+    return staging_dir
+
+def copy_duplicate_elements(canonical_output, output_path, file_name):
+    """
+    Write a duplicate's element file from the elements of the document it duplicates.
+    
+    The elements are copied as they are, except that their metadata filename
+    is set to the duplicate's name.
+    
+    Args:
+        canonical_output: Element file of the canonical document
+        output_path: Element file to write for the duplicate
+        file_name: Name of the duplicate input file
+    """
+    with open(canonical_output, "r", encoding="utf-8") as f:
+        elements = json.load(f)
+    for element in elements:
+        metadata = element.get("metadata")
+        if isinstance(metadata, dict) and "filename" in metadata:
+            metadata["filename"] = file_name
+    
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(elements, f, indent=2)
+    os.replace(tmp_path, output_path)
+
+def output_state(output_path):
+    """
+    Identify the current version of an output file.
+    
+    Returns:
+        Tuple of (inode, size, mtime in nanoseconds), or None if the file does not exist
+    """
+    try:
+        stats = Path(output_path).stat()
+    except FileNotFoundError:
+        return None
+    return stats.st_ino, stats.st_size, stats.st_mtime_ns
+
+def run_ingestion_pipeline(input_dir, output_dir, api_key, manifest=None, reprocess=False, metrics=None,
+                           work_queue=None, catalog=None, dedup=None, file_names=None):
+    """
+    Run the document ingestion pipeline.
+    
+    When a manifest is given, each file's outcome is recorded and, unless
+    reprocess is set, only new, modified, failed or interrupted files are sent
+    to the pipeline.
+    
+    When a metrics registry is given, the staging and pipeline run are timed
+    and each file's input and output sizes are recorded. The partitioning
+    itself runs inside the unstructured pipeline, so it is timed per run
+    rather than per document.
+    
+    When a work queue is given, only the files this worker manages to claim
+    are partitioned, so several workers can share one input directory.
+    
+    When a document catalog is given, every element file written by the run
+    is recorded in it for the viewer.
+    
+    When a duplicate index is given, files duplicating an already partitioned
+    document, or another file of the run, are not sent to the API; their
+    element file is a copy of that document's elements.
+    
+    When file names are given, only those files of the input directory are
+    considered, e.g. the files that just arrived in watch mode.
+    """
+    if metrics is None:
+        metrics = MetricsRegistry("unstructured")
     logger.info(f"Starting document ingestion pipeline")
     logger.info(f"Processing documents from: {input_dir}")
     
@@ -54,20 +173,79 @@ def run_ingestion_pipeline(input_dir, output_dir, api_key):
                   if os.path.isfile(os.path.join(input_dir, f)) and 
                   (f.lower().endswith('.pdf') or f.lower().endswith('.docx') or f.lower().endswith('.doc'))]
     
+    total_files = len(input_files)
+    if file_names is not None:
+        file_names = set(file_names)
+        input_files = [f for f in input_files if f in file_names]
+    
     logger.info(f"Found {len(input_files)} files to process")
     
+    pipeline_input = input_dir
+    staging_dir = None
+    leases = {}
+    if manifest is not None or work_queue is not None:
+        pending_files = list(input_files)
+        if manifest is not None and not reprocess:
+            pending = manifest.pending(Path(input_dir) / f for f in input_files)
+            pending_files = [file_path.name for file_path in pending]
+        skipped_count = len(input_files) - len(pending_files)
+        if skipped_count:
+            logger.info(f"Skipping {skipped_count} unchanged files already completed")
+        
+        # Keep the files this worker wins; the others are left to their claimants
+        if work_queue is not None:
+            for file_name in pending_files:
+                lease = work_queue.claim(Path(input_dir) / file_name)
+                if lease is not None:
+                    leases[file_name] = lease
+            if len(leases) < len(pending_files):
+                logger.info(f"Leaving {len(pending_files) - len(leases)} files to other workers")
+            pending_files = [file_name for file_name in pending_files if file_name in leases]
+        
+        if not pending_files:
+            logger.info("All input files are up to date")
+            return True
+        input_files = pending_files
+        
+        if manifest is not None:
+            for file_name in input_files:
+                manifest.start(Path(input_dir) / file_name)
+    
+    # Duplicates get the elements of the document they duplicate instead of an API call
+    duplicates = {}
+    if dedup is not None:
+        with metrics.stage("dedup"):
+            matches = dedup.group([Path(input_dir) / file_name for file_name in input_files])
+        for file_path, match in matches.items():
+            duplicates[file_path.name] = match["output"] or Path(output_dir) / f"{match['path'].name}.json"
+            logger.info(f"{file_path.name} duplicates {match['path'].name} ({match['kind']} match, "
+                        f"similarity {match['similarity']:.2f}), reusing its elements")
+    partition_files = [file_name for file_name in input_files if file_name not in duplicates]
+    if partition_files and len(partition_files) < total_files:
+        with metrics.stage("stage_files"):
+            staging_dir = stage_pending_files(input_dir, partition_files)
+        pipeline_input = staging_dir
+    
     # Print file information
+    document_metrics = {}
     for i, file_name in enumerate(input_files, 1):
         file_path = os.path.join(input_dir, file_name)
         metadata = get_file_metadata(file_path)
         logger.info(f"File {i}: {file_name} ({metadata['size_human']})")
+        document_metrics[file_name] = metrics.document(file_name)
+        document_metrics[file_name].add("bytes_read", metadata["size_bytes"])
+    
+    # Remember the outputs left by earlier runs; a file succeeds only if this run replaces its output
+    previous_outputs = {
+        file_name: output_state(Path(output_dir) / f"{file_name}.json") for file_name in input_files
+    }
     
     # Start timer
     start_time = time.time()
     
     pipeline = Pipeline.from_configs(
         context=ProcessorConfig(),
-        indexer_config=LocalIndexerConfig(input_path=input_dir),
+        indexer_config=LocalIndexerConfig(input_path=pipeline_input),
         downloader_config=LocalDownloaderConfig(),
         source_connection_config=LocalConnectionConfig(),
         filterer_config=FiltererConfig(
@@ -77,7 +255,7 @@ def run_ingestion_pipeline(input_dir, output_dir, api_key):
         partitioner_config=PartitionerConfig(
             partition_by_api=True,
             api_key=api_key,
-            partition_endpoint="https://api.unstructuredapp.io",
+            partition_endpoint=os.getenv("UNSTRUCTURED_API_URL", DEFAULT_PARTITION_ENDPOINT),
             strategy="auto",
             additional_partition_args={
                 "split_pdf_page": True,
@@ -94,20 +272,76 @@ def run_ingestion_pipeline(input_dir, output_dir, api_key):
     )
     
     logger.info("Running pipeline...")
-    pipeline.run()
+    try:
+        if partition_files:
+            with metrics.stage("pipeline", documents=len(partition_files)):
+                pipeline.run()
+    except Exception:
+        for lease in leases.values():
+            lease.release(False, error="pipeline run failed")
+        raise
+    finally:
+        if staging_dir is not None:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+    
+    # Copy the elements of each duplicate's canonical document
+    for file_name, canonical_output in duplicates.items():
+        try:
+            with metrics.stage("copy_duplicate"):
+                copy_duplicate_elements(canonical_output, Path(output_dir) / f"{file_name}.json", file_name)
+        except Exception as e:
+            logger.error(f"Error reusing {canonical_output} for {file_name}: {str(e)}")
     
     # End timer
     end_time = time.time()
+    
+    # Record per-file outcomes: a file succeeded if this run wrote its output
+    for file_name in input_files:
+        output_path = Path(output_dir) / f"{file_name}.json"
+        state = output_state(output_path)
+        success = state is not None and state != previous_outputs[file_name]
+        if success:
+            document_metrics[file_name].add("json_bytes_written", output_path.stat().st_size)
+            if catalog is not None:
+                try:
+                    catalog.record("unstructured", output_dir, output_path)
+                except Exception as e:
+                    logger.error(f"Error updating the document catalog: {str(e)}")
+            if dedup is not None:
+                try:
+                    dedup.add(Path(input_dir) / file_name, output_path)
+                except Exception as e:
+                    logger.error(f"Error updating the duplicate index: {str(e)}")
+        document_metrics[file_name].finish(success)
+        if manifest is not None:
+            manifest.finish(
+                Path(input_dir) / file_name,
+                success,
+                error=None if success else "no output produced by the pipeline"
+            )
+        if file_name in leases:
+            leases[file_name].release(success, error=None if success else "no output produced by the pipeline")
     elapsed_time = end_time - start_time
     logger.info(f"Pipeline execution completed in {elapsed_time:.2f} seconds")
     
     return True
 
-def display_processed_files(output_dir):
-    """Display the content of processed JSON files"""
+def display_processed_files(output_dir, corpus_path=CORPUS_PATH):
+    """
+    Display the content of processed JSON files and write their texts to a corpus.
+    
+    Each document is written to the JSONL corpus as soon as it is read, so
+    the texts of the whole collection are never held in memory at once.
+    
+    Args:
+        output_dir: Directory containing the processed JSON files
+        corpus_path: JSONL corpus receiving one record per document
+        
+    Returns:
+        Number of documents written to the corpus
+    """
     logger.info(f"Displaying processed files from: {output_dir}")
     
-    documents_texts = []
     file_count = 0
     
     # Get collection summary
@@ -118,34 +352,110 @@ def display_processed_files(output_dir):
     logger.info(f"DOCX/DOC files: {summary['docx_count']}")
     logger.info(f"Total size: {summary['total_size']}")
     
-    for file_name in os.listdir(output_dir):
-        if file_name.endswith('.json'):
-            file_path = os.path.join(output_dir, file_name)
-            file_count += 1
-            
-            logger.info(f"Reading file {file_count}: {file_name}")
-            
-            try:
-                # Extract text from the JSON file
-                text_content = extract_text_from_json(file_path)
-                
-                # Format the document text with a header
-                original_filename = file_name.replace('.json', '')
-                document_text = f'Document {file_count}: {original_filename}\n{text_content}'
-                documents_texts.append(document_text)
+    with CorpusWriter(corpus_path) as corpus:
+        for file_name in os.listdir(output_dir):
+            if file_name.endswith('.json'):
+                file_path = os.path.join(output_dir, file_name)
+                file_count += 1
                 
-                # Print a preview of the document
-                preview = text_content[:500] + "..." if len(text_content) > 500 else text_content
-                logger.info(f"Document {file_count} Preview:\n{preview}\n{'='*80}")
+                logger.info(f"Reading file {file_count}: {file_name}")
                 
-            except Exception as e:
-                logger.error(f"Error processing file {file_name}: {str(e)}")
+                try:
+                    # Extract text from the JSON file
+                    text_content = extract_text_from_json(file_path)
+                    
+                    # Write the document text under its original file name
+                    original_filename = file_name.replace('.json', '')
+                    corpus.add(original_filename, text_content, source=file_path)
+                    
+                    # Print a preview of the document
+                    preview = text_content[:500] + "..." if len(text_content) > 500 else text_content
+                    logger.info(f"Document {file_count} Preview:\n{preview}\n{'='*80}")
+                    
+                except Exception as e:
+                    logger.error(f"Error processing file {file_name}: {str(e)}")
+        document_count = len(corpus)
     
     logger.info(f"Total processed documents: {file_count}")
-    return documents_texts
+    return document_count
 
-def main():
-    """Main function to run the document ingestion pipeline"""
+def write_metrics(metrics, output_dir, work_queue=None):
+    """Export a run's metrics as JSON and Prometheus text (named per worker when sharing a work queue)"""
+    json_path = Path(output_dir) / METRICS_DIRNAME / METRICS_JSON_FILENAME
+    prometheus_path = Path(output_dir) / METRICS_DIRNAME / METRICS_PROMETHEUS_FILENAME
+    if work_queue is not None:
+        json_path = worker_output_path(json_path, work_queue.worker_id)
+        prometheus_path = worker_output_path(prometheus_path, work_queue.worker_id)
+    try:
+        metrics.write(json_path=json_path, prometheus_path=prometheus_path)
+    except Exception as e:
+        logger.error(f"Error writing metrics: {str(e)}")
+
+def ingest_and_report(input_dir, output_dir, api_key, manifest, metrics, reprocess=False, work_queue=None,
+                      element_store=False, catalog=None, dedup=None, file_names=None, final=True):
+    """
+    Run the ingestion pipeline, display the processed files and export the metrics
+    
+    With element_store set, the element files are also converted into the
+    columnar element store (elements.parquet in the output directory).
+    With file_names set, only those files of the input directory are processed.
+    With final set, the run's metrics are finished before they are written;
+    watch mode keeps its run open between batches.
+    """
+    # Run the ingestion pipeline
+    try:
+        success = run_ingestion_pipeline(input_dir, output_dir, api_key, manifest=manifest,
+                                         reprocess=reprocess, metrics=metrics, work_queue=work_queue,
+                                         catalog=catalog, dedup=dedup, file_names=file_names)
+        
+        if success:
+            print("-"*80)
+            print("Pipeline execution completed successfully")
+            print("Displaying processed files...")
+            
+            # Display processed files and save their texts
+            with metrics.stage("display"):
+                document_count = display_processed_files(output_dir, CORPUS_PATH)
+            logger.info(f"Texts of {document_count} documents saved to: {CORPUS_PATH}")
+            print(f"Document texts saved to: {CORPUS_PATH}")
+            
+            # Convert the element files into the columnar store
+            if element_store:
+                store_path = Path(output_dir) / DEFAULT_STORE_PATH.name
+                with metrics.stage("element_store"):
+                    store_stats = export_elements(output_dir, store_path)
+                print(f"Element store saved to: {store_path} ({store_stats['elements']} elements)")
+            
+            print("-"*80)
+            print("Document ingestion pipeline completed successfully")
+            print("="*80)
+    except Exception as e:
+        logger.error(f"Error running ingestion pipeline: {str(e)}")
+        print(f"Error running ingestion pipeline: {str(e)}")
+    
+    if final:
+        metrics.finish()
+    write_metrics(metrics, output_dir, work_queue=work_queue)
+
+def main(reprocess=False, watch=False, settle_seconds=DEFAULT_SETTLE_SECONDS,
+         batch_window=DEFAULT_BATCH_WINDOW, queue_dir=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+         element_store=False, dedup=DEFAULT_DEDUP_MODE, dedup_threshold=DEFAULT_THRESHOLD):
+    """
+    Main function to run the document ingestion pipeline
+    
+    Args:
+        reprocess: Process every input file, even those already completed
+        watch: Keep running and partition documents as they arrive in the input directory
+        settle_seconds: Time a file must stay unchanged before it is processed
+        batch_window: Seconds to collect arriving files into one pipeline run
+        queue_dir: Work queue shared with other workers partitioning the same input directory
+        lease_seconds: Time after which a file claimed by an unresponsive worker is taken over
+        element_store: Also convert the element files into the columnar element store
+        dedup: Reuse the elements of an already partitioned document for
+            byte-identical files ("exact"), also for files with nearly the
+            same text ("near"), or never ("off")
+        dedup_threshold: Text similarity above which "near" treats documents as duplicates
+    """
     print("="*80)
     print("DOCUMENT INGESTION PIPELINE")
     print("="*80)
@@ -175,30 +485,76 @@ def main():
     print(f"Output directory: {output_dir}")
     print("-"*80)
     
-    # Run the ingestion pipeline
-    try:
-        success = run_ingestion_pipeline(input_dir, output_dir, api_key)
+    # Join the shared work queue
+    work_queue = None
+    if queue_dir is not None:
+        work_queue = WorkQueue(queue_dir, lease_seconds=lease_seconds)
+        print(f"Worker {work_queue.worker_id} using work queue {queue_dir}")
+    
+    # Open the ingestion manifest, the document catalog read by the viewer and the
+    # index of partitioned documents that duplicates reuse. Queue workers may share
+    # the output directory over NFS/SMB, where SQLite's locking is not reliable, so
+    # in queue mode only the queue's done/failed markers record completion.
+    manifest = None
+    catalog = None
+    duplicate_index = None
+    if work_queue is None:
+        manifest = IngestionManifest(Path(output_dir) / MANIFEST_FILENAME, pipeline="unstructured")
+        catalog = DocumentCatalog(DEFAULT_CATALOG_PATH)
+        if dedup != "off":
+            duplicate_index = DuplicateIndex(Path(output_dir) / DEDUP_FILENAME, mode=dedup,
+                                             threshold=dedup_threshold)
+    else:
+        logger.info("Queue mode: skipping the shared manifest, document catalog and duplicate index")
+    
+    # Collect per-stage timings of the run; a service keeps only the recent documents
+    metrics = MetricsRegistry("unstructured", max_documents=WATCH_MAX_DOCUMENTS if watch else None)
+    
+    if watch:
+        # Service mode: partition documents as they arrive until interrupted
+        watcher = DirectoryWatcher(Path(input_dir), settle_seconds=settle_seconds)
+        print(f"Watching {input_dir} for new documents ({watcher.backend}); press Ctrl+C to stop")
         
-        if success:
-            print("-"*80)
-            print("Pipeline execution completed successfully")
-            print("Displaying processed files...")
-            
-            # Display processed files
-            documents_texts = display_processed_files(output_dir)
+        def handle_batch(file_paths):
+            print(f"Detected {len(file_paths)} new or changed files")
+            ingest_and_report(input_dir, output_dir, api_key, manifest, metrics, work_queue=work_queue,
+                              element_store=element_store, catalog=catalog, dedup=duplicate_index,
+                              file_names=[file_path.name for file_path in file_paths], final=False)
             
-            # Save the documents texts to a file
-            output_file = "documents_texts.txt"
-            if save_document_texts(documents_texts, output_file):
-                logger.info(f"Document texts saved to: {output_file}")
-                print(f"Document texts saved to: {output_file}")
-            
-            print("-"*80)
-            print("Document ingestion pipeline completed successfully")
-            print("="*80)
-    except Exception as e:
-        logger.error(f"Error running ingestion pipeline: {str(e)}")
-        print(f"Error running ingestion pipeline: {str(e)}")
+        watch_in_batches(watcher, handle_batch, batch_window=batch_window)
+        metrics.finish()
+        write_metrics(metrics, output_dir, work_queue=work_queue)
+    else:
+        ingest_and_report(input_dir, output_dir, api_key, manifest, metrics, reprocess=reprocess,
+                          work_queue=work_queue, element_store=element_store, catalog=catalog,
+                          dedup=duplicate_index)
+        if work_queue is not None:
+            work_queue.close()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Unstructured.io document ingestion pipeline")
+    parser.add_argument("--reprocess", action="store_true",
+                        help="Process every input file, even those the manifest records as completed")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and partition documents as they arrive in the input directory")
+    parser.add_argument("--settle-seconds", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="In watch mode, time a file must stay unchanged before it is processed")
+    parser.add_argument("--batch-window", type=float, default=DEFAULT_BATCH_WINDOW,
+                        help="In watch mode, seconds to collect arriving files into one pipeline run")
+    parser.add_argument("--queue-dir", type=Path, default=None,
+                        help="Claim files through a work queue in this directory, shared with other "
+                             "workers on this or other machines")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="Time after which a file claimed by an unresponsive worker is taken over")
+    parser.add_argument("--element-store", action="store_true",
+                        help="Also convert the element files into a columnar Parquet store "
+                             "(requires pandas and pyarrow)")
+    parser.add_argument("--dedup", choices=DEDUP_MODES, default=DEFAULT_DEDUP_MODE,
+                        help="Reuse the elements of an already partitioned document for byte-identical files "
+                             "(exact) or also for files with nearly the same text (near)")
+    parser.add_argument("--dedup-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Text similarity above which --dedup near treats documents as duplicates")
+    args = parser.parse_args()
+    main(reprocess=args.reprocess, watch=args.watch, settle_seconds=args.settle_seconds,
+         batch_window=args.batch_window, queue_dir=args.queue_dir, lease_seconds=args.lease_seconds,
+         element_store=args.element_store, dedup=args.dedup, dedup_threshold=args.dedup_threshold)
@@ -3,13 +3,40 @@
 
 import os
 import json
+import hashlib
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Element files up to this size are parsed in one call when orjson is
+# installed; larger ones are always streamed element by element
+ORJSON_MAX_BYTES = 8 * 1024 * 1024
+
+# Characters read at a time when streaming an element file
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Fields of an Unstructured.io element kept by iter_elements(); everything
+# else (notably metadata.data_source and metadata.links) is dropped
+ELEMENT_FIELDS = ("type", "element_id", "text")
+ELEMENT_METADATA_FIELDS = ("text_as_html", "page_number", "filename")
+
+# Input file extensions handled by the pipelines
+INPUT_EXTENSIONS = (".pdf", ".docx", ".doc")
+
+# Characters read before looking for the array member passed to iter_json_array(key=...)
+JSON_HEADER_CHARS = 1024
+
+_WHITESPACE = " \t\n\r"
+
 def ensure_directory(directory_path: str) -> Path:
     """
     Ensure a directory exists, create it if it doesn't.
@@ -47,6 +74,41 @@ def get_file_metadata(file_path: str) -> Dict[str, Any]:
         "is_docx": file_path.suffix.lower() in [".docx", ".doc"]
     }
 
+def compute_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hash of a file's contents.
+    
+    Args:
+        file_path: Path to the file
+        chunk_size: Number of bytes read at a time
+        
+    Returns:
+        Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def document_stem(output_name: str) -> str:
+    """
+    Get the name under which both pipelines store a document's output.
+    
+    Unstructured.io names its element file after the input file
+    ("report.pdf.json") while Mistral uses the input stem ("report/");
+    both map to "report".
+    
+    Args:
+        output_name: Element file name, Mistral output directory name or input file name
+        
+    Returns:
+        The document stem
+    """
+    name = output_name[:-len(".json")] if output_name.lower().endswith(".json") else output_name
+    root, extension = os.path.splitext(name)
+    return root if extension.lower() in INPUT_EXTENSIONS else name
+
 def format_file_size(size_in_bytes: int) -> str:
     """
     Format file size in human-readable format.
@@ -62,6 +124,139 @@ def format_file_size(size_in_bytes: int) -> str:
             return f"{size_in_bytes:.2f} {unit}"
         size_in_bytes /= 1024.0
 
+def _find_member_array(buffer: str, key: str) -> int:
+    """Get the position after the "[" opening the array of an object's first member, or -1"""
+    decoder = json.JSONDecoder()
+    if not buffer.startswith('{'):
+        return -1
+    position = 1
+    while position < len(buffer) and buffer[position] in _WHITESPACE:
+        position += 1
+    try:
+        name, position = decoder.raw_decode(buffer, position)
+    except json.JSONDecodeError:
+        return -1
+    rest = buffer[position:].lstrip(_WHITESPACE)
+    if name != key or not rest.startswith(':'):
+        return -1
+    rest = rest[1:].lstrip(_WHITESPACE)
+    if not rest.startswith('['):
+        return -1
+    return len(buffer) - len(rest) + 1
+
+def iter_json_array(json_file_path: str, chunk_size: int = STREAM_CHUNK_SIZE, key: Optional[str] = None) -> Iterator[Any]:
+    """
+    Stream the items of a JSON array file one at a time.
+    
+    Only the item being decoded is held in memory, instead of the whole
+    array as with json.load(). With a key, the array is the value of that
+    member of a top-level object, which must be the object's first member
+    (e.g. the "pages" of an OCR response); the rest of the file is not read.
+    
+    Args:
+        json_file_path: Path to a file containing a JSON array
+        chunk_size: Characters read at a time
+        key: Name of the object member holding the array
+        
+    Yields:
+        The decoded items, in order
+        
+    Raises:
+        ValueError: If the file is not a JSON array (or, with a key, an
+            object starting with that array member)
+    """
+    decoder = json.JSONDecoder()
+    with open(json_file_path, 'r', encoding='utf-8') as file:
+        buffer = file.read(chunk_size).lstrip(_WHITESPACE)
+        if key is not None:
+            # Make sure the opening of the object is in the buffer
+            while len(buffer) < JSON_HEADER_CHARS:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    break
+                buffer += chunk
+            position = _find_member_array(buffer, key)
+            if position < 0:
+                raise ValueError(f"{json_file_path} does not start with a \"{key}\" array")
+        elif buffer.startswith('['):
+            position = 1
+        else:
+            raise ValueError(f"{json_file_path} does not contain a JSON array")
+        eof = False
+        read_size = chunk_size
+        
+        while True:
+            # Skip the separator before the next item
+            while position < len(buffer) and buffer[position] in _WHITESPACE + ",":
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            
+            if position < len(buffer):
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                    # An item is complete once a delimiter follows it: a number cut
+                    # by the chunk boundary ("-4.5" of "-4.5e10") still decodes
+                    if eof or (end < len(buffer) and buffer[end] in _WHITESPACE + ",]"):
+                        yield item
+                        position = end
+                        read_size = chunk_size
+                        continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            elif eof:
+                raise ValueError(f"Unterminated JSON array in {json_file_path}")
+            
+            # The next item is incomplete: drop what was consumed and read more,
+            # doubling the read size so large items are not re-parsed too often
+            chunk = file.read(read_size)
+            read_size *= 2
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+def trim_element(element: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the fields of an Unstructured.io element used for display and text extraction"""
+    trimmed = {field: element[field] for field in ELEMENT_FIELDS if field in element}
+    metadata = element.get("metadata")
+    if metadata:
+        trimmed["metadata"] = {
+            field: metadata[field] for field in ELEMENT_METADATA_FIELDS if field in metadata
+        }
+    return trimmed
+
+def iter_elements(json_file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read the elements of an Unstructured.io JSON file, keeping only the
+    fields in ELEMENT_FIELDS and ELEMENT_METADATA_FIELDS.
+    
+    Large files are streamed element by element; with orjson installed,
+    files up to ORJSON_MAX_BYTES are parsed in one faster call.
+    
+    Args:
+        json_file_path: Path to the JSON file
+        
+    Yields:
+        Trimmed elements, in document order
+    """
+    if ORJSON_AVAILABLE and os.path.getsize(json_file_path) <= ORJSON_MAX_BYTES:
+        with open(json_file_path, 'rb') as file:
+            elements = orjson.loads(file.read())
+        for element in elements:
+            yield trim_element(element)
+        return
+    
+    for element in iter_json_array(json_file_path):
+        yield trim_element(element)
+
+def element_text(element: Dict[str, Any]) -> str:
+    """Get an element's HTML rendering (tables) if it has one, otherwise its text"""
+    metadata = element.get("metadata")
+    if metadata and "text_as_html" in metadata:
+        return metadata["text_as_html"]
+    return element.get("text", "")
+
 def extract_text_from_json(json_file_path: str) -> str:
     """
     Extract text content from a JSON file produced by Unstructured.io.
@@ -73,18 +268,8 @@ def extract_text_from_json(json_file_path: str) -> str:
         Extracted text content
     """
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            
-            # Extract text from elements
-            text_content = '\n'.join(
-                element["metadata"].get("text_as_html", "")
-                if "metadata" in element and "text_as_html" in element["metadata"]
-                else element.get("text", "")
-                for element in data
-            )
-            
-            return text_content
+        # Extract text from elements
+        return '\n'.join(element_text(element) for element in iter_elements(json_file_path))
     except Exception as e:
         logger.error(f"Error extracting text from {json_file_path}: {str(e)}")
         return ""
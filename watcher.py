@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# Watch-folder support for continuous ingestion
+# Detects documents arriving in an input directory (inotify on Linux, polling
+# elsewhere), waits until they stop changing, and hands them to the pipelines.
+
+import os
+import time
+import queue
+import ctypes
+import ctypes.util
+import select
+import struct
+import fnmatch
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Document types picked up from the watched directory
+DEFAULT_PATTERNS = ["*.pdf", "*.docx", "*.doc"]
+
+# A file is ready once its size and mtime have not changed for this long
+DEFAULT_SETTLE_SECONDS = 2.0
+
+# How often the directory is rescanned when inotify is unavailable
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify event masks (from <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+class InotifyUnavailable(Exception):
+    """Raised when inotify cannot be used on this system"""
+
+class Inotify:
+    """
+    Minimal ctypes binding to Linux inotify for a single directory.
+    
+    Only file names are reported; the watcher decides when a file is ready.
+    """
+    
+    def __init__(self, directory: Path):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name or not hasattr(os, "read"):
+            raise InotifyUnavailable("libc not found")
+        try:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            init = libc.inotify_init1
+            add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError) as e:
+            raise InotifyUnavailable(str(e))
+        
+        self.fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise InotifyUnavailable(os.strerror(ctypes.get_errno()))
+        
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY | IN_DELETE | IN_MOVED_FROM
+        if add_watch(self.fd, os.fsencode(str(directory)), mask) < 0:
+            error = os.strerror(ctypes.get_errno())
+            os.close(self.fd)
+            raise InotifyUnavailable(error)
+    
+    def read(self, timeout: float) -> Tuple[List[str], bool]:
+        """
+        Wait for events.
+        
+        Args:
+            timeout: Maximum time to wait in seconds
+        
+        Returns:
+            Tuple of (names of changed files, whether the event queue overflowed)
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return [], False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], False
+        
+        names = []
+        overflowed = False
+        offset = 0
+        while offset + INOTIFY_EVENT_HEADER.size <= len(data):
+            _, mask, _, name_length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b"\0")
+            offset += name_length
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+            elif name:
+                names.append(os.fsdecode(name))
+        return names, overflowed
+    
+    def close(self):
+        os.close(self.fd)
+
+class DirectoryWatcher:
+    """
+    Yield files that arrive in a directory once they have been fully written.
+    
+    Files present at startup are reported too, so nothing dropped while the
+    service was down is missed; callers filter out already-processed files.
+    A file is reported when its size and mtime have stayed unchanged for
+    settle_seconds, which debounces uploads and copies still in progress.
+    A file that changes again after being reported is reported again.
+    
+    inotify is used on Linux to learn about new files immediately; elsewhere
+    (or with use_inotify=False) the directory is polled.
+    """
+    
+    def __init__(self, directory: Path, patterns: Iterable[str] = DEFAULT_PATTERNS,
+                 settle_seconds: float = DEFAULT_SETTLE_SECONDS, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 use_inotify: bool = True):
+        self.directory = Path(directory)
+        self.patterns = [pattern.lower() for pattern in patterns]
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self._candidates: Dict[str, Tuple[int, float, float]] = {}
+        self._reported: Dict[str, Tuple[int, float]] = {}
+        self._stopped = threading.Event()
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = Inotify(self.directory)
+                logger.info(f"Watching {self.directory} with inotify")
+            except InotifyUnavailable as e:
+                logger.info(f"inotify unavailable ({e}), polling {self.directory} every {poll_interval}s")
+        else:
+            logger.info(f"Polling {self.directory} every {poll_interval}s")
+    
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._inotify is not None else "polling"
+    
+    def _matches(self, name: str) -> bool:
+        return any(fnmatch.fnmatch(name.lower(), pattern) for pattern in self.patterns)
+    
+    def _scan(self):
+        """Add every matching file in the directory as a candidate and forget files that are gone"""
+        present = set()
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and self._matches(entry.name):
+                        present.add(entry.name)
+                        self._observe(entry.name)
+        except FileNotFoundError:
+            logger.warning(f"Watched directory {self.directory} does not exist")
+        for name in list(self._reported):
+            if name not in present:
+                del self._reported[name]
+    
+    def _observe(self, name: str):
+        """Record the current size and mtime of a file, restarting its settle timer if it changed"""
+        try:
+            stats = (self.directory / name).stat()
+        except FileNotFoundError:
+            # Deleted or moved away; a file arriving later under the same name is new
+            self._candidates.pop(name, None)
+            self._reported.pop(name, None)
+            return
+        signature = (stats.st_size, stats.st_mtime)
+        if self._reported.get(name) == signature:
+            return
+        previous = self._candidates.get(name)
+        if previous is None or previous[:2] != signature:
+            self._candidates[name] = (stats.st_size, stats.st_mtime, time.monotonic())
+    
+    def _settled(self) -> List[Path]:
+        """Pop the candidates that have not changed for settle_seconds"""
+        now = time.monotonic()
+        ready = []
+        for name in list(self._candidates):
+            self._observe(name)
+            candidate = self._candidates.get(name)
+            if candidate is None:
+                continue
+            size, mtime, since = candidate
+            if now - since >= self.settle_seconds:
+                del self._candidates[name]
+                self._reported[name] = (size, mtime)
+                ready.append(self.directory / name)
+        return sorted(ready)
+    
+    def stop(self):
+        """Make the iteration end after its current wait"""
+        self._stopped.set()
+    
+    def __iter__(self) -> Iterator[Path]:
+        self._scan()
+        try:
+            while not self._stopped.is_set():
+                for file_path in self._settled():
+                    yield file_path
+                
+                # Wake up often enough to notice files settling
+                timeout = self.poll_interval
+                if self._candidates:
+                    timeout = min(timeout, self.settle_seconds / 2)
+                
+                if self._inotify is not None:
+                    names, overflowed = self._inotify.read(timeout)
+                    if overflowed:
+                        logger.warning("inotify event queue overflowed, rescanning")
+                        self._scan()
+                    for name in names:
+                        if self._matches(name):
+                            self._observe(name)
+                else:
+                    self._stopped.wait(timeout)
+                    self._scan()
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+
+def watch_and_dispatch(watcher: DirectoryWatcher, handle: Callable[[Path], bool], workers: int = 4,
+                       should_process: Optional[Callable[[Path], bool]] = None,
+                       on_done: Optional[Callable[[Path, bool], None]] = None):
+    """
+    Hand every file reported by a watcher to a pool of worker threads.
+    
+    A file that is reported again while it is still being processed is
+    queued once more and handled after the current run finishes. Returns
+    when the watcher stops or on KeyboardInterrupt, after in-flight files
+    have finished.
+    
+    Args:
+        watcher: Source of ready files
+        handle: Function processing one file, returning True on success
+        workers: Number of files processed at once
+        should_process: Filter deciding whether a reported file needs work
+            (e.g. the ingestion manifest's needs_processing)
+        on_done: Called with each file and its result after it is handled
+    """
+    lock = threading.Lock()
+    in_flight: Set[Path] = set()
+    requeued: Set[Path] = set()
+    
+    def run(file_path: Path):
+        while True:
+            try:
+                success = handle(file_path)
+            except Exception as e:
+                logger.error(f"Error processing {file_path.name}: {str(e)}")
+                success = False
+            if on_done is not None:
+                on_done(file_path, success)
+            with lock:
+                if file_path not in requeued:
+                    in_flight.discard(file_path)
+                    return
+                requeued.discard(file_path)
+            logger.info(f"{file_path.name} changed while it was processed, processing it again")
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="watch-worker") as executor:
+        try:
+            for file_path in watcher:
+                if should_process is not None and not should_process(file_path):
+                    logger.info(f"Skipping {file_path.name}: already processed")
+                    continue
+                with lock:
+                    if file_path in in_flight:
+                        requeued.add(file_path)
+                        continue
+                    in_flight.add(file_path)
+                logger.info(f"Queued {file_path.name}")
+                print(f"Queued {file_path.name}")
+                executor.submit(run, file_path)
+        except KeyboardInterrupt:
+            print("Stopping: waiting for documents in progress...")
+            logger.info("Watch mode interrupted, waiting for in-flight documents")
+        finally:
+            watcher.stop()
+
+def watch_in_batches(watcher: DirectoryWatcher, handle_batch: Callable[[List[Path]], None],
+                     batch_window: float = 5.0):
+    """
+    Collect files reported by a watcher into batches.
+    
+    For pipelines with a per-run startup cost, files arriving within
+    batch_window seconds of the first one are handled together. Returns on
+    KeyboardInterrupt after the current batch.
+    
+    Args:
+        watcher: Source of ready files
+        handle_batch: Function processing a list of files
+        batch_window: Seconds to keep collecting after the first file of a batch
+    """
+    arrivals: "queue.Queue[Path]" = queue.Queue()
+    
+    def collect():
+        for file_path in watcher:
+            arrivals.put(file_path)
+    
+    collector = threading.Thread(target=collect, name="watch-collector", daemon=True)
+    collector.start()
+    try:
+        while True:
+            batch = [arrivals.get()]
+            deadline = time.monotonic() + batch_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(arrivals.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            logger.info(f"Processing batch of {len(batch)} files")
+            handle_batch(batch)
+    except KeyboardInterrupt:
+        print("Stopping watch mode")
+        logger.info("Watch mode interrupted")
+    finally:
+        watcher.stop()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# Lease-based work queue shared by pipeline worker processes
+# Lets several processes, on one machine or on several machines sharing a
+# filesystem, pull documents from the same input set without processing a
+# document twice or writing to the same outputs at once.
+
+import os
+import re
+import sys
+import json
+import time
+import socket
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# A lease not renewed for this long is considered abandoned and can be taken over
+DEFAULT_LEASE_SECONDS = 300.0
+
+# A document that failed this many times (unchanged) is no longer claimed
+DEFAULT_MAX_ATTEMPTS = 3
+
+LEASES_DIRNAME = "leases"
+DONE_DIRNAME = "done"
+FAILED_DIRNAME = "failed"
+
+def default_worker_id() -> str:
+    """Identify this process across the machines sharing a queue"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def _marker_name(name: str) -> str:
+    """File name for a queue marker: readable, but unique even for similar names"""
+    readable = re.sub(r"[^A-Za-z0-9._-]+", "_", name)[:80]
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:12]
+    return f"{readable}-{digest}"
+
+def _file_signature(file_path: Path) -> Dict[str, Any]:
+    stats = Path(file_path).stat()
+    return {"size_bytes": stats.st_size, "modified_time": stats.st_mtime}
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def worker_output_path(path: Optional[Path], worker_id: str) -> Optional[Path]:
+    """
+    Give a per-run output file (e.g. metrics.json) a per-worker name.
+    
+    Args:
+        path: Output path shared by every worker, or None
+        worker_id: ID of this worker
+    
+    Returns:
+        The path with the worker ID inserted before the suffix
+    """
+    if path is None:
+        return None
+    path = Path(path)
+    return path.with_name(f"{path.stem}.{_marker_name(worker_id)}{path.suffix}")
+
+class Lease:
+    """A claim on one document, held until released"""
+    
+    def __init__(self, queue: "WorkQueue", file_path: Path, lease_path: Path):
+        self.queue = queue
+        self.file_path = Path(file_path)
+        self.lease_path = lease_path
+    
+    def renew(self) -> bool:
+        """
+        Push the lease's expiry back.
+        
+        Returns:
+            False if the lease was taken over by another worker
+        """
+        if not self.queue._owns(self.lease_path):
+            return False
+        try:
+            os.utime(self.lease_path)
+        except FileNotFoundError:
+            return False
+        return True
+    
+    def release(self, success: bool, error: Optional[str] = None):
+        """
+        Record the document's outcome and give up the claim.
+        
+        Args:
+            success: Whether the document was processed successfully
+            error: Error message recorded for a failure
+        """
+        self.queue._release(self, success, error)
+
+class WorkQueue:
+    """
+    Filesystem queue of input documents claimed with expiring leases.
+    
+    A worker claims a document by creating its lease file with O_EXCL, which
+    succeeds for exactly one worker even across machines sharing the queue
+    directory. Leases are named after the document's output stem, because
+    files such as "report.doc" and "report.docx" write to the same output
+    directories. Held leases are renewed by a background thread; a lease not
+    renewed for lease_seconds (its worker crashed or lost its machine) is
+    taken over by the next worker that claims the document.
+    
+    Successful documents get a done marker and failed ones a failure marker,
+    both recording the document's size and mtime, so a modified document is
+    claimable again. A document is retried until it has failed max_attempts
+    times.
+    
+    Layout of queue_dir:
+        leases/<stem>.lease   JSON with the owning worker, while claimed
+        done/<name>.done      JSON outcome of a successful document
+        failed/<name>.json    JSON outcome and attempt count of a failure
+    """
+    
+    def __init__(self, queue_dir: Path, worker_id: Optional[str] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.queue_dir = Path(queue_dir)
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.leases_dir = self.queue_dir / LEASES_DIRNAME
+        self.done_dir = self.queue_dir / DONE_DIRNAME
+        self.failed_dir = self.queue_dir / FAILED_DIRNAME
+        for directory in (self.leases_dir, self.done_dir, self.failed_dir):
+            directory.mkdir(exist_ok=True, parents=True)
+        self._lock = threading.Lock()
+        self._held: Dict[Path, Lease] = {}
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+    
+    def _lease_path(self, file_path: Path) -> Path:
+        return self.leases_dir / f"{_marker_name(Path(file_path).stem)}.lease"
+    
+    def _done_path(self, file_path: Path) -> Path:
+        return self.done_dir / f"{_marker_name(Path(file_path).name)}.done"
+    
+    def _failed_path(self, file_path: Path) -> Path:
+        return self.failed_dir / f"{_marker_name(Path(file_path).name)}.json"
+    
+    def _owns(self, lease_path: Path) -> bool:
+        lease = _read_json(lease_path)
+        return lease is not None and lease.get("worker") == self.worker_id
+    
+    def is_done(self, file_path: Path) -> bool:
+        """Check whether the document, in its current version, was processed successfully"""
+        marker = _read_json(self._done_path(file_path))
+        return marker is not None and self._matches(marker, file_path)
+    
+    def failed_attempts(self, file_path: Path) -> int:
+        """Count the failed attempts at the document's current version"""
+        marker = _read_json(self._failed_path(file_path))
+        if marker is None or not self._matches(marker, file_path):
+            return 0
+        return marker.get("attempts", 0)
+    
+    def is_finished(self, file_path: Path) -> bool:
+        """Check whether the document is done or out of attempts, so it will not be claimed"""
+        return self.is_done(file_path) or self.failed_attempts(file_path) >= self.max_attempts
+    
+    def holder(self, file_path: Path) -> Optional[str]:
+        """
+        Get the name of the file holding the lease on the document's output stem.
+        
+        Returns:
+            The claimed file's name (the document itself or a file with the
+            same stem), or None if the stem is not claimed
+        """
+        lease = _read_json(self._lease_path(file_path))
+        return lease.get("file") if lease else None
+    
+    @staticmethod
+    def _matches(marker: Dict[str, Any], file_path: Path) -> bool:
+        try:
+            signature = _file_signature(file_path)
+        except FileNotFoundError:
+            return True
+        return (marker.get("size_bytes") == signature["size_bytes"]
+                and marker.get("modified_time") == signature["modified_time"])
+    
+    def _create_lease(self, lease_path: Path, file_path: Path) -> bool:
+        """Atomically create a lease file; False if it already exists"""
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "worker": self.worker_id,
+                "file": Path(file_path).name,
+                "claimed_at": time.time()
+            }, f)
+        return True
+    
+    def _take_over_expired(self, lease_path: Path) -> bool:
+        """
+        Remove an expired lease so it can be claimed again.
+        
+        The lease is renamed before it is deleted: only one of several
+        workers noticing the expiry succeeds, so a fresh lease created in
+        between by another worker is never deleted by mistake.
+        """
+        try:
+            age = time.time() - lease_path.stat().st_mtime
+        except FileNotFoundError:
+            return True
+        if age < self.lease_seconds:
+            return False
+        
+        stale_path = lease_path.with_name(f"{lease_path.name}.{_marker_name(self.worker_id)}.stale")
+        try:
+            os.rename(lease_path, stale_path)
+        except FileNotFoundError:
+            return False
+        previous = _read_json(stale_path) or {}
+        os.unlink(stale_path)
+        logger.warning(
+            f"Taking over expired lease on {previous.get('file', lease_path.name)} "
+            f"from {previous.get('worker', 'unknown worker')} ({age:.0f}s without renewal)"
+        )
+        return True
+    
+    def claim(self, file_path: Path) -> Optional[Lease]:
+        """
+        Try to claim a document.
+        
+        Args:
+            file_path: Path to the input document
+        
+        Returns:
+            A Lease, or None if the document is done, has failed too often or
+            is claimed by another worker
+        """
+        file_path = Path(file_path)
+        if self.is_finished(file_path):
+            return None
+        
+        lease_path = self._lease_path(file_path)
+        if not self._create_lease(lease_path, file_path):
+            if not self._take_over_expired(lease_path) or not self._create_lease(lease_path, file_path):
+                return None
+        
+        # Another worker may have finished the document before our lease existed
+        if self.is_done(file_path):
+            os.unlink(lease_path)
+            return None
+        
+        lease = Lease(self, file_path, lease_path)
+        with self._lock:
+            self._held[lease_path] = lease
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._renew_leases, name="lease-heartbeat", daemon=True)
+                self._heartbeat.start()
+        logger.info(f"Claimed {file_path.name} as {self.worker_id}")
+        return lease
+    
+    def _renew_leases(self):
+        """Renew every held lease well before it expires"""
+        while not self._stopped.wait(self.lease_seconds / 3):
+            with self._lock:
+                leases = list(self._held.values())
+            for lease in leases:
+                if not lease.renew():
+                    logger.warning(f"Lost the lease on {lease.file_path.name} to another worker")
+    
+    def _release(self, lease: Lease, success: bool, error: Optional[str] = None):
+        file_path = lease.file_path
+        try:
+            marker = _file_signature(file_path)
+        except FileNotFoundError:
+            marker = {}
+        marker.update({"file": file_path.name, "worker": self.worker_id, "finished_at": time.time()})
+        
+        if success:
+            _write_json_atomic(self._done_path(file_path), marker)
+            failed_path = self._failed_path(file_path)
+            if failed_path.exists():
+                failed_path.unlink()
+        else:
+            marker["attempts"] = self.failed_attempts(file_path) + 1
+            marker["error"] = error
+            _write_json_atomic(self._failed_path(file_path), marker)
+        
+        with self._lock:
+            self._held.pop(lease.lease_path, None)
+        if self._owns(lease.lease_path):
+            os.unlink(lease.lease_path)
+    
+    def claimable(self, files: Iterable[Path]) -> List[Path]:
+        """Get the files that are neither done nor out of attempts (claimed ones included)"""
+        return [Path(f) for f in files if not self.is_finished(f)]
+    
+    def status(self) -> Dict[str, int]:
+        """Count active and expired leases, done markers and failure markers"""
+        now = time.time()
+        active = expired = 0
+        for lease_path in self.leases_dir.glob("*.lease"):
+            try:
+                age = now - lease_path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if age < self.lease_seconds:
+                active += 1
+            else:
+                expired += 1
+        return {
+            "active_leases": active,
+            "expired_leases": expired,
+            "done": len(list(self.done_dir.glob("*.done"))),
+            "failed": len(list(self.failed_dir.glob("*.json")))
+        }
+    
+    def reset_failures(self) -> int:
+        """Delete the failure markers so failed documents are retried; returns how many"""
+        count = 0
+        for marker_path in self.failed_dir.glob("*.json"):
+            marker_path.unlink()
+            count += 1
+        return count
+    
+    def close(self):
+        """Stop renewing leases (held leases then expire on their own)"""
+        self._stopped.set()
+
+def main():
+    """Inspect or reset a work queue"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Inspect the work queue shared by pipeline worker processes")
+    parser.add_argument("command", choices=["status", "reset-failed"], help="Action to perform")
+    parser.add_argument("queue_dir", type=Path, help="Queue directory passed to the pipelines' --queue-dir")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="Lease duration used by the workers")
+    args = parser.parse_args()
+    
+    if not args.queue_dir.is_dir():
+        print(f"Error: queue directory '{args.queue_dir}' not found")
+        sys.exit(1)
+    
+    queue = WorkQueue(args.queue_dir, lease_seconds=args.lease_seconds)
+    if args.command == "status":
+        for name, count in queue.status().items():
+            print(f"{name}: {count}")
+    else:
+        print(f"Removed {queue.reset_failures()} failure markers")
+
+if __name__ == "__main__":
+    main()